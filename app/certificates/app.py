@@ -6,15 +6,46 @@ Flask API server for certificate generation.
 Run this server to provide HTTP endpoints for PDF certificate generation.
 """
 
+import hashlib
+import io
+import json
+import logging
 import os
+import signal
 import sys
-import tempfile
-from datetime import date, datetime
-from decimal import Decimal
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from itertools import chain
 from pathlib import Path
-from flask import Flask, request, jsonify, send_file
+import time
+from flask import Flask, Response, g, request, jsonify, send_file
 from flask_cors import CORS
-from lib.certificate_generator import CertificateGenerator, CertificateData, ValidationError
+from werkzeug.exceptions import HTTPException
+from lib.certificate_generator import (
+    BrowserPool,
+    CertificateGenerator,
+    PdfOptimizer,
+    RenderCache,
+    ValidationError,
+    observe_stages,
+    parse_certificate_request,
+    pick_engine,
+    safe_filename_part,
+    validate_data,
+)
+from lib.certificate_overlay import OverlayRenderer, OverlayUnavailable
+from lib.certificate_export import stream_zip
+from lib.certificate_store import CertificateStore, RecentCertificates, RetentionSweeper
+from lib.engine_router import RoutingEngine
+from lib.metrics import CONTENT_TYPE, SIZE_BUCKETS, Registry
+from lib.render_farm import RenderFarm
+from lib.render_jobs import JobQueue, QueueFull, SingleFlight
+
+try:
+    from waitress import serve
+except ImportError:  # development: Flask's built-in server
+    serve = None
 
 # Add current directory to path to import certificate_generator
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -25,66 +56,483 @@ CORS(app, origins=["http://localhost:3010", "http://localhost:3011"])  # Enable
 # Configuration
 CERTIFICATE_DIR = Path(__file__).parent
 TEMPLATE_DIR = CERTIFICATE_DIR / "templates"
-OUTPUT_DIR = CERTIFICATE_DIR / "output"
-TEMPLATE_NAME = "certificate_template.html"
+OUTPUT_DIR = Path(os.environ.get('OUTPUT_DIR', CERTIFICATE_DIR / "output"))
+# Self-contained template copies written by lib/template_assets.py (fonts/images inlined)
+BUNDLE_DIR = Path(os.environ.get('TEMPLATE_BUNDLE_DIR', CERTIFICATE_DIR / "bundled"))
+BLOCK_REMOTE_ASSETS = os.environ.get('BLOCK_REMOTE_ASSETS', '0') == '1'
+CACHE_DIR = Path(os.environ.get('RENDER_CACHE_DIR', CERTIFICATE_DIR / "cache"))
+# SQLite index of everything in OUTPUT_DIR (listing, lookup by donation, cleanup); kept inside it
+# so the index and the files it describes share a volume
+INDEX_PATH = Path(os.environ.get('CERTIFICATE_INDEX', OUTPUT_DIR / "certificates.db"))
+TEMPLATE_NAME = os.environ.get('CERTIFICATE_TEMPLATE', "certificate_template.html")
+BATCH_MAX_WORKERS = int(os.environ.get('BATCH_MAX_WORKERS', 4))
+
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper(), format='%(asctime)s %(levelname)s %(name)s: %(message)s')
 
 # Ensure output directory exists
-OUTPUT_DIR.mkdir(exist_ok=True)
+OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+
+certificate_store = CertificateStore(OUTPUT_DIR, INDEX_PATH)
+if certificate_store.created:
+    print(f"🗂️  Indexed {certificate_store.backfill()} existing certificates")
+
+# Certificate filenames are unique and never rewritten, so downloads may be cached for a long time
+DOWNLOAD_MAX_AGE = int(os.environ.get('DOWNLOAD_MAX_AGE_SECONDS', 365 * 86400))
+
+# Bytes of just-generated certificates: the download right after /generate never touches the disk
+recent_certificates = None
+if int(os.environ.get('DOWNLOAD_CACHE_MB', 64)) > 0:
+    recent_certificates = RecentCertificates(int(os.environ.get('DOWNLOAD_CACHE_MB', 64)) * 1024 * 1024)
+
+# Moves pre-sharding files into output/YYYY/MM/xx/, then (RETENTION_HOURS > 0) expires old
+# certificates in the background at a bounded delete rate. Started by start_background_tasks()
+_retention_hours = float(os.environ.get('RETENTION_HOURS', 0))
+retention_sweeper = RetentionSweeper(
+    certificate_store,
+    max_age_seconds=_retention_hours * 3600 if _retention_hours > 0 else None,
+    interval_seconds=float(os.environ.get('RETENTION_SWEEP_INTERVAL_SECONDS', 600)),
+    max_ops_per_second=float(os.environ.get('RETENTION_MAX_DELETES_PER_SECOND', 20)),
+)
+
+# Warm Chromium pool shared by all requests (browsers are launched once, not per certificate)
+browser_pool = BrowserPool(
+    size=int(os.environ.get('BROWSER_POOL_SIZE', 2)),
+    max_renders_per_browser=int(os.environ.get('BROWSER_MAX_RENDERS', 200)),
+    block_remote=BLOCK_REMOTE_ASSETS,
+)
+
+# Content-addressed render cache: retries / webhook replays reuse the earlier PDF
+render_cache = None
+if os.environ.get('RENDER_CACHE', '1') != '0':
+    render_cache = RenderCache(
+        CACHE_DIR,
+        max_bytes=int(os.environ.get('RENDER_CACHE_MAX_MB', 512)) * 1024 * 1024,
+        max_age_seconds=float(os.environ.get('RENDER_CACHE_MAX_AGE_HOURS', 168)) * 3600,
+    )
+
+# Shrink every render before it is stored/served (~3 MB -> <500 KB for the v18 template)
+pdf_optimizer = None
+if os.environ.get('PDF_OPTIMIZE', '1') != '0':
+    try:
+        pdf_optimizer = PdfOptimizer(
+            dpi=int(os.environ.get('PDF_IMAGE_DPI', 150)),
+            jpeg_quality=int(os.environ.get('PDF_JPEG_QUALITY', 85)),
+            linearize=os.environ.get('PDF_LINEARIZE', '1') == '1',
+        )
+    except RuntimeError as e:
+        print(f"⚠️  PDF optimization disabled: {e}")
+
+# OVERLAY_MODE=1: print the template once per template hash, then stamp each donor's text onto it
+overlay_renderer = None
+if os.environ.get('OVERLAY_MODE', '0') == '1':
+    try:
+        overlay_renderer = OverlayRenderer(store_dir=CACHE_DIR / "overlay")
+    except OverlayUnavailable as e:
+        print(f"⚠️  Overlay mode disabled: {e}")
+
+PDF_ENGINE = os.environ.get('PDF_ENGINE', 'playwright')
+
+def _make_engine(name, fallback=True):
+    if name == 'farm':
+        # RENDER_WORKERS processes, each with its own BROWSER_POOL_SIZE browsers, under a supervisor
+        return RenderFarm(
+            workers=int(os.environ.get('RENDER_WORKERS', os.cpu_count() or 1)),
+            pool_size=int(os.environ.get('BROWSER_POOL_SIZE', 2)),
+            max_renders_per_browser=int(os.environ.get('BROWSER_MAX_RENDERS', 200)),
+            block_remote=BLOCK_REMOTE_ASSETS,
+            engine=os.environ.get('RENDER_WORKER_ENGINE', 'playwright'),
+            max_rss_mb=int(os.environ.get('RENDER_WORKER_MAX_RSS_MB', 1024)),
+            render_timeout=float(os.environ.get('RENDER_TIMEOUT_SECONDS', 60)),
+            # a worker whose engine won't start is retried with backoff, then given up (/ready fails)
+            restart_backoff=float(os.environ.get('RENDER_WORKER_RESTART_BACKOFF_SECONDS', 1)),
+            max_start_failures=int(os.environ.get('RENDER_WORKER_MAX_START_FAILURES', 5)),
+        )
+    return pick_engine(
+        name,
+        pool=browser_pool,
+        # PDF_ENGINE=playwright-async: one browser, this many renders in flight at once
+        max_concurrent_pages=int(os.environ.get('ASYNC_MAX_PAGES', 16)),
+        block_remote=BLOCK_REMOTE_ASSETS,
+        fallback=fallback,
+    )
+
+if PDF_ENGINE == 'router':
+    # ROUTER_ENGINES in order of preference; a render slower than HEDGE_DELAY_SECONDS also starts
+    # on the next engine and the first PDF back wins; failing engines are cut off for a while
+    routes = []
+    for name in os.environ.get('ROUTER_ENGINES', 'playwright,weasyprint').split(','):
+        try:
+            routes.append((name.strip(), _make_engine(name.strip(), fallback=False)))
+        except RuntimeError as e:
+            print(f"⚠️  Engine {name.strip()} not routed: {e}")
+    pdf_engine = RoutingEngine(
+        routes or [('fallback', _make_engine('playwright'))],
+        hedge_delay=float(os.environ.get('HEDGE_DELAY_SECONDS', 2.0)),
+        max_failure_rate=float(os.environ.get('ENGINE_MAX_FAILURE_RATE', 0.5)),
+        open_seconds=float(os.environ.get('ENGINE_CIRCUIT_OPEN_SECONDS', 30)),
+        recheck_seconds=float(os.environ.get('ENGINE_RECHECK_SECONDS', 30)),
+    )
+else:
+    pdf_engine = _make_engine(PDF_ENGINE)
 
 # Initialize certificate generator
 generator = CertificateGenerator(
     template_dir=TEMPLATE_DIR,
     template_name=TEMPLATE_NAME,
-    expected_template_sha256=None  # Set this to lock layout if needed
+    engine=pdf_engine,
+    expected_template_sha256=None,  # Set this to lock layout if needed
+    cache=render_cache,
+    bundle_dir=BUNDLE_DIR,
+    # Templates with window.applyCertData (v18) stay loaded; each certificate only re-fills the data
+    reuse_template_pages=os.environ.get('REUSE_TEMPLATE_PAGES', '0') == '1',
+    optimizer=pdf_optimizer,
+    overlay=overlay_renderer,
 )
 
+# Startup warm-up (see start_background_tasks): the engine starts and renders throwaway certificates,
+# one per render slot, before /ready reports ready. WARMUP=0 only starts the engine.
+WARMUP = os.environ.get('WARMUP', '1') == '1'
+warmup_state = {"ready": False, "seconds": None, "error": None}
+
+def _warmup_renders():
+    engine = generator.engine
+    if isinstance(engine, RenderFarm):
+        return engine.size * engine.pool_size
+    if hasattr(engine, 'pool'):
+        return engine.pool.size
+    return 1
+
+def _warm_up():
+    renders = int(os.environ.get('WARMUP_RENDERS', 0)) or _warmup_renders()
+    while True:
+        try:
+            started = time.perf_counter()
+            if WARMUP:
+                generator.warm_up(renders)
+            else:
+                generator.engine.start()
+            if overlay_renderer is not None and overlay_renderer.background(generator) is None:
+                print("⚠️  Template can't be rendered as an overlay; using the browser for every certificate")
+            warmup_state.update(ready=True, seconds=round(time.perf_counter() - started, 2), error=None)
+            print(f"✅ Ready after {warmup_state['seconds']}s" + (f" ({renders} warm-up renders)" if WARMUP else ""))
+            return
+        except Exception as e:
+            # e.g. Chromium missing or crashing: stay not-ready and try again
+            warmup_state["error"] = f"{type(e).__name__}: {e}"
+            print(f"⚠️  Warm-up failed, retrying: {warmup_state['error']}")
+            time.sleep(float(os.environ.get('WARMUP_RETRY_SECONDS', 10)))
+
+_background_started = False
+_background_lock = threading.Lock()
+
+def start_background_tasks():
+    """
+    Warm-up and retention sweeper, once per process. Called by every entry point: `python app.py`,
+    wsgi.py (gunicorn, waitress-serve) and, for anything else (`flask run`), the first request.
+    """
+    global _background_started
+    with _background_lock:
+        if _background_started:
+            return
+        _background_started = True
+    # Launch browsers and render a throwaway certificate in the background, so the first donor
+    # doesn't pay the cold start; /ready turns 200 once that's done
+    threading.Thread(target=_warm_up, name="warm-up", daemon=True).start()
+    retention_sweeper.start()
+
+@app.before_request
+def _ensure_background_tasks():
+    if not _background_started:
+        start_background_tasks()
+
+# Idempotent /generate: one render per (donation_id, payload) at a time, repeats reuse the stored result
+render_flights = SingleFlight()
+
+# Prometheus metrics (GET /metrics): per-stage render timings, request latency, PDF sizes
+metrics = Registry()
+STAGE_SECONDS = metrics.histogram(
+    'certificate_stage_seconds', 'Time per pipeline stage (validate, template, pool_wait, pdf, optimize, ...)', ['stage'])
+observe_stages(lambda stage, seconds: STAGE_SECONDS.observe(seconds, stage=stage))
+REQUEST_SECONDS = metrics.histogram(
+    'certificate_http_request_seconds', 'HTTP request latency (the frontend gives /generate 5s)', ['endpoint', 'method', 'status'])
+PDF_BYTES = metrics.histogram('certificate_pdf_bytes', 'Size of newly generated certificate PDFs', buckets=SIZE_BUCKETS)
+RENDERS = metrics.counter('certificate_renders_total',
+                          'Certificates rendered, copied from the render cache (cached) or returned from an earlier render (reused)',
+                          ['result'])
+
+def _certificate_path(cert_data):
+    """Unique, timestamped output path (relative to OUTPUT_DIR, in its YYYY/MM/xx shard)"""
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    # short render fingerprint: two payload versions rendered in the same second never collide
+    version = generator.cache_key(validate_data(cert_data))[:8]
+    filename = f"certificate_{safe_filename_part(cert_data.donation_id)}_{timestamp}_{version}.pdf"
+    return str(certificate_store.path_for(cert_data.donation_id, filename).relative_to(OUTPUT_DIR))
+
+# Renders still being written to OUTPUT_DIR, by flight key: a retry in between gets these bytes
+# instead of rendering (and writing) the same version again
+pending_writes = {}
+pending_writes_lock = threading.Lock()
+# /generate?inline=1 (or Accept: application/pdf) answers before its file is written and indexed
+persist_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="persist")
+
+def _persist(key, clean, fingerprint, path, pdf, written):
+    try:
+        generator.save(clean, pdf, path)
+        written.set_result(certificate_store.add(clean.donation_id, path, render_key=fingerprint))
+    except Exception as e:
+        app.logger.exception("Persisting %s failed", path.name)
+        written.set_exception(e)
+    finally:
+        with pending_writes_lock:
+            pending_writes.pop(key, None)
+
+def _render_once(cert_data, inline=False):
+    """
+    Render a certificate unless this exact donation payload was already rendered: the one
+    pipeline behind /generate (JSON and inline), /generate/batch and /jobs.
+
+    Concurrent calls for the same donation_id and payload wait on the render in progress, later
+    ones get the stored file; a changed payload (or template) renders a new version.
+    Returns (path, pdf, reused); pdf is None when the stored file is reused. With `inline` the
+    call may return before the file is written, otherwise it is on disk and indexed.
+    """
+    clean = validate_data(cert_data)
+    fingerprint = generator.cache_key(clean)
+    key = f"{clean.donation_id}:{fingerprint}"
+
+    def _render():
+        with pending_writes_lock:
+            pending = pending_writes.get(key)
+        if pending is not None:
+            return pending + ('reused',)
+        prior = certificate_store.latest(clean.donation_id)
+        if prior and prior.render_key == fingerprint and certificate_store.path(prior).exists():
+            return certificate_store.path(prior), None, None, 'reused'
+        pdf, cached = generator.fetch_or_render(clean, store_in_cache=False)
+        path = OUTPUT_DIR / _certificate_path(clean)
+        PDF_BYTES.observe(len(pdf))
+        if recent_certificates is not None:
+            recent_certificates.put(path.name, pdf)
+        written = Future()
+        with pending_writes_lock:
+            pending_writes[key] = (path, pdf, written)
+        if inline:
+            persist_executor.submit(_persist, key, clean, fingerprint, path, pdf, written)
+        else:
+            _persist(key, clean, fingerprint, path, pdf, written)
+        return path, pdf, written, 'cached' if cached else 'rendered'
+
+    (path, pdf, written, result), shared = render_flights.do(key, _render)
+    if written is not None and not inline:
+        written.result()  # the filename handed out must be downloadable
+    reused = shared or result == 'reused'
+    RENDERS.inc(result='reused' if reused else result)
+    return path, pdf, reused
+
+def _render_file(cert_data):
+    """(path, reused) of the stored certificate: the /generate/batch renderer"""
+    path, _, reused = _render_once(cert_data)
+    return path, reused
+
+def _render_job(cert_data):
+    """`JobQueue` worker: (filename, reused) once the certificate is stored"""
+    path, reused = _render_file(cert_data)
+    return path.name, reused
+
+def _certificate_bytes(path):
+    data = recent_certificates.get(path.name) if recent_certificates is not None else None
+    return data if data is not None else path.read_bytes()
+
+def _wants_inline_pdf():
+    if request.args.get('inline', '0') == '1':
+        return True
+    return request.accept_mimetypes.best_match(['application/json', 'application/pdf']) == 'application/pdf'
+
+# Background renders for clients that can't wait on /generate (POST /jobs, then poll GET /jobs/<id>)
+render_jobs = JobQueue(
+    _render_job,
+    workers=int(os.environ.get('JOB_WORKERS', 2)),
+    max_pending=int(os.environ.get('JOB_MAX_PENDING', 100)),
+)
+
+def _pool_utilization():
+    engine = generator.engine
+    if isinstance(engine, RenderFarm):
+        workers = engine.stats()["workers"]
+        busy, capacity = sum(w["in_flight"] for w in workers), len(workers) * engine.pool_size
+    elif hasattr(engine, 'pool'):
+        stats = engine.pool.stats()
+        busy, capacity = stats["busy"], stats["size"]
+    elif hasattr(engine, 'max_concurrent_pages'):
+        busy, capacity = engine.stats()["in_flight"], engine.max_concurrent_pages
+    else:
+        return None
+    return {("busy",): busy, ("capacity",): capacity}
+
+def _cache_lookups():
+    values = {}
+    for name, cache in (("render", render_cache), ("download", recent_certificates)):
+        if cache is not None:
+            stats = cache.stats()
+            values[(name, "hit")] = stats["hits"]
+            values[(name, "miss")] = stats["misses"]
+    return values
+
+def _farm_restarts():
+    if not isinstance(generator.engine, RenderFarm):
+        return None
+    stats = generator.engine.stats()
+    return {("exit",): stats["restarts"], ("timeout",): stats["timeouts"], ("memory",): stats["recycled_for_memory"]}
+
+def _router_engines(field):
+    if not isinstance(generator.engine, RoutingEngine):
+        return None
+    return {(e["name"],): field(e) for e in generator.engine.stats()["engines"] if field(e) is not None}
+
+def _router_hedges():
+    if not isinstance(generator.engine, RoutingEngine):
+        return None
+    engines = generator.engine.stats()["engines"]
+    return {("started",): sum(e["hedges"] for e in engines), ("won",): sum(e["hedge_wins"] for e in engines)}
+
+metrics.callback('certificate_job_queue', 'Background jobs by state', lambda: {
+    ("queued",): render_jobs.depth()["queued"], ("running",): render_jobs.depth()["running"]}, ['state'])
+metrics.callback('certificate_renders_in_flight', 'Distinct /generate renders in progress', render_flights.in_flight)
+metrics.callback('certificate_render_slots', 'Browser render slots (pages/browsers) busy vs. available',
+                 _pool_utilization, ['state'])
+metrics.callback('certificate_cache_lookups_total', 'Render cache and in-memory download cache lookups',
+                 _cache_lookups, ['cache', 'result'], kind='counter')
+metrics.callback('certificate_render_worker_restarts_total', 'Render farm worker restarts by reason',
+                 _farm_restarts, ['reason'], kind='counter')
+metrics.callback('certificate_engine_latency_seconds', 'Recent render latency per routed engine (EWMA)',
+                 lambda: _router_engines(lambda e: e["ewma_ms"] and e["ewma_ms"] / 1000), ['engine'])
+metrics.callback('certificate_engine_circuit_open', 'Routed engines taking no renders (1) after repeated failures',
+                 lambda: _router_engines(lambda e: int(e["state"] == "open")), ['engine'])
+metrics.callback('certificate_engine_hedges_total', 'Renders also started on a second engine, and how many it answered first',
+                 _router_hedges, ['result'], kind='counter')
+
+@app.before_request
+def _start_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def _observe_request(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        REQUEST_SECONDS.observe(time.perf_counter() - started,
+                                endpoint=endpoint, method=request.method, status=response.status_code)
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    return Response(metrics.render(), content_type=CONTENT_TYPE)
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({"status": "healthy", "service": "certificate-generator"})
 
+@app.route('/ready', methods=['GET'])
+def ready_check():
+    """Readiness: 503 until the startup warm-up render has finished, or once the render farm gave up on a worker"""
+    engine_healthy = getattr(generator.engine, 'healthy', True)
+    ready = warmup_state["ready"] and engine_healthy
+    return jsonify({"service": "certificate-generator", **warmup_state, "ready": ready,
+                    "engine_healthy": engine_healthy}), 200 if ready else 503
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """Render cache hit/miss counters"""
+    if render_cache is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **render_cache.stats()})
+
+@app.route('/optimizer/stats', methods=['GET'])
+def optimizer_stats():
+    """PDF optimizer totals (documents, bytes before/after)"""
+    if pdf_optimizer is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **pdf_optimizer.stats()})
+
+@app.route('/overlay/stats', methods=['GET'])
+def overlay_stats():
+    """Overlay renders vs. browser fallbacks"""
+    if overlay_renderer is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **overlay_renderer.stats()})
+
+@app.route('/render-farm/stats', methods=['GET'])
+def render_farm_stats():
+    """Render worker processes (PDF_ENGINE=farm): in-flight renders, memory, restarts"""
+    if not isinstance(generator.engine, RenderFarm):
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **generator.engine.stats()})
+
+@app.route('/engine-router/stats', methods=['GET'])
+def engine_router_stats():
+    """Routed engines (PDF_ENGINE=router): latency, circuit state, hedges"""
+    if not isinstance(generator.engine, RoutingEngine):
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **generator.engine.stats()})
+
+@app.route('/downloads/stats', methods=['GET'])
+def download_stats():
+    """In-memory cache of recently generated certificates (hits are downloads served from memory)"""
+    if recent_certificates is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **recent_certificates.stats()})
+
+@app.route('/retention/stats', methods=['GET'])
+def retention_stats():
+    """Background retention sweeper: settings, files migrated/deleted, last sweep"""
+    return jsonify(retention_sweeper.stats())
+
+@app.route('/templates/reload', methods=['POST'])
+def reload_templates():
+    """Recompile templates after editing them (renders never re-check template files)"""
+    try:
+        changed = generator.reload_templates()
+    except Exception as e:
+        return jsonify({"error": f"Reload error: {str(e)}"}), 500
+    return jsonify({"success": True, "changed": changed, "template_sha256": generator.template_sha256()})
+
 @app.route('/generate', methods=['POST'])
 def generate_certificate():
     """Generate certificate PDF from donation data"""
     try:
         data = request.get_json()
 
-        # Validate required fields
-        required_fields = ['donor_name', 'amount', 'donation_id', 'donation_date']
-        for field in required_fields:
-            if field not in data:
-                return jsonify({"error": f"Missing required field: {field}"}), 400
-
-        # Parse and create certificate data
         try:
-            donation_date = datetime.strptime(data['donation_date'], '%Y-%m-%d').date()
-        except ValueError:
-            return jsonify({"error": "Invalid date format. Use YYYY-MM-DD"}), 400
-
-        cert_data = CertificateData(
-            donor_name=str(data['donor_name']).strip(),
-            amount_in_inr=Decimal(str(data['amount'])),
-            donation_id=str(data['donation_id']).strip(),
-            donation_date=donation_date,
-            payment_mode=data.get('payment_mode'),
-            org_name=data.get('org_name', 'Shri Raghavendra Swamy Brundavana Sannidhi, Halasuru'),
-            org_subtitle=data.get('org_subtitle', 'Guru Seva Mandali (Regd.)'),
-            show_80g_note=data.get('show_80g_note', True),
-            extra_meta=data.get('extra_meta')
-        )
-
-        # Generate unique filename
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"certificate_{data['donation_id']}_{timestamp}.pdf"
-        output_path = OUTPUT_DIR / filename
-
-        # Generate certificate
-        generator.generate(cert_data, output_path)
+            cert_data = parse_certificate_request(data)
+        except ValidationError as e:
+            return jsonify({"error": str(e)}), 400
+
+        if _wants_inline_pdf():
+            path, pdf, reused = _render_once(cert_data, inline=True)
+            if pdf is None:
+                pdf = _certificate_bytes(path)
+            response = send_file(
+                io.BytesIO(pdf),
+                as_attachment=True,
+                download_name=path.name,
+                mimetype='application/pdf',
+                etag=hashlib.sha256(pdf).hexdigest(),
+            )
+            response.headers['X-Certificate-Reused'] = '1' if reused else '0'
+            response.headers['X-Certificate-Filename'] = path.name
+            return response
+
+        # Generate certificate (or reuse the one already rendered for this donation)
+        path, _, reused = _render_once(cert_data)
+        filename = path.name
 
         return jsonify({
             "success": True,
             "filename": filename,
-            "message": "Certificate generated successfully"
+            "reused": reused,
+            "message": "Certificate already generated" if reused else "Certificate generated successfully"
         })
 
     except ValidationError as e:
@@ -92,63 +540,217 @@ def generate_certificate():
     except Exception as e:
         return jsonify({"error": f"Internal server error: {str(e)}"}), 500
 
+@app.route('/generate/batch', methods=['POST'])
+def generate_certificate_batch():
+    """Generate many certificates, streaming one JSON result per line as each finishes"""
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        records = data.get('records')
+        max_workers = data.get('max_workers', BATCH_MAX_WORKERS)
+    else:
+        records, max_workers = data, BATCH_MAX_WORKERS
+
+    if not isinstance(records, list) or not records:
+        return jsonify({"error": "Body must be a non-empty list of records or {\"records\": [...]}"}), 400
+    try:
+        max_workers = max(1, min(int(max_workers), BATCH_MAX_WORKERS))
+    except (TypeError, ValueError):
+        return jsonify({"error": "max_workers must be an integer"}), 400
+
+    def _stream():
+        # each record goes through /generate's path: shared flights, reuse of stored renders, index
+        for result in generator.generate_batch(records, max_workers=max_workers, render=_render_file):
+            yield json.dumps(result.to_dict(), ensure_ascii=False) + "\n"
+
+    return Response(_stream(), mimetype='application/x-ndjson')
+
+@app.route('/statement', methods=['POST'])
+def generate_statement():
+    """One PDF for a donor's donations: a page per certificate, or a summary table (summary: true)"""
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        records, summary = data.get('donations'), bool(data.get('summary', False))
+    else:
+        records, summary = data, False
+    if not isinstance(records, list) or not records:
+        return jsonify({"error": "Body must be a non-empty list of donations or {\"donations\": [...]}"}), 400
+
+    try:
+        donations = []
+        for index, record in enumerate(records):
+            try:
+                donations.append(parse_certificate_request(record))
+            except ValidationError as e:
+                raise ValidationError(f"donations[{index}]: {e}") from None
+        pdf = generator.generate_statement(donations, summary=summary)
+    except ValidationError as e:
+        return jsonify({"error": f"Validation error: {str(e)}"}), 400
+    except Exception as e:
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+    dates = sorted(d.donation_date for d in donations)
+    kind = 'summary' if summary else 'statement'
+    return send_file(
+        io.BytesIO(pdf),
+        as_attachment=True,
+        download_name=f"{kind}_{safe_filename_part(donations[0].donor_name)}_{dates[0]:%Y%m%d}_{dates[-1]:%Y%m%d}.pdf",
+        mimetype='application/pdf',
+        etag=hashlib.sha256(pdf).hexdigest(),
+    )
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """Queue a certificate render and return a job id immediately"""
+    try:
+        cert_data = parse_certificate_request(request.get_json(silent=True))
+        job = render_jobs.submit(cert_data.donation_id, validate_data(cert_data))
+    except ValidationError as e:
+        return jsonify({"error": str(e)}), 400
+    except QueueFull as e:
+        response = jsonify({"error": str(e)})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+
+    return jsonify({
+        "success": True,
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.id}"
+    }), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Poll a queued render: queued / running / done / failed"""
+    job = render_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict())
+
+def _send_certificate(cert):
+    """
+    Send an indexed certificate PDF as an attachment.
+
+    The ETag is the PDF's SHA-256, so a re-opened link gets a 304 (If-None-Match) and
+    partial downloads can resume (Range); recently generated PDFs are served from memory.
+    """
+    data = recent_certificates.get(cert.filename) if recent_certificates is not None else None
+    if data is not None:
+        source = io.BytesIO(data)
+    else:
+        source = certificate_store.path(cert)
+        if not source.exists():
+            return jsonify({"error": "Certificate not found"}), 404
+    response = send_file(
+        source,
+        as_attachment=True,
+        download_name=cert.filename,
+        mimetype='application/pdf',
+        conditional=True,
+        etag=cert.sha256,
+        last_modified=cert.created_at,
+        max_age=DOWNLOAD_MAX_AGE,
+    )
+    # donor receipts: browsers may keep them, shared proxies may not
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.cache_control.immutable = True
+    return response
+
 @app.route('/download/<filename>', methods=['GET'])
 def download_certificate(filename):
     """Download generated certificate PDF"""
     try:
-        file_path = OUTPUT_DIR / filename
-
-        if not file_path.exists():
+        cert = certificate_store.get(filename)
+        if cert is None:
             return jsonify({"error": "Certificate not found"}), 404
+        return _send_certificate(cert)
 
-        return send_file(
-            file_path,
-            as_attachment=True,
-            download_name=filename,
-            mimetype='application/pdf'
-        )
-
+    except HTTPException:
+        raise  # e.g. 416 for an unsatisfiable Range
     except Exception as e:
         return jsonify({"error": f"Download error: {str(e)}"}), 500
 
 @app.route('/certificates', methods=['GET'])
 def list_certificates():
-    """List all generated certificates"""
+    """List generated certificates, newest first (?limit=50&cursor=<next_cursor>)"""
     try:
-        certificates = []
-        for file_path in OUTPUT_DIR.glob('*.pdf'):
-            stat = file_path.stat()
-            certificates.append({
-                'filename': file_path.name,
-                'size': stat.st_size,
-                'created': datetime.fromtimestamp(stat.st_ctime).isoformat()
-            })
-
-        # Sort by creation time (newest first)
-        certificates.sort(key=lambda x: x['created'], reverse=True)
-
+        limit = max(1, min(int(request.args.get('limit', 50)), 500))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    try:
+        certificates, next_cursor = certificate_store.page(limit, request.args.get('cursor'))
         return jsonify({
-            "certificates": certificates,
-            "total": len(certificates)
+            "certificates": [c.to_dict() for c in certificates],
+            "total": certificate_store.count(),
+            "next_cursor": next_cursor
         })
 
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
     except Exception as e:
         return jsonify({"error": f"List error: {str(e)}"}), 500
 
+@app.route('/export', methods=['GET'])
+def export_certificates():
+    """Stream a ZIP of stored certificates (?from=YYYY-MM-DD&to=YYYY-MM-DD and/or ?prefix=<donation_id prefix>)"""
+    prefix = request.args.get('prefix') or None
+    try:
+        start = date.fromisoformat(request.args['from']) if request.args.get('from') else None
+        end = date.fromisoformat(request.args['to']) if request.args.get('to') else None
+    except ValueError:
+        return jsonify({"error": "from/to must be dates (YYYY-MM-DD)"}), 400
+    if start is None and end is None and prefix is None:
+        return jsonify({"error": "Give a date range (from/to) and/or a donation_id prefix"}), 400
+
+    try:
+        certs = certificate_store.select(
+            created_from=time.mktime(start.timetuple()) if start else None,
+            # `to` is inclusive: everything before the next midnight
+            created_to=time.mktime((end + timedelta(days=1)).timetuple()) if end else None,
+            donation_prefix=prefix,
+        )
+        # run the first query now: once the response has started, an error can only cut the ZIP short
+        first = next(certs, None)
+    except Exception as e:
+        return jsonify({"error": f"Export error: {str(e)}"}), 500
+    if first is not None:
+        certs = chain([first], certs)
+    name = "_".join(["certificates"] + [str(v) for v in (start, end) if v] + ([safe_filename_part(prefix)] if prefix else []))
+    return Response(
+        stream_zip(certificate_store, certs),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename="{name}.zip"'},
+    )
+
+@app.route('/certificates/<donation_id>', methods=['GET'])
+def donation_certificates(donation_id):
+    """All certificate versions rendered for one donation, newest first"""
+    certificates = certificate_store.for_donation(donation_id)
+    if not certificates:
+        return jsonify({"error": "No certificate for this donation"}), 404
+    return jsonify({
+        "donation_id": donation_id,
+        "latest": certificates[0].to_dict(),
+        "certificates": [c.to_dict() for c in certificates]
+    })
+
+@app.route('/certificates/<donation_id>/download', methods=['GET'])
+def download_donation_certificate(donation_id):
+    """Download the latest certificate for a donation without knowing its filename"""
+    cert = certificate_store.latest(donation_id)
+    if cert is None:
+        return jsonify({"error": "No certificate for this donation"}), 404
+    return _send_certificate(cert)
+
 @app.route('/cleanup', methods=['POST'])
 def cleanup_certificates():
     """Clean up old certificates (older than specified hours)"""
     try:
-        data = request.get_json() or {}
+        data = request.get_json(silent=True) or {}
         max_age_hours = data.get('max_age_hours', 24)
 
         cutoff_time = datetime.now().timestamp() - (max_age_hours * 3600)
-        deleted_count = 0
-
-        for file_path in OUTPUT_DIR.glob('*.pdf'):
-            if file_path.stat().st_ctime < cutoff_time:
-                file_path.unlink()
-                deleted_count += 1
+        deleted_count = certificate_store.delete_older_than(cutoff_time)
 
         return jsonify({
             "success": True,
@@ -166,6 +768,17 @@ if __name__ == '__main__':
     print(f"🔥 Certificate Generator API starting on port {port}")
     print(f"📁 Output directory: {OUTPUT_DIR}")
     print(f"📄 Template: {TEMPLATE_DIR / TEMPLATE_NAME}")
-    print(f"🌐 Health check: http://localhost:{port}/health")
+    print(f"🌐 Health check: http://localhost:{port}/health (ready: /ready)")
+
+    start_background_tasks()
+
+    # SIGTERM (docker stop) unwinds through atexit: in-flight renders finish, workers stop
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
 
-    app.run(host='0.0.0.0', port=port, debug=False)
+    if serve is not None and os.environ.get('SERVER', 'waitress') == 'waitress':
+        # a request thread mostly waits on a render: size HTTP_THREADS above the render concurrency
+        serve(app, host='0.0.0.0', port=port, threads=int(os.environ.get('HTTP_THREADS', 32)))
+    else:
+        # threaded=True: with the async engine a blocked request thread is cheap, the
+        # renders themselves are multiplexed on one browser's event loop
+        app.run(host='0.0.0.0', port=port, debug=False, threaded=True)
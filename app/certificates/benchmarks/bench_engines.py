@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Engine throughput comparison: PlaywrightEngine vs the browser-free WeasyPrintEngine, for both
+bundled templates, rendering in this process through `CertificateGenerator`.
+
+Engines compared (unavailable ones are skipped):
+- playwright: warm browser pool,
+- weasyprint: cached fonts, parsed stylesheets and decoded images,
+- weasyprint-uncached: a fresh `HTML(...).write_pdf()` per certificate (the previous behaviour).
+
+WeasyPrint runs no JavaScript, so the v18 template prints its placeholders there; the numbers
+show what a render costs, not that the output matches.
+
+    python benchmarks/bench_engines.py --count 40 --concurrency 1 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_pipeline import (  # noqa: E402
+    ROOT,
+    TEMPLATE_DIR,
+    TEMPLATES,
+    _PeakRss,
+    _record,
+    _run_concurrent,
+    _summarize,
+)
+from lib.certificate_generator import (  # noqa: E402
+    BrowserPool,
+    CertificateGenerator,
+    PdfEngineBase,
+    PlaywrightEngine,
+    WeasyPrintEngine,
+    _playwright_available,
+    _weasyprint_available,
+    parse_certificate_request,
+)
+
+ENGINES = ("playwright", "weasyprint", "weasyprint-uncached")
+
+
+class _UncachedWeasyPrint(PdfEngineBase):
+    """A new WeasyPrintEngine (fonts, stylesheets, images) for every certificate."""
+
+    base_url = None
+
+    def render_pdf_bytes(self, html: str) -> bytes:
+        return WeasyPrintEngine(self.base_url).render_pdf_bytes(html)
+
+
+def _make_engine(name: str, pool_size: int) -> PdfEngineBase:
+    if name == "playwright":
+        return PlaywrightEngine(BrowserPool(size=pool_size, block_remote=True))
+    if name == "weasyprint":
+        return WeasyPrintEngine()
+    return _UncachedWeasyPrint()
+
+
+def _available(name: str) -> bool:
+    return _playwright_available() if name == "playwright" else _weasyprint_available()
+
+
+def bench(name: str, template: str, concurrency: int, args) -> Dict[str, Any]:
+    engine = _make_engine(name, args.pool_size)
+    gen = CertificateGenerator(TEMPLATE_DIR, template, engine=engine, bundle_dir=args.bundle_dir)
+    try:
+        with _PeakRss(os.getpid()) as rss:
+            start = time.perf_counter()
+            engine.start()
+            first = gen.generate_bytes(parse_certificate_request(_record(0)))
+            cold = time.perf_counter() - start
+            latencies, wall, sizes = _run_concurrent(
+                lambda i: len(gen.generate_bytes(parse_certificate_request(_record(i)))),
+                args.count, concurrency, offset=1,
+            )
+        return _summarize(cold, latencies, wall, [len(first)] + sizes, rss.peak)
+    finally:
+        gen.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=list(ENGINES))
+    parser.add_argument("--templates", nargs="+", default=list(TEMPLATES))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--count", type=int, default=20, help="warm certificates per run")
+    parser.add_argument("--pool-size", type=int, default=4, help="browsers in the Playwright pool")
+    parser.add_argument("--bundle-dir", type=Path, default=ROOT / "bundled" if (ROOT / "bundled").is_dir() else None)
+    parser.add_argument("--out", type=Path, default=None, help="also write the results as JSON")
+    args = parser.parse_args()
+
+    results: List[Dict[str, Any]] = []
+    for name in args.engines:
+        if not _available(name):
+            print(f"skipping {name}: not installed", file=sys.stderr)
+            continue
+        for template in args.templates:
+            for concurrency in args.concurrency:
+                r = bench(name, template, concurrency, args)
+                r.update(engine=name, template=template, concurrency=concurrency)
+                results.append(r)
+                print(
+                    f'{name:<20} {template:<40} c={concurrency:<3} cold {r["cold_ms"]:>8} ms  '
+                    f'p50 {r["warm_ms"]["p50"]:>7} ms  p95 {r["warm_ms"]["p95"]:>7} ms  '
+                    f'{r["certificates_per_second"]:>7} cert/s  {r["peak_rss_mb"]:>7} MB'
+                )
+
+    # throughput relative to Playwright for the same template and concurrency
+    base = {(r["template"], r["concurrency"]): r for r in results if r["engine"] == "playwright"}
+    for r in results:
+        ref = base.get((r["template"], r["concurrency"]))
+        if ref is not None and r is not ref:
+            r["vs_playwright"] = round(r["certificates_per_second"] / ref["certificates_per_second"], 2)
+            print(f'{r["engine"]} / playwright, {r["template"]} c={r["concurrency"]}: {r["vs_playwright"]}x')
+
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(json.dumps({"results": results}, indent=2))
+        print(f"results: {args.out}")
+    return 0 if results else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+End-to-end benchmark: certificates rendered directly (`CertificateGenerator`) and through the
+HTTP API (`app.py` started on a free port), for both bundled templates.
+
+For each (mode, template, concurrency) it reports:
+- cold: engine start (browser launch) + first certificate, or server start + first /generate,
+- warm latency percentiles (p50/p90/p95/p99) and certificates per second,
+- peak RSS of the process tree (Python + Chromium), and PDF size.
+
+Runs fully offline (remote assets are blocked; bundle templates first to measure with their real
+fonts), writes results as JSON, and with `--compare` fails when warm p95 or throughput regressed
+by more than `--max-regression` against an earlier run:
+
+    python benchmarks/bench_pipeline.py --mode both --concurrency 1 4 --count 40
+    python benchmarks/bench_pipeline.py --compare benchmarks/results/baseline.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from lib.certificate_generator import (  # noqa: E402
+    BrowserPool,
+    CertificateGenerator,
+    PdfOptimizer,
+    parse_certificate_request,
+    pick_engine,
+)
+from lib.render_farm import RenderFarm, _tree_rss  # noqa: E402
+
+TEMPLATE_DIR = ROOT / "templates"
+TEMPLATES = ("certificate_template.html", "donation_certificate_temple_v18.html")
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)  # nearest rank
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def _record(i: int) -> Dict[str, Any]:
+    # distinct donation IDs and amounts: every certificate is a real render, never a cache hit
+    return {
+        "donor_name": f"Benchmark Donor {i}",
+        "amount": str(Decimal(1000 + i * 37).quantize(Decimal("0.01"))),
+        "donation_id": f"BENCH-{os.getpid()}-{i:05d}",
+        "donation_date": date(2025, 10, 18).isoformat(),
+    }
+
+
+class _PeakRss:
+    """Samples the RSS of a process tree in the background; `peak` in bytes."""
+
+    def __init__(self, pid: int, interval: float = 0.05):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self) -> "_PeakRss":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            self.peak = max(self.peak, _tree_rss(self.pid) or 0)
+            if self._stop.wait(self.interval):
+                return
+
+
+def _summarize(cold: float, latencies: List[float], wall: float, sizes: List[int], peak_rss: int) -> Dict[str, Any]:
+    return {
+        "cold_ms": round(cold * 1000, 1),
+        "warm_ms": {f"p{q}": round(_percentile(latencies, q) * 1000, 1) for q in (50, 90, 95, 99)},
+        "certificates_per_second": round(len(latencies) / wall, 2),
+        "peak_rss_mb": round(peak_rss / (1024 * 1024), 1),
+        "pdf_bytes": {"mean": round(sum(sizes) / len(sizes)), "max": max(sizes)},
+        "count": len(latencies),
+    }
+
+
+def _run_concurrent(fn: Callable[[int], int], count: int, concurrency: int, offset: int) -> tuple:
+    latencies: List[float] = []
+    sizes: List[int] = []
+
+    def _one(i: int) -> None:
+        start = time.perf_counter()
+        size = fn(offset + i)
+        latencies.append(time.perf_counter() - start)
+        sizes.append(size)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        list(ex.map(_one, range(count)))
+    return latencies, time.perf_counter() - start, sizes
+
+
+# ---- direct: CertificateGenerator in this process --------------------------------
+def _make_engine(args):
+    if args.engine == "farm":
+        return RenderFarm(workers=args.workers, pool_size=args.pool_size, block_remote=True)
+    return pick_engine(
+        args.engine,
+        pool=BrowserPool(size=args.pool_size, block_remote=True),
+        max_concurrent_pages=args.pool_size,
+        block_remote=True,
+    )
+
+
+def bench_direct(args, template: str, concurrency: int) -> Dict[str, Any]:
+    engine = _make_engine(args)
+    gen = CertificateGenerator(
+        TEMPLATE_DIR, template, engine=engine, bundle_dir=args.bundle_dir,
+        optimizer=PdfOptimizer() if args.optimize else None,
+    )
+    try:
+        with _PeakRss(os.getpid()) as rss:
+            start = time.perf_counter()
+            engine.start()
+            first = gen.generate_bytes(parse_certificate_request(_record(0)))
+            cold = time.perf_counter() - start
+            latencies, wall, sizes = _run_concurrent(
+                lambda i: len(gen.generate_bytes(parse_certificate_request(_record(i)))),
+                args.count, concurrency, offset=1,
+            )
+        return _summarize(cold, latencies, wall, [len(first)] + sizes, rss.peak)
+    finally:
+        gen.close()
+
+
+# ---- http: app.py as a subprocess -------------------------------------------------
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _post_generate(base: str, record: Dict[str, Any]) -> int:
+    req = urllib.request.Request(
+        f"{base}/generate?inline=1", data=json.dumps(record).encode(),
+        headers={"Content-Type": "application/json"}, method="POST",
+    )
+    with urllib.request.urlopen(req, timeout=120) as resp:
+        return len(resp.read())
+
+
+def bench_http(args, template: str, concurrency: int) -> Dict[str, Any]:
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            CERTIFICATE_PORT=str(port),
+            CERTIFICATE_TEMPLATE=template,
+            PDF_ENGINE=args.engine,
+            BROWSER_POOL_SIZE=str(args.pool_size),
+            ASYNC_MAX_PAGES=str(args.pool_size),
+            BLOCK_REMOTE_ASSETS="1",
+            PDF_OPTIMIZE="1" if args.optimize else "0",
+            RENDER_CACHE="0",
+            OUTPUT_DIR=str(Path(tmp) / "output"),
+            CERTIFICATE_INDEX=str(Path(tmp) / "certificates.db"),
+            LOG_LEVEL="WARNING",
+        )
+        if args.bundle_dir:
+            env["TEMPLATE_BUNDLE_DIR"] = str(args.bundle_dir)
+        if args.workers:
+            env["RENDER_WORKERS"] = str(args.workers)
+        start = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, "app.py"], cwd=str(ROOT), env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            with _PeakRss(server.pid) as rss:
+                deadline = time.monotonic() + 120
+                while True:
+                    try:
+                        urllib.request.urlopen(f"{base}/health", timeout=1).close()
+                        break
+                    except (urllib.error.URLError, ConnectionError):
+                        if server.poll() is not None or time.monotonic() > deadline:
+                            raise RuntimeError("certificate service did not start") from None
+                        time.sleep(0.1)
+                first = _post_generate(base, _record(0))
+                cold = time.perf_counter() - start
+                latencies, wall, sizes = _run_concurrent(
+                    lambda i: _post_generate(base, _record(i)), args.count, concurrency, offset=1,
+                )
+            return _summarize(cold, latencies, wall, [first] + sizes, rss.peak)
+        finally:
+            server.terminate()
+            try:
+                server.wait(60)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+
+# ---- reporting --------------------------------------------------------------------
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=str(ROOT), capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _compare(results: List[Dict[str, Any]], baseline_path: Path, max_regression: float) -> List[str]:
+    baseline = {
+        (r["mode"], r["template"], r["concurrency"]): r
+        for r in json.loads(baseline_path.read_text())["results"]
+    }
+    failures = []
+    for r in results:
+        old = baseline.get((r["mode"], r["template"], r["concurrency"]))
+        if old is None:
+            continue
+        label = f'{r["mode"]} {r["template"]} c={r["concurrency"]}'
+        p95, old_p95 = r["warm_ms"]["p95"], old["warm_ms"]["p95"]
+        if p95 > old_p95 * (1 + max_regression):
+            failures.append(f"{label}: warm p95 {old_p95} -> {p95} ms")
+        cps, old_cps = r["certificates_per_second"], old["certificates_per_second"]
+        if cps < old_cps * (1 - max_regression):
+            failures.append(f"{label}: throughput {old_cps} -> {cps} certificates/s")
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--mode", choices=["direct", "http", "both"], default="direct")
+    parser.add_argument("--templates", nargs="+", default=list(TEMPLATES))
+    parser.add_argument("--engine", default="playwright", help="playwright, playwright-async, weasyprint or farm")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--count", type=int, default=20, help="warm certificates per run")
+    parser.add_argument("--pool-size", type=int, default=4, help="browsers (or async pages) per engine")
+    parser.add_argument("--workers", type=int, default=None, help="render farm workers (--engine farm)")
+    parser.add_argument("--bundle-dir", type=Path, default=ROOT / "bundled" if (ROOT / "bundled").is_dir() else None)
+    parser.add_argument("--optimize", action="store_true", help="post-process PDFs (PdfOptimizer)")
+    parser.add_argument("--out", type=Path, default=None, help="results JSON (default: benchmarks/results/<time>.json)")
+    parser.add_argument("--compare", type=Path, default=None, help="earlier results JSON to check against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed relative slowdown (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    modes = ["direct", "http"] if args.mode == "both" else [args.mode]
+    runners = {"direct": bench_direct, "http": bench_http}
+    results = []
+    print(f"{'mode':7} {'template':40} {'c':>3} {'cold ms':>9} {'p50':>8} {'p95':>8} {'p99':>8} "
+          f"{'cert/s':>7} {'RSS MB':>7} {'PDF KB':>7}")
+    for mode in modes:
+        for template in args.templates:
+            for concurrency in args.concurrency:
+                r = runners[mode](args, template, concurrency)
+                r.update(mode=mode, template=template, concurrency=concurrency)
+                results.append(r)
+                w = r["warm_ms"]
+                print(f"{mode:7} {template:40} {concurrency:>3} {r['cold_ms']:>9.0f} {w['p50']:>8.0f} "
+                      f"{w['p95']:>8.0f} {w['p99']:>8.0f} {r['certificates_per_second']:>7.2f} "
+                      f"{r['peak_rss_mb']:>7.0f} {r['pdf_bytes']['mean'] / 1024:>7.0f}")
+
+    out = args.out or RESULTS_DIR / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps({
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "settings": {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()},
+        "results": results,
+    }, indent=2))
+    print(f"\nResults written to {out}")
+
+    if args.compare:
+        failures = _compare(results, args.compare, args.max_regression)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        return 1 if failures else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Micro-benchmark: template -> HTML cost per certificate (no browser involved).
+
+Compares, for both bundled templates:
+- `per-request get_template`: a Jinja environment with auto_reload, fetching the template on every
+  render (the mtime check the old renderer paid per request),
+- `registry`: `TemplateRenderer`'s precompiled registry,
+and the regex vs. non-regex Indian-grouping formatter.
+
+    python benchmarks/bench_templates.py [--iterations 200]
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+import time
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from jinja2 import Environment, FileSystemLoader, StrictUndefined, select_autoescape  # noqa: E402
+
+from lib.certificate_generator import (  # noqa: E402
+    CertificateData,
+    CertificateGenerator,
+    PdfEngineBase,
+    TemplateRenderer,
+    _inject_cert_data,
+    cert_payload,
+    validate_data,
+)
+
+TEMPLATE_DIR = Path(__file__).resolve().parent.parent / "templates"
+TEMPLATES = ("certificate_template.html", "donation_certificate_temple_v18.html")
+
+
+class _NoEngine(PdfEngineBase):
+    """Only the HTML stage is measured."""
+
+
+def _fmt_inr_regex(value: Decimal) -> str:
+    # the formatter TemplateRenderer used before the registry change
+    whole, dot, frac = str(value).partition(".")
+    if len(whole) > 3:
+        head, tail = whole[:-3], whole[-3:]
+        head = re.sub(r"(\d)(?=(\d{2})+(?!\d))", r"\1,", head)
+        whole = f"{head},{tail}"
+    return f"₹{whole}{dot}{frac[:2] if frac else '00'}"
+
+
+def _per_call_us(fn, iterations: int) -> float:
+    fn()  # warm up (first compile is not what we measure)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    data = validate_data(CertificateData(
+        donor_name="Benchmark Donor",
+        amount_in_inr=Decimal("123456.50"),
+        donation_id="DN-20251018-0001",
+        donation_date=date(2025, 10, 18),
+    ))
+
+    print(f"{'template':42} {'per-request get_template':>26} {'registry':>12}")
+    for name in TEMPLATES:
+        gen = CertificateGenerator(TEMPLATE_DIR, name, engine=_NoEngine())
+        legacy = Environment(
+            loader=FileSystemLoader(str(TEMPLATE_DIR)),
+            undefined=StrictUndefined,
+            autoescape=select_autoescape(["html", "xml"]),
+            trim_blocks=True,
+            lstrip_blocks=True,
+        )
+        legacy.filters.update(gen.renderer.env.filters)
+        legacy.filters["inr"] = _fmt_inr_regex
+        context = {
+            "donor_name": data.donor_name, "amount": data.amount_in_inr, "donation_id": data.donation_id,
+            "donation_date": data.donation_date, "org_name": data.org_name, "org_subtitle": data.org_subtitle,
+            "show_80g_note": data.show_80g_note, "payment_mode": data.payment_mode, "extra_meta": {},
+            "rendered_at": "18 Oct 2025, 12:00 UTC",
+        }
+        payload = cert_payload(data)
+
+        def _legacy():
+            _inject_cert_data(legacy.get_template(name).render(**context), payload)
+
+        def _registry():
+            gen._render_html(data)
+
+        print(f"{name:42} {_per_call_us(_legacy, args.iterations):>23.1f} µs "
+              f"{_per_call_us(_registry, args.iterations):>9.1f} µs")
+
+    amounts = [Decimal(n).quantize(Decimal("0.01")) for n in (501, 12345, 1234567, 987654321)]
+    n = args.iterations * 50
+    regex_us = _per_call_us(lambda: [_fmt_inr_regex(a) for a in amounts], n) / len(amounts)
+    fast_us = _per_call_us(lambda: [TemplateRenderer._fmt_inr(a) for a in amounts], n) / len(amounts)
+    print(f"\n{'inr formatter':42} {'regex':>26} {'non-regex':>12}")
+    print(f"{'':42} {regex_us:>23.2f} µs {fast_us:>9.2f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,22 +2,177 @@
 # -*- coding: utf-8 -*-
 
 """
-Exact, deterministic PDF generator for the 'donation_certificate_temple_v18.html' template.
+Deterministic certificate generator (HTML -> PDF).
 
-- Uses Playwright (Chromium) to render your HTML exactly as-is.
-- Only injects `window.CERT_DATA` (donorName, amountINR/amountText, donationId, donationDate, reasonText).
-- Locks page size (A4) and prints backgrounds for fidelity.
+- Uses Jinja2 to render HTML with strict escaping, and injects `window.CERT_DATA` so the
+  data-driven 'donation_certificate_temple_v18.html' template renders through the same pipeline.
+- Uses Playwright (Chromium) to print to A4 PDF with print backgrounds enabled. Browsers are
+  pre-launched and kept warm in a `BrowserPool`, so a render costs a page, not a browser launch.
+  HTML is handed to the page in memory and engines return PDF bytes (`render_pdf_bytes`,
+  `CertificateGenerator.generate_bytes`); nothing touches disk unless the caller writes it.
+- `AsyncPlaywrightEngine` multiplexes many pages on one browser via `playwright.async_api`;
+  any number of threads can wait on renders running concurrently on its event loop.
+- Templates bundled by `lib/template_assets.py` (fonts/images inlined) are picked up from
+  `bundle_dir`, and rebuilt there when the template changed; engines wait on `document.fonts.ready`
+  rather than network idle.
+- `reuse_template_pages`: templates exposing `window.applyCertData` (v18) are loaded once per pooled
+  page; each certificate then only re-fills `CERT_DATA` and prints.
+- Optional fallback to WeasyPrint if Playwright isn't available. Engines are imported on first use,
+  so a process only loads the engine it renders with.
+- Optional template "layout lock" via expected SHA-256 hash.
+- Optional `PdfOptimizer` (pikepdf): downsamples/re-encodes images to a target DPI, dedupes image
+  streams, drops unused objects and linearizes; applied to every render before it is stored.
+- Optional overlay mode (`lib/certificate_overlay.py`): the template is printed once per template hash
+  without the donor fields, and each certificate is a text layer stamped onto that background.
+- Optional content-addressed `RenderCache`: identical (template, data) pairs are served from a
+  previously rendered PDF without touching the browser.
+- `CertificateGenerator.generate_batch` renders many records on the shared browsers with bounded
+  parallelism, yielding a per-record result (or error) as each one finishes.
+- `CertificateGenerator.generate_statement` puts a donor's donations in one PDF (a page each, with
+  the template's images embedded once, or a summary table).
+- `ExactCertificatePDF` renders the v18 template exactly as-is, only injecting `window.CERT_DATA`.
 """
 
 from __future__ import annotations
+
+import asyncio
+import atexit
+import dataclasses
+import hashlib
+import io
 import json
+import logging
+import math
+import os
+import queue
+import re
+import shutil
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from dataclasses import dataclass
 from datetime import date, datetime
 from decimal import Decimal, ROUND_HALF_UP
 from pathlib import Path
-from typing import Optional
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+log = logging.getLogger(__name__)
+
+# ---- Optional engines (Playwright preferred), imported on first use ------------
+# WeasyPrint drags in pango/cairo/harfbuzz and Playwright its driver, so neither is imported at
+# module load: each is imported the first time an engine (or `pick_engine`) asks for it, and a
+# process that renders with one engine never loads the other.
+def _import_playwright() -> SimpleNamespace:
+    from playwright.sync_api import sync_playwright  # pip install playwright && playwright install chromium
+    from playwright.async_api import async_playwright
+    return SimpleNamespace(sync_playwright=sync_playwright, async_playwright=async_playwright)
+
+
+def _import_weasyprint() -> SimpleNamespace:
+    from weasyprint import CSS, HTML  # type: ignore
+    try:
+        from weasyprint.text.fonts import FontConfiguration  # WeasyPrint >= 53
+    except ImportError:
+        from weasyprint.fonts import FontConfiguration  # type: ignore
+    return SimpleNamespace(HTML=HTML, CSS=CSS, FontConfiguration=FontConfiguration)
+
+
+_ENGINE_IMPORTS = {"playwright": _import_playwright, "weasyprint": _import_weasyprint}
+_engine_apis: Dict[str, Optional[SimpleNamespace]] = {}
+_engine_import_lock = threading.Lock()
+
+
+def _engine_api(name: str) -> Optional[SimpleNamespace]:
+    """The "playwright" or "weasyprint" API, imported on the first call; None if it can't be."""
+    with _engine_import_lock:
+        if name not in _engine_apis:
+            try:
+                _engine_apis[name] = _ENGINE_IMPORTS[name]()
+            except Exception:
+                _engine_apis[name] = None
+        return _engine_apis[name]
+
+
+def _playwright_available() -> bool:
+    return _engine_api("playwright") is not None
+
+
+def _weasyprint_available() -> bool:
+    return _engine_api("weasyprint") is not None
+
+# ---- Optional PDF post-processing (pikepdf + Pillow) ---------------------------
+_PIKEPDF_AVAILABLE = True
+try:
+    import pikepdf  # pip install pikepdf (brings Pillow)
+    from PIL import Image
+except Exception:
+    _PIKEPDF_AVAILABLE = False
+
+# ---- Jinja2 templating -------------------------------------------------------
+from jinja2 import BaseLoader, Environment, FileSystemLoader, StrictUndefined, UndefinedError, select_autoescape
+from jinja2.loaders import split_template_path
+from markupsafe import Markup
+
+try:
+    from lib.template_assets import AssetUnavailable, current_bundle
+except ImportError:  # run as `python lib/certificate_generator.py`
+    from template_assets import AssetUnavailable, current_bundle  # type: ignore
+
+T = TypeVar("T")
+
+# ------------------------------------------------------------------------------
+# Stage timing
+# ------------------------------------------------------------------------------
+
+_stage_observers: List[Callable[[str, float], None]] = []
+
 
-from playwright.sync_api import sync_playwright  # pip install playwright && playwright install chromium
+def observe_stages(fn: Callable[[str, float], None]) -> None:
+    """Call `fn(stage, seconds)` after every timed pipeline stage (e.g. to feed metrics)."""
+    _stage_observers.append(fn)
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    for fn in _stage_observers:
+        fn(stage, seconds)
+
+
+@contextmanager
+def timed_stage(stage: str) -> Iterator[None]:
+    """Time the enclosed block as `stage` (validate, template, pool_wait, pdf, optimize, ...)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if _stage_observers:
+            record_stage(stage, time.perf_counter() - start)
+
+
+# ------------------------------------------------------------------------------
+# Data model & validation
+# ------------------------------------------------------------------------------
+
+INR_SYMBOL = "₹"
+DEFAULT_REASON_TEXT = "for their valued contribution"
+
+
+@dataclass(frozen=True)
+class CertificateData:
+    donor_name: str
+    amount_in_inr: Decimal
+    donation_id: str
+    donation_date: date
+    # Optional fields you might use in your template:
+    org_name: str = "Shri Raghavendra Swamy Brundavana Sannidhi, Halasuru"
+    org_subtitle: str = "Guru Seva Mandali (Regd.)"
+    show_80g_note: bool = True
+    payment_mode: Optional[str] = None  # e.g. "Razorpay", "UPI", "Bank Transfer"
+    extra_meta: Optional[Dict[str, Any]] = None  # any additional JSON-able details
 
 
 @dataclass(frozen=True)
@@ -26,7 +181,7 @@ class CertInput:
     amount_in_inr: Decimal | float | str
     donation_id: str
     donation_date: date | str  # 'YYYY-MM-DD' recommended (your template formats this to DD-MM-YYYY)
-    reason_text: str = "for their valued contribution"  # shown under the name
+    reason_text: str = DEFAULT_REASON_TEXT  # shown under the name
 
     def to_cert_data(self) -> dict:
         # Normalize values to what the HTML expects
@@ -52,27 +207,1721 @@ class CertInput:
         }
 
 
+class ValidationError(ValueError):
+    pass
+
+
+def _strip_and_collapse(s: str) -> str:
+    """Trim and collapse inner whitespace to single spaces (non-breaking where needed)."""
+    s = re.sub(r"\s+", " ", s.strip())
+    # Protect accidental line breaks inside names like "A. B. Kumar"
+    return s
+
+
+def validate_data(d: CertificateData) -> CertificateData:
+    name = _strip_and_collapse(d.donor_name)
+    if not name or len(name) > 100:
+        raise ValidationError("donor_name must be 1..100 visible characters.")
+    if any(c in name for c in "<>{}"):
+        raise ValidationError("donor_name must not contain HTML/template delimiters.")
+
+    if not d.amount_in_inr.is_finite():  # NaN/Infinity can't be compared or rounded
+        raise ValidationError("amount_in_inr must be a finite number.")
+    if d.amount_in_inr <= 0:
+        raise ValidationError("amount_in_inr must be > 0.")
+    if not d.donation_id or len(d.donation_id) > 64:
+        raise ValidationError("donation_id must be 1..64 chars.")
+    if not isinstance(d.donation_date, date):
+        raise ValidationError("donation_date must be a date.")
+
+    # normalize to a safer, formatted dataclass (immutably create a new one)
+    try:
+        rounded_amount = (d.amount_in_inr.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP))
+    except ArithmeticError:  # more digits than the decimal context holds
+        raise ValidationError("amount_in_inr is too large.") from None
+    return CertificateData(
+        donor_name=name,
+        amount_in_inr=rounded_amount,
+        donation_id=d.donation_id.strip(),
+        donation_date=d.donation_date,
+        org_name=d.org_name,
+        org_subtitle=d.org_subtitle,
+        show_80g_note=d.show_80g_note,
+        payment_mode=d.payment_mode,
+        extra_meta=d.extra_meta,
+    )
+
+
+REQUIRED_FIELDS = ("donor_name", "amount", "donation_id", "donation_date")
+
+
+def parse_certificate_request(data: Dict[str, Any]) -> CertificateData:
+    """Build `CertificateData` from a `/generate`-style JSON object."""
+    if not isinstance(data, dict):
+        raise ValidationError("Request body must be a JSON object.")
+    for field in REQUIRED_FIELDS:
+        if field not in data:
+            raise ValidationError(f"Missing required field: {field}")
+    try:
+        donation_date = datetime.strptime(str(data["donation_date"]), "%Y-%m-%d").date()
+    except ValueError:
+        raise ValidationError("Invalid date format. Use YYYY-MM-DD") from None
+    try:
+        amount = Decimal(str(data["amount"]))
+    except ArithmeticError:
+        raise ValidationError("amount must be a number.") from None
+    if not amount.is_finite():
+        raise ValidationError("amount must be a finite number.")
+
+    return CertificateData(
+        donor_name=str(data["donor_name"]).strip(),
+        amount_in_inr=amount,
+        donation_id=str(data["donation_id"]).strip(),
+        donation_date=donation_date,
+        payment_mode=data.get("payment_mode"),
+        org_name=data.get("org_name", CertificateData.org_name),
+        org_subtitle=data.get("org_subtitle", CertificateData.org_subtitle),
+        show_80g_note=data.get("show_80g_note", True),
+        extra_meta=data.get("extra_meta"),
+    )
+
+
+def cert_payload(clean: CertificateData) -> dict:
+    """`window.CERT_DATA` for a validated record (same shape `CertInput` produces)."""
+    reason = (clean.extra_meta or {}).get("reason_text") or DEFAULT_REASON_TEXT
+    return CertInput(
+        donor_name=clean.donor_name,
+        amount_in_inr=clean.amount_in_inr,
+        donation_id=clean.donation_id,
+        donation_date=clean.donation_date,
+        reason_text=str(reason),
+    ).to_cert_data()
+
+
+_HEAD_OPEN_RE = re.compile(r"<head(\s[^>]*)?>", re.IGNORECASE)
+
+
+def _inject_cert_data(html: str, payload: dict) -> str:
+    """Set `window.CERT_DATA` before any template script runs (first thing inside <head>)."""
+    data = json.dumps(payload, ensure_ascii=False).replace("</", "<\\/")
+    script = f"<script>window.CERT_DATA = {data};</script>"
+    m = _HEAD_OPEN_RE.search(html)
+    if not m:
+        return script + html
+    return html[: m.end()] + script + html[m.end():]
+
+
+# ------------------------------------------------------------------------------
+# Templating
+# ------------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class CompiledTemplate:
+    name: str
+    sha256: str  # of the template source
+    filename: str
+    source: str
+    template: Any  # jinja2.Template
+
+
+def _bundled_or_source(src: Path, bundle: Path, assets_dir: Path) -> Path:
+    """`bundle`, (re)built from `src` as it is now; `src` itself when the bundle can't be built."""
+    try:
+        return current_bundle(src, bundle, assets_dir)
+    except (AssetUnavailable, OSError) as e:
+        log.warning("%s not bundled (%s); rendering it as is, remote assets included", src.name, e)
+        return src
+
+
+class _BundleLoader(BaseLoader):
+    """
+    Loads a template's bundle (lib/template_assets.py) in place of its source. A bundle built from
+    an earlier version of the source is rebuilt first, from the assets vendored in `<template_dir>/assets`.
+    """
+
+    def __init__(self, template_dir: Path, bundle_dir: Path):
+        self.template_dir = Path(template_dir)
+        self.bundle_dir = Path(bundle_dir)
+        self._sources = FileSystemLoader(str(template_dir))
+        self._bundles = FileSystemLoader(str(bundle_dir))
+
+    def get_source(self, environment: Environment, template: str) -> tuple:
+        pieces = split_template_path(template)
+        src = self.template_dir.joinpath(*pieces)
+        if not src.is_file():
+            return self._bundles.get_source(environment, template)  # shipped as a bundle only
+        path = _bundled_or_source(src, self.bundle_dir.joinpath(*pieces), self.template_dir / "assets")
+        return (self._sources if path == src else self._bundles).get_source(environment, template)
+
+
+class TemplateRenderer:
+    """
+    Jinja2 renderer with a registry of precompiled templates.
+
+    Each template is read, hashed and compiled once; `render` never touches the file system.
+    Template edits are picked up by an explicit `reload()` (compiled code is kept per content
+    hash, so switching back to an earlier version doesn't recompile).
+    """
+
+    def __init__(self, template_dir: Path, bundle_dir: Optional[Path] = None):
+        # A bundled (self-contained) copy of a template shadows the original of the same name,
+        # as long as it was built from the original's current content.
+        self.env = Environment(
+            loader=_BundleLoader(template_dir, bundle_dir) if bundle_dir else FileSystemLoader(str(template_dir)),
+            undefined=StrictUndefined,
+            autoescape=select_autoescape(["html", "xml"]),
+            trim_blocks=True,
+            lstrip_blocks=True,
+            auto_reload=False,  # no per-render mtime checks; see reload()
+        )
+        # Jinja filters
+        self.env.filters["inr"] = self._fmt_inr
+        self.env.filters["date_dmy"] = self._fmt_date_dmy
+        self.env.filters["json"] = lambda v: Markup(json.dumps(v, ensure_ascii=False))
+        self._lock = threading.Lock()
+        self._registry: Dict[str, CompiledTemplate] = {}
+        self._by_hash: Dict[tuple, Any] = {}  # (name, sha256) -> jinja2.Template
+
+    @staticmethod
+    def _fmt_inr(value: Decimal) -> str:
+        # ₹ with grouping: 12,34,567.89 (Indian numbering)
+        whole, _, frac = str(value).partition(".")
+        # Indian grouping for whole part: last three digits, then pairs
+        if len(whole) > 3:
+            head, tail = whole[:-3], whole[-3:]
+            lead = len(head) % 2 or 2
+            parts = [head[:lead]] + [head[i:i + 2] for i in range(lead, len(head), 2)]
+            whole = ",".join(parts) + "," + tail
+        return f"{INR_SYMBOL}{whole}.{frac[:2].ljust(2, '0')}"
+
+    @staticmethod
+    def _fmt_date_dmy(d: date) -> str:
+        return d.strftime("%d %b %Y")  # e.g. 17 Oct 2025
+
+    def _compile(self, template_name: str) -> CompiledTemplate:
+        source, filename, _ = self.env.loader.get_source(self.env, template_name)
+        sha = hashlib.sha256(source.encode("utf-8")).hexdigest()
+        tpl = self._by_hash.get((template_name, sha))
+        if tpl is None:
+            code = self.env.compile(source, template_name, filename)
+            tpl = self.env.template_class.from_code(self.env, code, self.env.make_globals(None))
+            self._by_hash[(template_name, sha)] = tpl
+        return CompiledTemplate(template_name, sha, filename, source, tpl)
+
+    def get(self, template_name: str) -> CompiledTemplate:
+        compiled = self._registry.get(template_name)
+        if compiled is None:
+            with self._lock:
+                compiled = self._registry.get(template_name)
+                if compiled is None:
+                    compiled = self._registry[template_name] = self._compile(template_name)
+        return compiled
+
+    def reload(self, check: Optional[Callable[[CompiledTemplate], None]] = None) -> List[str]:
+        """
+        Re-read every registered template; returns the names whose content changed. `check` sees
+        each changed template first and may raise to keep all of them at their current version.
+        """
+        with self._lock:
+            fresh = {name: self._compile(name) for name in self._registry}
+            changed = [
+                name for name, new in fresh.items()
+                if new.sha256 != self._registry[name].sha256 or new.filename != self._registry[name].filename
+            ]
+            if check is not None:
+                for name in changed:
+                    check(fresh[name])
+            for name in changed:
+                self._registry[name] = fresh[name]
+        return changed
+
+    def template_hash(self, template_name: str) -> str:
+        return self.get(template_name).sha256
+
+    def render(self, template_name: str, context: Dict[str, Any]) -> str:
+        return self.get(template_name).template.render(**context)
+
+
+# ------------------------------------------------------------------------------
+# Browser pool
+# ------------------------------------------------------------------------------
+
+# Resolves once every font the document uses has loaded (or failed); images are done at "load".
+_FONTS_READY_JS = "document.fonts.ready.then(() => true)"
+
+
+def _abort_remote(route) -> None:
+    """Context route handler: templates must be self-contained, never wait on the network."""
+    if route.request.url.startswith(("http://", "https://")):
+        return route.abort()
+    return route.continue_()
+
+
+async def _abort_remote_async(route) -> None:
+    if route.request.url.startswith(("http://", "https://")):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+_MAX_WARM_PAGES = 2  # loaded templates kept per browser
+
+
+def _close_quietly(page) -> None:
+    try:
+        page.close()
+    except Exception:
+        pass
+
+
+class _BrowserSlot:
+    """
+    One pre-launched Chromium browser + context, owned by a dedicated thread.
+
+    Sync Playwright objects may only be used from the thread that created them, so
+    all work for this browser is shipped to its thread as `(fn, future)` jobs.
+    """
+
+    def __init__(self, index: int, max_renders: int, launch_options: Dict[str, Any], block_remote: bool):
+        self.index = index
+        self.max_renders = max_renders
+        self.launch_options = launch_options
+        self.block_remote = block_remote
+        self.renders = 0  # renders since the current browser was launched
+        self.total_renders = 0
+        self.launches = 0
+        self.crashes = 0
+        self._playwright = None
+        self._browser = None
+        self._context = None
+        self._warm_pages: "OrderedDict[str, Any]" = OrderedDict()  # template key -> loaded page
+        self._jobs: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, name=f"browser-pool-{index}", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn: Callable[[Any], T], warm: Optional[tuple] = None) -> "Future[T]":
+        fut: Future = Future()
+        self._jobs.put((fn, fut, warm))
+        return fut
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._jobs.put(None)
+        self._thread.join(timeout=timeout)
+
+    # -- browser thread only ---------------------------------------------------
+    def _launch(self) -> None:
+        with timed_stage("browser_launch"):
+            if self._playwright is None:
+                self._playwright = _engine_api("playwright").sync_playwright().start()
+            self._browser = self._playwright.chromium.launch(**self.launch_options)
+            self._context = self._browser.new_context()
+        if self.block_remote:
+            self._context.route("**/*", _abort_remote)
+        self.renders = 0
+        self.launches += 1
+
+    def _shutdown_browser(self) -> None:
+        self._warm_pages.clear()  # pages die with their browser
+        browser, self._browser, self._context = self._browser, None, None
+        if browser is not None:
+            try:
+                browser.close()
+            except Exception:
+                pass  # already gone (crashed / killed)
+
+    def _run_warm(self, fn: Callable[[Any], T], key: str, setup: Callable[[Any], None]) -> T:
+        """Run `fn` on this browser's long-lived page for `key`, creating it with `setup` once."""
+        page = self._warm_pages.pop(key, None)
+        if page is None or page.is_closed():
+            page = self._context.new_page()
+            try:
+                setup(page)
+            except BaseException:
+                _close_quietly(page)
+                raise
+        try:
+            result = fn(page)
+        except BaseException:
+            _close_quietly(page)  # state unknown, never reuse it
+            raise
+        self._warm_pages[key] = page
+        while len(self._warm_pages) > _MAX_WARM_PAGES:
+            _close_quietly(self._warm_pages.popitem(last=False)[1])
+        return result
+
+    def _loop(self) -> None:
+        try:
+            self._launch()  # pre-launch so the first render is warm
+        except Exception:
+            self._shutdown_browser()  # retried (and reported) on the first job
+
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            fn, fut, warm = job
+            if not fut.set_running_or_notify_cancel():
+                continue
+            try:
+                if self._browser is None:
+                    self._launch()
+                if warm is not None:
+                    fut.set_result(self._run_warm(fn, *warm))
+                else:
+                    page = self._context.new_page()
+                    try:
+                        fut.set_result(fn(page))
+                    finally:
+                        _close_quietly(page)
+            except BaseException as exc:
+                fut.set_exception(exc)
+
+            self.renders += 1
+            self.total_renders += 1
+            if self._browser is not None and not self._browser.is_connected():
+                self.crashes += 1
+                self._shutdown_browser()
+            elif self.renders >= self.max_renders:
+                # recycle to cap memory growth; relaunch now so the next render stays warm
+                self._shutdown_browser()
+                try:
+                    self._launch()
+                except Exception:
+                    self._shutdown_browser()
+
+        self._shutdown_browser()
+        if self._playwright is not None:
+            try:
+                self._playwright.stop()
+            except Exception:
+                pass
+            self._playwright = None
+
+
+class BrowserPool:
+    """
+    Long-lived pool of pre-launched Chromium browsers.
+
+    `run(fn)` checks out a free browser, calls `fn(page)` with a fresh page in that
+    browser's warm context and returns its result. A browser is recycled after
+    `max_renders_per_browser` renders, or as soon as it is found disconnected.
+    With `block_remote`, pages can't fetch http(s) resources (use bundled templates).
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        max_renders_per_browser: int = 200,
+        checkout_timeout: float = 60.0,
+        launch_options: Optional[Dict[str, Any]] = None,
+        block_remote: bool = False,
+    ):
+        if size < 1:
+            raise ValueError("BrowserPool size must be >= 1.")
+        self.size = size
+        self.max_renders_per_browser = max_renders_per_browser
+        self.checkout_timeout = checkout_timeout
+        self.launch_options = launch_options or {}
+        self.block_remote = block_remote
+        self._slots: List[_BrowserSlot] = []
+        self._idle: "queue.Queue[_BrowserSlot]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def start(self) -> "BrowserPool":
+        """Launch all browsers (idempotent). Called lazily by `run`."""
+        if not _playwright_available():
+            raise RuntimeError("Playwright not available.")
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("BrowserPool is closed.")
+            if not self._slots:
+                for i in range(self.size):
+                    slot = _BrowserSlot(i, self.max_renders_per_browser, self.launch_options, self.block_remote)
+                    self._slots.append(slot)
+                    self._idle.put(slot)
+                atexit.register(self.close)
+        return self
+
+    def run(self, fn: Callable[[Any], T]) -> T:
+        return self._submit(fn, None)
+
+    def run_warm(self, key: str, setup: Callable[[Any], None], fn: Callable[[Any], T]) -> T:
+        """
+        Like `run`, but `fn` gets a page that stays open between calls: the first call on a
+        browser creates it and runs `setup(page)`, later calls with the same `key` reuse it.
+        """
+        return self._submit(fn, (key, setup))
+
+    def _submit(self, fn: Callable[[Any], T], warm: Optional[tuple]) -> T:
+        self.start()
+        try:
+            with timed_stage("pool_wait"):
+                slot = self._idle.get(timeout=self.checkout_timeout)
+        except queue.Empty:
+            raise RuntimeError(f"No browser became free within {self.checkout_timeout:.0f}s.") from None
+        try:
+            return slot.submit(fn, warm).result()
+        finally:
+            self._idle.put(slot)
+
+    def stats(self) -> Dict[str, int]:
+        slots = list(self._slots)
+        return {
+            "size": self.size,
+            "started": len(slots),
+            "busy": len(slots) - self._idle.qsize() if slots else 0,
+            "renders": sum(s.total_renders for s in slots),
+            "launches": sum(s.launches for s in slots),
+            "crashes": sum(s.crashes for s in slots),
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            slots, self._slots = self._slots, []
+        for slot in slots:
+            slot.stop()
+
+
+# ------------------------------------------------------------------------------
+# Engines
+# ------------------------------------------------------------------------------
+
+def write_atomic(path: Path, data: bytes) -> None:
+    """Write via a temp file + rename so readers never see a half-written PDF."""
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def _with_parent_dir(path: Path, write: Callable[[], None], attempts: int = 3) -> None:
+    """
+    Create `path`'s directory, then `write()`. A retention sweep may remove the directory (an
+    empty YYYY/MM/xx shard) between the two, so that FileNotFoundError is retried.
+    """
+    for attempt in range(attempts):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            write()
+            return
+        except FileNotFoundError:
+            if attempt == attempts - 1 or path.parent.is_dir():
+                raise  # not the directory: e.g. a cache entry evicted mid-copy
+
+
+class PdfEngineBase:
+    # True for engines that can re-fill an already loaded template (`render_injected_bytes`).
+    supports_injection = False
+    # True for engines that execute the template's JavaScript (data-driven templates need it).
+    runs_scripts = False
+    # False when the bytes depend on more than (template, data): the render cache is skipped.
+    cacheable = True
+
+    def render_pdf_bytes(self, html: str) -> bytes:
+        """Render `html` (passed in memory) and return the PDF bytes."""
+        raise NotImplementedError()
+
+    def render_pdf(self, html: str, out_path: Path) -> None:
+        write_atomic(out_path, self.render_pdf_bytes(html))
+
+    async def render_pdf_bytes_async(self, html: str) -> bytes:
+        """Awaitable render; engines without native asyncio support run in a worker thread."""
+        return await asyncio.to_thread(self.render_pdf_bytes, html)
+
+    async def render_pdf_async(self, html: str, out_path: Path) -> None:
+        write_atomic(out_path, await self.render_pdf_bytes_async(html))
+
+    def start(self) -> None:
+        """Acquire long-lived resources up front (browsers etc.). Optional."""
+
+    def close(self) -> None:
+        """Release long-lived resources. Optional."""
+
+
+# Print to A4; printBackground keeps your background images/colors.
+_PDF_OPTIONS = {"print_background": True, "prefer_css_page_size": True}  # trust @page size
+
+
+# Re-fill a loaded v18-style template (see `window.applyCertData` in the template).
+_APPLY_CERT_DATA_JS = "d => { window.CERT_DATA = d; window.applyCertData(d); }"
+
+
+class PlaywrightEngine(PdfEngineBase):
+    supports_injection = True
+    runs_scripts = True
+
+    def __init__(self, pool: Optional[BrowserPool] = None):
+        self.pool = pool or BrowserPool()
+
+    def start(self) -> None:
+        self.pool.start()
+
+    def close(self) -> None:
+        self.pool.close()
+
+    def render_pdf_bytes(self, html: str) -> bytes:
+        return self._render(html)[0]
+
+    def render_injected_bytes(self, template_key: str, template_html: str, payload: dict) -> bytes:
+        """
+        Print `template_html` filled with `payload`, loading the template only once per pooled
+        browser: later calls just re-run the template's fill function and print.
+        """
+        return self._render_injected(template_key, template_html, payload)[0]
+
+    def _render(self, html: str, snapshot: bool = False) -> tuple:
+        if not _playwright_available():
+            raise RuntimeError("Playwright not available.")
+
+        def _print(page) -> tuple:
+            # No temp file / file:// round trip: the document is handed over in memory.
+            with timed_stage("set_content"):
+                page.set_content(html, wait_until="load")
+            # Images are loaded at "load"; fonts may still be pending
+            with timed_stage("fonts"):
+                page.evaluate(_FONTS_READY_JS)
+            with timed_stage("pdf"):
+                pdf = page.pdf(**_PDF_OPTIONS)
+            return pdf, page.inner_html("body") if snapshot else None
+
+        return self.pool.run(_print)
+
+    def _render_injected(self, template_key: str, template_html: str, payload: dict, snapshot: bool = False) -> tuple:
+        if not _playwright_available():
+            raise RuntimeError("Playwright not available.")
+
+        def _load(page) -> None:
+            with timed_stage("set_content"):
+                page.set_content(template_html, wait_until="load")
+            with timed_stage("fonts"):
+                page.evaluate(_FONTS_READY_JS)
+
+        def _fill_and_print(page) -> tuple:
+            with timed_stage("fill"):
+                page.evaluate(_APPLY_CERT_DATA_JS, payload)
+            with timed_stage("fonts"):
+                page.evaluate(_FONTS_READY_JS)  # new text may need glyphs not loaded yet
+            with timed_stage("pdf"):
+                pdf = page.pdf(**_PDF_OPTIONS)
+            return pdf, page.inner_html("body") if snapshot else None
+
+        return self.pool.run_warm(template_key, _load, _fill_and_print)
+
+
+class AsyncPlaywrightEngine(PdfEngineBase):
+    """
+    One Chromium browser driven through `playwright.async_api`, with up to
+    `max_concurrent_pages` renders in flight at once.
+
+    Async Playwright objects belong to the event loop that created them, so the engine
+    runs its own loop on a background thread. `render_pdf_bytes_async` can be awaited from
+    any loop and `render_pdf_bytes` called from any thread; both are dispatched onto that loop.
+    """
+
+    runs_scripts = True
+
+    def __init__(
+        self,
+        max_concurrent_pages: int = 16,
+        max_renders_per_browser: int = 1000,
+        launch_options: Optional[Dict[str, Any]] = None,
+        block_remote: bool = False,
+    ):
+        self.max_concurrent_pages = max_concurrent_pages
+        self.max_renders_per_browser = max_renders_per_browser
+        self.launch_options = launch_options or {}
+        self.block_remote = block_remote
+        self.renders = 0
+        self.launches = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        # loop-thread state
+        self._playwright = None
+        self._browser = None
+        self._context = None
+        self._browser_renders = 0
+        self._in_flight = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._launch_lock: Optional[asyncio.Lock] = None
+
+    def start(self) -> None:
+        if not _playwright_available():
+            raise RuntimeError("Playwright not available.")
+        with self._lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=loop.run_forever, name="async-playwright", daemon=True)
+            self._thread.start()
+            self._loop = loop
+            atexit.register(self.close)
+        self._call(self._ensure_browser()).result()
+
+    def close(self) -> None:
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result(timeout=30)
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            if self._thread is not None:
+                self._thread.join(timeout=10)
+
+    def render_pdf_bytes(self, html: str) -> bytes:
+        return self._call(self._render(html)).result()
+
+    async def render_pdf_bytes_async(self, html: str) -> bytes:
+        return await asyncio.wrap_future(self._call(self._render(html)))
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "max_concurrent_pages": self.max_concurrent_pages,
+            "in_flight": self._in_flight,
+            "renders": self.renders,
+            "launches": self.launches,
+        }
+
+    def _call(self, coro) -> Future:
+        if self._loop is None:
+            try:
+                self.start()
+            except Exception:
+                coro.close()
+                raise
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    # -- loop thread only ------------------------------------------------------
+    async def _ensure_browser(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent_pages)
+            self._launch_lock = asyncio.Lock()
+        async with self._launch_lock:
+            if self._browser is not None and not self._browser.is_connected():
+                self._browser = self._context = None
+            if self._browser is None:
+                with timed_stage("browser_launch"):
+                    if self._playwright is None:
+                        self._playwright = await _engine_api("playwright").async_playwright().start()
+                    self._browser = await self._playwright.chromium.launch(**self.launch_options)
+                    self._context = await self._browser.new_context()
+                    if self.block_remote:
+                        await self._context.route("**/*", _abort_remote_async)
+                self._browser_renders = 0
+                self.launches += 1
+            return self._context
+
+    async def _recycle_if_due(self) -> None:
+        # Only swap browsers when nothing else is printing on the current one.
+        if self._browser_renders < self.max_renders_per_browser or self._in_flight:
+            return
+        browser, self._browser, self._context = self._browser, None, None
+        if browser is not None:
+            try:
+                await browser.close()
+            except Exception:
+                pass
+
+    async def _render(self, html: str) -> bytes:
+        await self._ensure_browser()
+        with timed_stage("pool_wait"):
+            await self._semaphore.acquire()
+        try:
+            context = await self._ensure_browser()
+            self._in_flight += 1
+            try:
+                page = await context.new_page()
+                try:
+                    with timed_stage("set_content"):
+                        await page.set_content(html, wait_until="load")
+                    with timed_stage("fonts"):
+                        await page.evaluate(_FONTS_READY_JS)
+                    with timed_stage("pdf"):
+                        pdf = await page.pdf(**_PDF_OPTIONS)
+                finally:
+                    try:
+                        await page.close()
+                    except Exception:
+                        pass
+            finally:
+                self._in_flight -= 1
+                self._browser_renders += 1
+                self.renders += 1
+            await self._recycle_if_due()
+            return pdf
+        finally:
+            self._semaphore.release()
+
+    async def _shutdown(self) -> None:
+        browser, self._browser, self._context = self._browser, None, None
+        if browser is not None:
+            try:
+                await browser.close()
+            except Exception:
+                pass
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+
+# <style> blocks without a media attribute; they're handed to WeasyPrint as pre-parsed stylesheets
+_STYLE_RE = re.compile(r"<style\b(?![^>]*\bmedia=)[^>]*>(.*?)</style>", re.IGNORECASE | re.DOTALL)
+
+
+class WeasyPrintEngine(PdfEngineBase):
+    """
+    Browser-free engine. What doesn't change between certificates is kept across renders:
+    one `FontConfiguration` (fontconfig discovery, @font-face), the template's `<style>` blocks
+    parsed once into `CSS` objects (keyed by content hash, LRU of `max_stylesheets`), and
+    WeasyPrint's image cache, so inlined data: images are decoded once per process.
+
+    Relative asset URLs resolve against `base_url`; `CertificateGenerator` sets it to the
+    template's directory when left unset. No JavaScript runs, so data-driven templates (v18's
+    `window.applyCertData`) print their static placeholders.
+    """
+
+    def __init__(self, base_url: Optional[str] = None, max_stylesheets: int = 8, max_images: int = 256):
+        self.base_url = base_url
+        self.max_stylesheets = max_stylesheets
+        self.max_images = max_images
+        self._font_config = None
+        self._stylesheets: "OrderedDict[str, Any]" = OrderedDict()  # sha256 of css text -> CSS
+        self._image_cache: Dict[str, Any] = {}  # passed to write_pdf(cache=...): url -> decoded image
+        self._lock = threading.Lock()
+        self.stylesheet_hits = 0
+        self.stylesheet_misses = 0
+
+    def _fonts(self):
+        with self._lock:
+            if self._font_config is None:
+                self._font_config = _engine_api("weasyprint").FontConfiguration()
+            return self._font_config
+
+    def _stylesheet(self, css: str):
+        key = hashlib.sha256(css.encode("utf-8")).hexdigest()
+        with self._lock:
+            sheet = self._stylesheets.get(key)
+            if sheet is not None:
+                self._stylesheets.move_to_end(key)
+                self.stylesheet_hits += 1
+                return sheet
+            self.stylesheet_misses += 1
+        sheet = _engine_api("weasyprint").CSS(string=css, base_url=self.base_url, font_config=self._fonts())
+        with self._lock:
+            self._stylesheets[key] = sheet
+            while len(self._stylesheets) > self.max_stylesheets:
+                self._stylesheets.popitem(last=False)
+            if len(self._image_cache) > self.max_images:
+                self._image_cache.clear()  # only per-donor images could grow it this far
+        return sheet
+
+    def start(self) -> None:
+        if _weasyprint_available():
+            self._fonts()
+
+    def render_pdf_bytes(self, html: str) -> bytes:
+        if not _weasyprint_available():
+            raise RuntimeError("WeasyPrint not available.")
+        # Stylesheets given to write_pdf() apply after the document's own, so moving the <style>
+        # blocks out keeps the cascade as authored (they come after any <link> in our templates).
+        with timed_stage("stylesheets"):
+            sheets = [self._stylesheet(css) for css in _STYLE_RE.findall(html)]
+            html = _STYLE_RE.sub("", html)
+        with timed_stage("pdf"):
+            return _engine_api("weasyprint").HTML(string=html, base_url=self.base_url).write_pdf(
+                font_config=self._fonts(), stylesheets=sheets, cache=self._image_cache
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "stylesheets": len(self._stylesheets),
+                "stylesheet_hits": self.stylesheet_hits,
+                "stylesheet_misses": self.stylesheet_misses,
+                "images": len(self._image_cache),
+            }
+
+
+def pick_engine(
+    prefer: str = "playwright",
+    pool: Optional[BrowserPool] = None,
+    max_concurrent_pages: int = 16,
+    block_remote: bool = False,
+    base_url: Optional[str] = None,
+    fallback: bool = True,  # False: raise instead of substituting another engine
+) -> PdfEngineBase:
+    prefer = prefer.lower()
+    if prefer == "playwright-async" and _playwright_available():
+        return AsyncPlaywrightEngine(max_concurrent_pages=max_concurrent_pages, block_remote=block_remote)
+    if prefer == "playwright" and _playwright_available():
+        return PlaywrightEngine(pool)
+    if prefer == "weasyprint" and _weasyprint_available():
+        return WeasyPrintEngine(base_url)
+    if not fallback:
+        raise RuntimeError(f"PDF engine {prefer!r} is not available.")
+    if _playwright_available():
+        return PlaywrightEngine(pool)
+    if _weasyprint_available():
+        return WeasyPrintEngine(base_url)
+    raise RuntimeError(
+        "No PDF engine available. Install either Playwright (and `playwright install chromium`) "
+        "or WeasyPrint (with its system deps)."
+    )
+
+
+# ------------------------------------------------------------------------------
+# PDF post-processing
+# ------------------------------------------------------------------------------
+
+_IDENTITY = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+
+def _matmul(m: tuple, n: tuple) -> tuple:
+    """PDF matrix product `m x n` (apply `m`, then `n`)."""
+    a, b, c, d, e, f = m
+    A, B, C, D, E, F = n
+    return (a * A + b * C, a * B + b * D, c * A + d * C, c * B + d * D, e * A + f * C + E, e * B + f * D + F)
+
+
+def _matrix(obj, key: str = "/Matrix") -> tuple:
+    return tuple(float(v) for v in obj.get(key, _IDENTITY))
+
+
+@dataclass(frozen=True)
+class OptimizeReport:
+    bytes_in: int
+    bytes_out: int
+    images: int  # image streams re-encoded
+    deduplicated: int  # image streams replaced by an identical one
+
+
+class PdfOptimizer:
+    """
+    Shrink printed PDFs without visibly changing them.
+
+    - Images are downsampled to `dpi` at the largest size they are drawn on the page (Chromium
+      embeds CSS background images at source resolution, e.g. a 1024x1536 PNG printed 2 cm wide).
+    - Colour/grey images are re-encoded as JPEG (`jpeg_quality`) when that is smaller than
+      lossless Flate; soft masks (alpha) always stay lossless.
+    - Identical image streams are stored once, unreferenced objects are dropped and the file
+      is linearized (first page viewable while the rest downloads).
+
+    Templates embed the same images in every certificate, so re-encoded images are memoised by
+    content: after the first certificate, optimizing is a parse, a lookup and a save.
+    """
+
+    def __init__(self, dpi: int = 150, jpeg_quality: int = 85, linearize: bool = True, max_cached_images: int = 64):
+        if not _PIKEPDF_AVAILABLE:
+            raise RuntimeError("PDF optimization needs pikepdf (pip install pikepdf).")
+        self.dpi = dpi
+        self.jpeg_quality = jpeg_quality
+        self.linearize = linearize
+        self.max_cached_images = max_cached_images
+        self._lock = threading.Lock()
+        self._encoded: "OrderedDict[tuple, Optional[tuple]]" = OrderedDict()
+        self.documents = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def signature(self) -> str:
+        """Settings that change the output; part of the render cache key."""
+        return f"dpi={self.dpi};q={self.jpeg_quality};linearize={int(self.linearize)}"
+
+    def optimize(self, data: bytes) -> Tuple[bytes, OptimizeReport]:
+        """Returns the optimized PDF, or `data` unchanged if optimizing doesn't make it smaller."""
+        with pikepdf.open(io.BytesIO(data)) as pdf:
+            page_box = max(
+                (tuple(float(v) for v in page.mediabox) for page in pdf.pages),
+                key=lambda b: (b[2] - b[0]) * (b[3] - b[1]),
+            )
+            extents = self._image_extents(pdf)
+            images = [obj for obj in pdf.objects if isinstance(obj, pikepdf.Stream) and obj.get("/Subtype") == "/Image"]
+            masks = self._masks(images)
+            rewritten = 0
+            for image in images:
+                # undrawn images (e.g. from patterns we don't trace) are capped at the page size
+                extent = extents.get(image.objgen, (page_box[2] - page_box[0], page_box[3] - page_box[1]))
+                rewritten += self._reencode(image, extent, lossless=image.objgen in masks)
+            deduplicated = self._deduplicate(pdf, images)
+            pdf.remove_unreferenced_resources()
+
+            out = io.BytesIO()
+            pdf.save(
+                out,
+                linearize=self.linearize,
+                object_stream_mode=pikepdf.ObjectStreamMode.generate,
+                compress_streams=True,
+                deterministic_id=True,  # same input, same bytes (render cache, parity checks)
+            )
+        result = out.getvalue()
+        if len(result) >= len(data):
+            result = data
+        with self._lock:
+            self.documents += 1
+            self.bytes_in += len(data)
+            self.bytes_out += len(result)
+        return result, OptimizeReport(len(data), len(result), rewritten, deduplicated)
+
+    @staticmethod
+    def _masks(images: List[Any]) -> set:
+        return {image.SMask.objgen for image in images if "/SMask" in image}
+
+    @staticmethod
+    def _image_extents(pdf) -> Dict[tuple, Tuple[float, float]]:
+        """objgen -> largest (width, height) in points each image is drawn at."""
+        extents: Dict[tuple, Tuple[float, float]] = {}
+
+        def _walk(stream, resources, base: tuple, depth: int) -> None:
+            if resources is None or depth > 8:
+                return
+            xobjects = resources.get("/XObject", {})
+            for pattern in resources.get("/Pattern", {}).values():
+                if pattern.get("/PatternType") == 1:  # tiling pattern: has its own content stream
+                    _walk(pattern, pattern.get("/Resources", resources), _matmul(_matrix(pattern), base), depth + 1)
+
+            ctm, stack = base, []
+            for operands, op in pikepdf.parse_content_stream(stream):
+                op = str(op)
+                if op == "q":
+                    stack.append(ctm)
+                elif op == "Q":
+                    ctm = stack.pop() if stack else base
+                elif op == "cm":
+                    ctm = _matmul(tuple(float(v) for v in operands), ctm)
+                elif op == "Do":
+                    xobj = xobjects.get(operands[0])
+                    if xobj is None:
+                        continue
+                    if xobj.get("/Subtype") == "/Image":
+                        w, h = math.hypot(ctm[0], ctm[1]), math.hypot(ctm[2], ctm[3])
+                        prev = extents.get(xobj.objgen, (0.0, 0.0))
+                        extents[xobj.objgen] = (max(prev[0], w), max(prev[1], h))
+                        if "/SMask" in xobj:
+                            extents[xobj.SMask.objgen] = extents[xobj.objgen]
+                    elif xobj.get("/Subtype") == "/Form":
+                        _walk(xobj, xobj.get("/Resources", resources), _matmul(_matrix(xobj), ctm), depth + 1)
+
+        for page in pdf.pages:
+            _walk(page, page.obj.get("/Resources"), _IDENTITY, 0)
+        return extents
+
+    def _reencode(self, image, extent: Tuple[float, float], lossless: bool) -> int:
+        """Downsample / re-encode one image stream in place; returns 1 if it was rewritten."""
+        if image.get("/BitsPerComponent") != 8 or "/Decode" in image or image.get("/ImageMask", False):
+            return 0
+        raw = image.read_raw_bytes()
+        width, height = int(image.Width), int(image.Height)
+        target = (
+            max(1, min(width, math.ceil(extent[0] / 72 * self.dpi))),
+            max(1, min(height, math.ceil(extent[1] / 72 * self.dpi))),
+        )
+        key = (hashlib.sha256(raw).hexdigest(), repr(image.get("/Filter")), repr(image.get("/ColorSpace")), target, lossless)
+        with self._lock:
+            encoded = self._encoded.get(key, False)
+            if encoded is not False:
+                self._encoded.move_to_end(key)
+        if encoded is False:
+            encoded = self._encode(image, target, lossless, len(raw))
+            with self._lock:
+                self._encoded[key] = encoded
+                while len(self._encoded) > self.max_cached_images:
+                    self._encoded.popitem(last=False)
+        if encoded is None:
+            return 0
+
+        body, filter_, colorspace, (w, h) = encoded
+        image.write(body, filter=pikepdf.Name(filter_))
+        image.Width, image.Height = w, h
+        if colorspace is not None:
+            image.ColorSpace = pikepdf.Name(colorspace)
+        if "/DecodeParms" in image:
+            del image["/DecodeParms"]
+        return 1
+
+    def _encode(self, image, target: Tuple[int, int], lossless: bool, raw_size: int) -> Optional[tuple]:
+        """`(body, filter, new colorspace or None, size)`, or None when the original is as good."""
+        try:
+            pil = pikepdf.PdfImage(image).as_pil_image()
+        except Exception:
+            return None  # colour spaces / filters we don't decode are left alone
+        colorspace = None
+        if pil.mode in ("RGBA", "LA"):
+            pil = pil.convert(pil.mode[:-1])  # pikepdf merges in the /SMask; it stays a separate stream
+        elif pil.mode == "P":
+            pil, colorspace = pil.convert("RGB"), "/DeviceRGB"
+        if pil.mode not in ("RGB", "L"):
+            return None
+        if pil.size != target:
+            pil = pil.resize(target, Image.LANCZOS)
+
+        candidates = [(zlib.compress(pil.tobytes(), 6), "/FlateDecode")]
+        if not lossless:
+            buf = io.BytesIO()
+            pil.save(buf, format="JPEG", quality=self.jpeg_quality, optimize=True)
+            candidates.append((buf.getvalue(), "/DCTDecode"))
+        body, filter_ = min(candidates, key=lambda c: len(c[0]))
+        if len(body) >= raw_size and pil.size == (int(image.Width), int(image.Height)) and colorspace is None:
+            return None
+        return body, filter_, colorspace, pil.size
+
+    @staticmethod
+    def _deduplicate(pdf, images: List[Any]) -> int:
+        """Point every reference to identical image streams (masks first) at one copy."""
+        canonical: Dict[tuple, Any] = {}
+        replace: Dict[tuple, Any] = {}
+
+        def _key(image) -> tuple:
+            smask = image.get("/SMask")
+            smask_id = None
+            if smask is not None:
+                smask_id = replace.get(smask.objgen, smask).objgen
+            return (
+                hashlib.sha256(image.read_raw_bytes()).hexdigest(),
+                int(image.Width), int(image.Height), repr(image.get("/Filter")),
+                repr(image.get("/ColorSpace")), repr(image.get("/DecodeParms")), smask_id,
+            )
+
+        masks = PdfOptimizer._masks(images)
+        for image in sorted(images, key=lambda i: i.objgen not in masks):
+            key = _key(image)
+            first = canonical.setdefault(key, image)
+            if first.objgen != image.objgen:
+                replace[image.objgen] = first
+        if not replace:
+            return 0
+
+        seen = set()
+
+        def _rewrite(resources) -> None:
+            if resources is None or resources.objgen in seen:
+                return
+            if resources.is_indirect:
+                seen.add(resources.objgen)
+            xobjects = resources.get("/XObject", {})
+            for name in list(xobjects.keys()):
+                xobj = xobjects[name]
+                if xobj.objgen in replace:
+                    xobjects[name] = replace[xobj.objgen]
+                elif xobj.get("/Subtype") == "/Form":
+                    _rewrite(xobj.get("/Resources"))
+            for pattern in resources.get("/Pattern", {}).values():
+                if pattern.get("/PatternType") == 1:
+                    _rewrite(pattern.get("/Resources"))
+
+        for image in images:
+            if "/SMask" in image and image.SMask.objgen in replace:
+                image.SMask = replace[image.SMask.objgen]
+        for page in pdf.pages:
+            _rewrite(page.obj.get("/Resources"))
+        return len(replace)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "documents": self.documents,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "ratio": round(self.bytes_out / self.bytes_in, 4) if self.bytes_in else 0.0,
+                "cached_images": len(self._encoded),
+            }
+
+
+def merge_pdfs(documents: Sequence[bytes]) -> bytes:
+    """
+    Concatenate PDFs into one. Identical image streams (every certificate embeds the same
+    template backgrounds) are stored once, so N certificates cost about one set of images.
+    """
+    if not _PIKEPDF_AVAILABLE:
+        raise RuntimeError("Merging PDFs needs pikepdf (pip install pikepdf).")
+    with ExitStack() as stack:
+        out = stack.enter_context(pikepdf.new())
+        for data in documents:
+            # sources stay open until the save: qpdf copies their stream data lazily
+            out.pages.extend(stack.enter_context(pikepdf.open(io.BytesIO(data))).pages)
+        images = [obj for obj in out.objects if isinstance(obj, pikepdf.Stream) and obj.get("/Subtype") == "/Image"]
+        PdfOptimizer._deduplicate(out, images)
+        out.remove_unreferenced_resources()
+        buf = io.BytesIO()
+        out.save(buf, object_stream_mode=pikepdf.ObjectStreamMode.generate, compress_streams=True, deterministic_id=True)
+    return buf.getvalue()
+
+
+# ------------------------------------------------------------------------------
+# Render cache
+# ------------------------------------------------------------------------------
+
+def canonical_json(clean: CertificateData) -> str:
+    """Stable serialization of validated data (sorted keys, Decimal/date as strings)."""
+    return json.dumps(
+        dataclasses.asdict(clean), sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str
+    )
+
+
+def _link_or_copy(src: Path, dst: Path) -> None:
+    """Hard-link `src` to `dst` when possible (no data copy), else copy the bytes."""
+    tmp = dst.with_name(f".{dst.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+
+class RenderCache:
+    """
+    Content-addressed store of rendered PDFs (`<cache_dir>/<key>.pdf`).
+
+    Entries older than `max_age_seconds` are treated as misses and removed; after each
+    insert the least recently used entries are evicted until the cache fits `max_bytes`.
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int = 512 * 1024 * 1024, max_age_seconds: float = 7 * 86400):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (size, created), LRU order
+        self._bytes = 0
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        for path in sorted(self.cache_dir.glob("*.pdf"), key=lambda p: p.stat().st_mtime):
+            st = path.stat()
+            self._entries[path.stem] = (st.st_size, st.st_mtime)
+            self._bytes += st.st_size
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.pdf"
+
+    def get(self, key: str) -> Optional[Path]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[1] > self.max_age_seconds:
+                self._drop(key)
+                entry = None
+            if entry is None or not self._path(key).exists():
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._path(key)
+
+    def put(self, key: str, src: Path) -> Path:
+        dst = self._path(key)
+        _link_or_copy(src, dst)
+        return self._register(key, dst)
+
+    def put_bytes(self, key: str, data: bytes) -> Path:
+        dst = self._path(key)
+        write_atomic(dst, data)
+        return self._register(key, dst)
+
+    def _register(self, key: str, dst: Path) -> Path:
+        size = dst.stat().st_size
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[0]
+            self._entries[key] = (size, time.time())
+            self._bytes += size
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                self._drop(next(iter(self._entries)))
+        return dst
+
+    def _drop(self, key: str) -> None:
+        size, _ = self._entries.pop(key)
+        self._bytes -= size
+        self.evictions += 1
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+
+# ------------------------------------------------------------------------------
+# Generator
+# ------------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class BatchResult:
+    index: int  # position of the record in the input
+    donation_id: Optional[str]
+    ok: bool
+    path: Optional[Path] = None
+    error: Optional[str] = None
+    reused: bool = False  # an earlier render of the same data was returned
+
+    def to_dict(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"index": self.index, "donation_id": self.donation_id, "success": self.ok}
+        if self.ok:
+            out["filename"] = self.path.name
+            out["reused"] = self.reused
+        else:
+            out["error"] = self.error
+        return out
+
+
+def safe_filename_part(s: str) -> str:
+    """Keep IDs usable in file names (no path separators or shell-hostile characters)."""
+    return re.sub(r"[^A-Za-z0-9._-]", "_", s)
+
+
+def default_filename(data: CertificateData) -> str:
+    return f"certificate_{safe_filename_part(data.donation_id)}.pdf"
+
+
+_BODY_RE = re.compile(r"(<body\b[^>]*>)(.*)(</body>)", re.IGNORECASE | re.DOTALL)
+
+# Each certificate is a fixed-size A4 body; in a statement they follow each other, one per page.
+_STATEMENT_CSS = (
+    "<style>html, body { height: auto !important; }"
+    " .statement-page { break-after: page; page-break-after: always; }"
+    " .statement-page:last-child { break-after: auto; page-break-after: auto; }</style>"
+)
+
+
+def _combine_pages(htmls: List[str]) -> str:
+    """One HTML document holding the bodies of `htmls` (same template), one per printed page."""
+    m = _BODY_RE.search(htmls[0])
+    if m is None:
+        raise ValueError("Template has no <body>; can't combine certificates into a statement.")
+    pages = []
+    for html in htmls:
+        body = _BODY_RE.search(html)
+        pages.append(f'<div class="statement-page">{body.group(2)}</div>')
+    head = htmls[0][: m.start()].replace("</head>", _STATEMENT_CSS + "</head>", 1)
+    return head + m.group(1) + "".join(pages) + m.group(3) + htmls[0][m.end():]
+
+
+# PDF bytes that legitimately differ between two prints of the same document.
+_PDF_VOLATILE_RE = re.compile(rb"/(?:CreationDate|ModDate)\s*\([^)]*\)|/ID\s*\[[^\]]*\]")
+
+
+class CertificateGenerator:
+    """
+    Render a locked-layout certificate PDF from an HTML template.
+    """
+
+    max_statement_records = 400  # donations per `generate_statement`
+
+    def __init__(
+        self,
+        template_dir: Path,
+        template_name: str,
+        engine: Optional[PdfEngineBase] = None,
+        expected_template_sha256: Optional[str] = None,  # lock layout if provided
+        cache: Optional[RenderCache] = None,
+        bundle_dir: Optional[Path] = None,  # output of lib/template_assets.py
+        reuse_template_pages: bool = False,  # load once per page, re-fill CERT_DATA per certificate
+        optimizer: Optional[PdfOptimizer] = None,  # post-process every render (images, linearize)
+        overlay=None,  # lib.certificate_overlay.OverlayRenderer: browser-free renders on a cached background
+    ):
+        self.template_dir = template_dir
+        self.template_name = template_name
+        self.bundle_dir = bundle_dir
+        self.renderer = TemplateRenderer(template_dir, bundle_dir)
+        self.engine = engine or pick_engine("playwright")
+        if getattr(self.engine, "base_url", False) is None:
+            # engines that resolve relative asset URLs themselves (WeasyPrint): the template's own dir
+            self.engine.base_url = str(self.template_path().parent.resolve())
+        self.expected_hash = expected_template_sha256
+        self.cache = cache
+        self.reuse_template_pages = reuse_template_pages
+        self.optimizer = optimizer
+        self.overlay = overlay
+        self._injectable: Optional[tuple] = None  # (template sha, html or None)
+
+        if self.expected_hash:
+            self._assert_template_hash()
+
+    def template_path(self) -> Path:
+        """The file actually rendered: the bundled copy when there is one."""
+        return Path(self.renderer.get(self.template_name).filename)
+
+    def template_sha256(self) -> str:
+        """SHA-256 of the rendered template's source, as compiled in the renderer's registry."""
+        return self.renderer.template_hash(self.template_name)
+
+    def reload_templates(self) -> List[str]:
+        """Pick up template edits (they are not re-checked per render); refused if they break the layout lock."""
+        def _check(compiled: CompiledTemplate) -> None:
+            if self.expected_hash and compiled.name == self.template_name:
+                self._assert_template_hash(compiled.sha256)
+
+        return self.renderer.reload(check=_check)
+
+    def cache_key(self, clean: CertificateData) -> str:
+        """Content address of a render: template hash + engine (+ optimizer, overlay) + canonical validated data."""
+        h = hashlib.sha256()
+        h.update(self.template_sha256().encode())
+        h.update(type(self.engine).__name__.encode())
+        if self.optimizer is not None:
+            h.update(self.optimizer.signature().encode())
+        if self.overlay is not None:
+            h.update(b"overlay")
+        h.update(canonical_json(clean).encode("utf-8"))
+        return h.hexdigest()
+
+    def _assert_template_hash(self, h: Optional[str] = None) -> None:
+        # The lock applies to what is rendered: the bundle when there is one, inlined assets included.
+        h = h or self.template_sha256()
+        if h.lower() != self.expected_hash.lower():
+            raise RuntimeError(
+                f"Template layout hash mismatch!\n"
+                f"Expected: {self.expected_hash}\n"
+                f"Actual:   {h}\n"
+                f"Refusing to render to prevent unintended layout changes."
+            )
+
+    def _render_html(self, clean: CertificateData) -> str:
+        context = {
+            "donor_name": clean.donor_name,
+            "amount": clean.amount_in_inr,
+            "donation_id": clean.donation_id,
+            "donation_date": clean.donation_date,
+            "org_name": clean.org_name,
+            "org_subtitle": clean.org_subtitle,
+            "show_80g_note": clean.show_80g_note,
+            "payment_mode": clean.payment_mode,
+            "extra_meta": clean.extra_meta or {},
+            # deterministic, human-friendly render time (NOT embedded in PDF metadata)
+            "rendered_at": datetime.utcnow().strftime("%d %b %Y, %H:%M UTC"),
+        }
+
+        with timed_stage("template"):
+            html = self.renderer.render(self.template_name, context)
+            return _inject_cert_data(html, cert_payload(clean))
+
+    def _injectable_template(self) -> Optional[tuple]:
+        """
+        `(key, html)` of the template to keep loaded in pooled pages, or None when template reuse
+        doesn't apply: it's off, the engine can't do it, the template has no
+        `window.applyCertData` fill function, or it needs per-donor Jinja context.
+        """
+        if not (self.reuse_template_pages and self.engine.supports_injection):
+            return None
+        sha = self.template_sha256()
+        if self._injectable is None or self._injectable[0] != sha:
+            html = None
+            if "applyCertData" in self.renderer.get(self.template_name).source:
+                try:
+                    html = self.renderer.render(self.template_name, {})
+                except UndefinedError:
+                    html = None
+            self._injectable = (sha, html)
+        sha, html = self._injectable
+        return None if html is None else (sha, html)
+
+    def _render_bytes(self, clean: CertificateData) -> bytes:
+        if self.overlay is not None:
+            with timed_stage("overlay"):
+                pdf = self.overlay.render(self, clean)
+            if pdf is not None:
+                return pdf  # the background was optimized when it was prepared
+        tpl = self._injectable_template()
+        if tpl is not None:
+            pdf = self.engine.render_injected_bytes(tpl[0], tpl[1], cert_payload(clean))
+        else:
+            pdf = self.engine.render_pdf_bytes(self._render_html(clean))
+        return self._optimize(pdf, clean.donation_id)
+
+    def _optimize(self, pdf: bytes, donation_id: str) -> bytes:
+        if self.optimizer is None:
+            return pdf
+        try:
+            with timed_stage("optimize"):
+                pdf, report = self.optimizer.optimize(pdf)
+        except Exception:
+            # a certificate that can't be shrunk is still a valid certificate
+            log.warning("certificate %s: PDF optimization failed, keeping the original", donation_id, exc_info=True)
+            return pdf
+        log.info(
+            "certificate %s: %d -> %d bytes (%d images re-encoded, %d deduplicated)",
+            donation_id, report.bytes_in, report.bytes_out, report.images, report.deduplicated,
+        )
+        return pdf
+
+    def check_injection_parity(self, data: CertificateData) -> Dict[str, bool]:
+        """
+        Render `data` from a fresh page load and by re-filling an already loaded template, and
+        compare the resulting DOM and PDF (ignoring creation dates / document ID).
+        """
+        tpl = self._injectable_template()
+        if tpl is None:
+            raise RuntimeError("Template reuse is not available for this template/engine.")
+        clean = validate_data(data)
+        fresh_pdf, fresh_dom = self.engine._render(self._render_html(clean), snapshot=True)
+
+        # Fill another donor first, so the page compared really has been re-filled.
+        decoy = dataclasses.replace(clean, donor_name="Parity Check", donation_id="PARITY-0000",
+                                    amount_in_inr=Decimal("1.00"))
+        self.engine._render_injected(tpl[0], tpl[1], cert_payload(decoy))
+        reused_pdf, reused_dom = self.engine._render_injected(tpl[0], tpl[1], cert_payload(clean), snapshot=True)
+        return {
+            "dom_equal": fresh_dom == reused_dom,
+            "pdf_equal": _PDF_VOLATILE_RE.sub(b"", fresh_pdf) == _PDF_VOLATILE_RE.sub(b"", reused_pdf),
+        }
+
+    def _render_cache_key(self, clean: CertificateData) -> Optional[str]:
+        """`cache_key` when this generator's renders may go in the render cache, else None."""
+        if not self.cache or not self.engine.cacheable:
+            return None
+        return self.cache_key(clean)
+
+    def _from_cache(self, key: Optional[str], out_pdf: Path) -> bool:
+        if key is None:
+            return False
+        cached = self.cache.get(key)
+        if cached is None:
+            return False
+        try:
+            _with_parent_dir(out_pdf, lambda: _link_or_copy(cached, out_pdf))
+        except FileNotFoundError:
+            return False  # evicted between lookup and link
+        return True
+
+    def generate(self, data: CertificateData, out_pdf: Path) -> Path:
+        """
+        Render `data` to `out_pdf`. With a cache, a repeat of an earlier (template, data) pair
+        returns the earlier artifact, including its original "rendered at" time.
+        """
+        with timed_stage("validate"):
+            clean = validate_data(data)
+        key = self._render_cache_key(clean)
+        with timed_stage("cache_lookup"):
+            if self._from_cache(key, out_pdf):
+                return out_pdf
+
+        pdf = self._render_bytes(clean)
+        with timed_stage("write"):
+            _with_parent_dir(out_pdf, lambda: write_atomic(out_pdf, pdf))
+        if key is not None:
+            self.cache.put(key, out_pdf)
+        return out_pdf
+
+    def generate_bytes(self, data: CertificateData, store_in_cache: bool = True) -> bytes:
+        """
+        Render `data` and return the PDF bytes; nothing is written outside the cache.
+        `store_in_cache=False` only reads the cache, leaving the write to a later `save`.
+        """
+        return self.fetch_or_render(data, store_in_cache)[0]
+
+    def fetch_or_render(self, data: CertificateData, store_in_cache: bool = True) -> Tuple[bytes, bool]:
+        """`generate_bytes`, plus whether the PDF came from the render cache."""
+        with timed_stage("validate"):
+            clean = validate_data(data)
+        key = self._render_cache_key(clean)
+        if key is not None:
+            with timed_stage("cache_lookup"):
+                cached = self.cache.get(key)
+                if cached is not None:
+                    try:
+                        return cached.read_bytes(), True
+                    except FileNotFoundError:
+                        pass  # evicted between lookup and read
+
+        pdf = self._render_bytes(clean)
+        if key is not None and store_in_cache:
+            self.cache.put_bytes(key, pdf)
+        return pdf, False
+
+    def save(self, data: CertificateData, pdf: bytes, out_pdf: Path) -> Path:
+        """Write bytes from `generate_bytes` to `out_pdf` and record them in the cache."""
+        clean = validate_data(data)
+        with timed_stage("write"):
+            _with_parent_dir(out_pdf, lambda: write_atomic(out_pdf, pdf))
+        key = self._render_cache_key(clean)
+        if key is not None:
+            self.cache.put(key, out_pdf)
+        return out_pdf
+
+    def generate_batch(
+        self,
+        records: Iterable[Any],
+        out_dir: Optional[Path] = None,
+        max_workers: int = 4,
+        filename_for: Callable[[CertificateData], str] = default_filename,
+        render: Optional[Callable[[CertificateData], Tuple[Path, bool]]] = None,
+    ) -> Iterator[BatchResult]:
+        """
+        Render many records, at most `max_workers` at a time, yielding results in completion order.
+
+        Records may be `CertificateData` or `/generate`-style dicts. `records` is consumed lazily,
+        so a large input never sits in memory as pending work. A bad record yields a failed
+        `BatchResult` instead of aborting the batch. Each record is written to
+        `out_dir / filename_for(...)`, or handed to `render(data) -> (path, reused)` instead
+        (e.g. the service's idempotent /generate path).
+        """
+        if render is None:
+            if out_dir is None:
+                raise ValueError("generate_batch needs out_dir or render.")
+
+            def render(data: CertificateData) -> Tuple[Path, bool]:
+                return self.generate(data, out_dir / filename_for(validate_data(data))), False
+
+        def _one(index: int, record: Any) -> BatchResult:
+            donation_id = record.get("donation_id") if isinstance(record, dict) else getattr(record, "donation_id", None)
+            try:
+                if isinstance(record, Exception):
+                    raise record
+                data = record if isinstance(record, CertificateData) else parse_certificate_request(record)
+                path, reused = render(data)
+                return BatchResult(index, data.donation_id, True, path=path, reused=reused)
+            except Exception as e:
+                return BatchResult(index, None if donation_id is None else str(donation_id), False, error=str(e))
+
+        it = enumerate(records)
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="cert-batch") as pool:
+            pending = set()
+            for index, record in it:
+                pending.add(pool.submit(_one, index, record))
+                if len(pending) >= max_workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        yield fut.result()
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    yield fut.result()
+
+    # ---- statements: many donations of one donor in one PDF ------------------------
+    def generate_statement(
+        self,
+        records: Sequence[CertificateData],
+        summary: bool = False,
+        summary_template: str = "statement_summary.html",
+    ) -> bytes:
+        """
+        One PDF for a donor's donations (e.g. an annual 80G statement), in date order.
+
+        - Default: one certificate page per donation. Jinja templates are rendered into a single
+          HTML document and printed in one pass, so the template's images and fonts are
+          embedded once. Script-filled templates (v18) are re-filled on one loaded page per
+          donation and the pages merged, with identical images stored once.
+        - `summary=True`: a single table of all donations with the total (`summary_template`).
+        """
+        if not records:
+            raise ValidationError("A statement needs at least one donation.")
+        if len(records) > self.max_statement_records:
+            raise ValidationError(f"A statement holds at most {self.max_statement_records} donations.")
+        with timed_stage("validate"):
+            cleans = sorted((validate_data(r) for r in records), key=lambda c: (c.donation_date, c.donation_id))
+            if len({c.donor_name.casefold() for c in cleans}) > 1:
+                raise ValidationError("All donations in a statement must belong to the same donor.")
+
+        if summary:
+            pdf = self.engine.render_pdf_bytes(self._render_summary_html(cleans, summary_template))
+        elif "applyCertData" in self.renderer.get(self.template_name).source:
+            pdf = self._statement_by_page(cleans)
+        else:
+            with timed_stage("template"):
+                html = _combine_pages([self._render_html(c) for c in cleans])
+            pdf = self.engine.render_pdf_bytes(html)
+        return self._optimize(pdf, f"statement:{cleans[0].donation_id}")
+
+    def _statement_by_page(self, cleans: List[CertificateData]) -> bytes:
+        if self.engine.supports_injection:
+            # load the template once (kept warm), then only fill + print per donation
+            key = self.template_sha256()
+            html = self.renderer.render(self.template_name, {})
+            pages = [self.engine.render_injected_bytes(key, html, cert_payload(c)) for c in cleans]
+        else:
+            pages = [self.engine.render_pdf_bytes(self._render_html(c)) for c in cleans]
+        with timed_stage("merge"):
+            return merge_pdfs(pages)
+
+    def _render_summary_html(self, cleans: List[CertificateData], template: str) -> str:
+        first = cleans[0]
+        context = {
+            "donor_name": first.donor_name,
+            "org_name": first.org_name,
+            "org_subtitle": first.org_subtitle,
+            "show_80g_note": any(c.show_80g_note for c in cleans),
+            "period_start": cleans[0].donation_date,
+            "period_end": cleans[-1].donation_date,
+            "donations": [
+                {
+                    "donation_id": c.donation_id,
+                    "donation_date": c.donation_date,
+                    "amount": c.amount_in_inr,
+                    "payment_mode": c.payment_mode,
+                }
+                for c in cleans
+            ],
+            "total": sum((c.amount_in_inr for c in cleans), Decimal("0.00")),
+            "rendered_at": datetime.utcnow().strftime("%d %b %Y, %H:%M UTC"),
+        }
+        with timed_stage("template"):
+            return self.renderer.render(template, context)
+
+    def warm_up(self, renders: int = 1) -> float:
+        """
+        Start the engine and render `renders` throwaway certificates at once, so browsers, template
+        pages, fonts, the overlay background and the optimizer are primed before the first donor.
+        Nothing is cached or written. Returns the seconds it took.
+        """
+        start = time.perf_counter()
+        self.engine.start()
+        sample = validate_data(CertificateData(
+            donor_name="Warm-up Donor",
+            amount_in_inr=Decimal("1.00"),
+            donation_id="WARMUP",
+            donation_date=date.today(),
+        ))
+        renders = max(1, renders)
+        with ThreadPoolExecutor(max_workers=renders, thread_name_prefix="warm-up") as pool:
+            for fut in [pool.submit(self._render_bytes, sample) for _ in range(renders)]:
+                fut.result()
+        return time.perf_counter() - start
+
+    def close(self) -> None:
+        self.engine.close()
+
+
+# ------------------------------------------------------------------------------
+# Exact v18 renderer
+# ------------------------------------------------------------------------------
+
 class ExactCertificatePDF:
-    def __init__(self, html_path: Path):
+    def __init__(self, html_path: Path, pool: Optional[BrowserPool] = None, bundle_dir: Optional[Path] = None):
         if not html_path.exists():
             raise FileNotFoundError(f"Template not found: {html_path}")
+        if bundle_dir:
+            # same template, fonts/images inlined
+            html_path = _bundled_or_source(html_path, bundle_dir / html_path.name, html_path.parent / "assets")
         self.html_path = html_path.resolve()
+        self.pool = pool or BrowserPool(size=1)
 
     def generate(self, data: CertInput, out_pdf: Path) -> Path:
         out_pdf = out_pdf.resolve()
         payload = data.to_cert_data()
 
-        with sync_playwright() as p:
-            browser = p.chromium.launch()
-            context = browser.new_context()  # default A4 is set via CSS in your HTML
-            page = context.new_page()
-
+        def _print(page) -> None:
             # Inject window.CERT_DATA BEFORE any scripts execute in your HTML.
             page.add_init_script(f"window.CERT_DATA = {json.dumps(payload, ensure_ascii=False)};")
 
-            # Load local HTML; allow fonts/images to load; wait for network idle.
+            # Load local HTML; images are in at "load", then wait for the fonts.
             page.goto(f"file://{self.html_path}", wait_until="load")
-            page.wait_for_load_state("networkidle")
+            page.evaluate(_FONTS_READY_JS)
 
             # Optional: ensure the dynamic text is present before printing
             page.wait_for_selector("#donorName")
@@ -87,35 +1936,121 @@ class ExactCertificatePDF:
                 margin={"top": "0", "right": "0", "bottom": "0", "left": "0"},
                 scale=1.0,
             )
-            browser.close()
+
+        self.pool.run(_print)
         return out_pdf
 
+    def close(self) -> None:
+        self.pool.close()
+
 
 # --- CLI for quick testing ----------------------------------------------------
 def _cli():
     import argparse
     parser = argparse.ArgumentParser(description="Generate donation certificate PDF exactly from the provided HTML.")
     parser.add_argument("--html", required=True, help="Path to donation_certificate_temple_v18.html")
-    parser.add_argument("--out", required=True, help="Output PDF path")
-    parser.add_argument("--name", required=True, help="Donor name")
-    parser.add_argument("--amount", required=True, help="Amount in INR (e.g., 500 or 500.00)")
-    parser.add_argument("--id", required=True, help="Donation/Receipt ID")
-    parser.add_argument("--date", required=True, help="Donation date (YYYY-MM-DD preferred)")
-    parser.add_argument("--reason", default="for their valued contribution")
+    parser.add_argument("--out", help="Output PDF path")
+    parser.add_argument("--name", help="Donor name")
+    parser.add_argument("--amount", help="Amount in INR (e.g., 500 or 500.00)")
+    parser.add_argument("--id", help="Donation/Receipt ID")
+    parser.add_argument("--date", help="Donation date (YYYY-MM-DD preferred)")
+    parser.add_argument("--reason", default=DEFAULT_REASON_TEXT)
+    parser.add_argument("--bundle-dir", default=None, help="Directory with bundled templates (lib/template_assets.py)")
+    parser.add_argument("--check-parity", action="store_true",
+                        help="Compare a fresh page load against a re-filled, reused template page")
+    parser.add_argument("--batch", help="JSONL file, one /generate request body per line")
+    parser.add_argument("--out-dir", default="output", help="Output directory for --batch")
+    parser.add_argument("--workers", type=int, default=4, help="Parallel renders for --batch")
+    parser.add_argument("--optimize", action="store_true",
+                        help="Shrink the PDF (downsample/re-encode images, linearize); needs pikepdf")
+    parser.add_argument("--dpi", type=int, default=150, help="Image resolution kept by --optimize")
     args = parser.parse_args()
 
-    doc = ExactCertificatePDF(Path(args.html))
-    pdf = doc.generate(
-        CertInput(
-            donor_name=args.name,
-            amount_in_inr=args.amount,
-            donation_id=args.id,
-            donation_date=args.date,
-            reason_text=args.reason,
-        ),
-        Path(args.out),
-    )
+    if args.batch:
+        sys.exit(_cli_batch(args))
+
+    required = ("name", "amount", "id", "date") if args.check_parity else ("out", "name", "amount", "id", "date")
+    missing = [f"--{k}" for k in required if getattr(args, k) is None]
+    if missing:
+        parser.error(f"the following arguments are required: {', '.join(missing)}")
+    if args.check_parity:
+        sys.exit(_cli_check_parity(args))
+
+    doc = ExactCertificatePDF(Path(args.html), bundle_dir=Path(args.bundle_dir) if args.bundle_dir else None)
+    try:
+        pdf = doc.generate(
+            CertInput(
+                donor_name=args.name,
+                amount_in_inr=args.amount,
+                donation_id=args.id,
+                donation_date=args.date,
+                reason_text=args.reason,
+            ),
+            Path(args.out),
+        )
+    finally:
+        doc.close()
+    if args.optimize:
+        data, report = PdfOptimizer(dpi=args.dpi).optimize(pdf.read_bytes())
+        write_atomic(pdf, data)
+        print(f"🗜️  Optimized: {report.bytes_in:,} -> {report.bytes_out:,} bytes")
     print(f"✅ PDF generated at: {pdf}")
 
+
+def _cli_check_parity(args) -> int:
+    html = Path(args.html)
+    gen = CertificateGenerator(
+        template_dir=html.parent,
+        template_name=html.name,
+        engine=PlaywrightEngine(BrowserPool(size=1)),  # one browser: the reused page is the one compared
+        bundle_dir=Path(args.bundle_dir) if args.bundle_dir else None,
+        reuse_template_pages=True,
+    )
+    data = CertificateData(
+        donor_name=args.name,
+        amount_in_inr=Decimal(args.amount),
+        donation_id=args.id,
+        donation_date=datetime.strptime(args.date, "%Y-%m-%d").date(),
+        extra_meta={"reason_text": args.reason},
+    )
+    try:
+        result = gen.check_injection_parity(data)
+    finally:
+        gen.close()
+    ok = all(result.values())
+    print(f"{'✅' if ok else '❌'} Template reuse parity: {json.dumps(result)}")
+    return 0 if ok else 1
+
+
+def _cli_batch(args) -> int:
+    html = Path(args.html)
+    gen = CertificateGenerator(
+        template_dir=html.parent,
+        template_name=html.name,
+        engine=PlaywrightEngine(BrowserPool(size=max(1, min(args.workers, 4)))),
+        bundle_dir=Path(args.bundle_dir) if args.bundle_dir else None,
+        optimizer=PdfOptimizer(dpi=args.dpi) if args.optimize else None,
+    )
+
+    def _records():
+        with open(args.batch, encoding="utf-8") as fh:
+            for line in fh:
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    yield ValidationError(f"Invalid JSON: {e}")
+
+    failed = 0
+    try:
+        for result in gen.generate_batch(_records(), Path(args.out_dir), max_workers=args.workers):
+            failed += not result.ok
+            print(json.dumps(result.to_dict(), ensure_ascii=False), flush=True)
+    finally:
+        gen.close()
+    print(f"{'❌' if failed else '✅'} Batch finished, {failed} failed", file=sys.stderr)
+    return 1 if failed else 0
+
 if __name__ == "__main__":
-    _cli()
\ No newline at end of file
+    _cli()
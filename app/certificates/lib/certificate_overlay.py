@@ -0,0 +1,607 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Overlay rendering: certificates without a browser.
+
+Only the donor fields (name, reason, amount, ID, date) change between certificates. `OverlayRenderer`
+prints the template once per template hash with those fields hidden (the background) and measures
+where the browser lays them out: anchor, baseline, available width, font, colour. Each certificate is
+then a small reportlab text layer stamped onto the cached background with pikepdf, a few
+milliseconds of Python.
+
+- Fonts come from the template's own @font-face rules, so bundle it first (lib/template_assets.py);
+  variable fonts are instanced at the weight / optical size the browser used.
+- A value that would not fit on its field's line, or needs a glyph no face provides, is rendered
+  by the browser as usual.
+- `check_parity` rasterizes the overlay and the browser output (pypdfium2) and compares pixels.
+
+    python -m lib.certificate_overlay --html templates/donation_certificate_temple_v18.html \\
+        --bundle-dir bundled --name "John Doe" --amount 1500 --id DN-171025-0001 --date 2025-10-17
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import io
+import json
+import logging
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from lib.certificate_generator import (
+    _FONTS_READY_JS,
+    _PDF_OPTIONS,
+    DEFAULT_REASON_TEXT,
+    CertificateData,
+    PlaywrightEngine,
+    TemplateRenderer,
+    validate_data,
+    write_atomic,
+)
+
+# ---- Optional dependencies ---------------------------------------------------
+_OVERLAY_AVAILABLE = True
+try:
+    import pikepdf
+    from fontTools.ttLib import TTFont as _FTFont  # pip install fonttools brotli (woff2)
+    from fontTools.varLib import instancer
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.pdfgen import canvas
+except Exception:
+    _OVERLAY_AVAILABLE = False
+
+_PDFIUM_AVAILABLE = True
+try:
+    import pypdfium2 as pdfium  # only for check_parity
+    from PIL import ImageChops
+except Exception:
+    _PDFIUM_AVAILABLE = False
+
+log = logging.getLogger(__name__)
+
+_PX_TO_PT = 0.75  # CSS px are 1/96 in, PDF points 1/72 in
+_A4_VIEWPORT = {"width": 794, "height": 1123}  # 210 x 297 mm in CSS px: layout as printed
+
+
+class OverlayUnavailable(RuntimeError):
+    pass
+
+
+# ------------------------------------------------------------------------------
+# Fields
+# ------------------------------------------------------------------------------
+
+def _reason(clean: CertificateData) -> str:
+    return str((clean.extra_meta or {}).get("reason_text") or DEFAULT_REASON_TEXT)
+
+
+# v18 `applyCertData`: element id -> the text it writes there for a certificate.
+V18_FIELDS: Dict[str, Callable[[CertificateData], str]] = {
+    "donorName": lambda c: c.donor_name,
+    "reasonText": _reason,
+    "amountDonated": lambda c: TemplateRenderer._fmt_inr(c.amount_in_inr),  # Intl en-IN currency
+    "donationId": lambda c: c.donation_id,
+    "donationDate": lambda c: c.donation_date.strftime("%d-%m-%Y"),
+}
+
+# Measures each field as printed. The anchor is whichever edge (or the centre) stays put when the
+# text grows; the max width is the widest line the text may take before it wraps.
+_MEASURE_FIELDS_JS = """
+ids => ids.map(id => {
+  const el = document.getElementById(id);
+  if (!el) return null;
+  const cs = getComputedStyle(el);
+  const original = el.textContent;
+  const probe = document.createElement('span');
+  probe.style.cssText = 'display:inline-block;width:0;height:0;vertical-align:baseline';
+  const measure = text => {
+    el.textContent = text;
+    const range = document.createRange();
+    range.selectNodeContents(el);
+    const t = range.getBoundingClientRect();
+    el.appendChild(probe);
+    const baseline = probe.getBoundingClientRect().top;
+    const height = el.getBoundingClientRect().height;
+    probe.remove();
+    return {left: t.left, right: t.right, baseline, height};
+  };
+  const a = measure('M'), b = measure('MMMMMMMMMMMM'), wide = measure('M '.repeat(400));
+  el.textContent = original;
+  const near = (x, y) => Math.abs(x - y) < 0.5;
+  let anchor = null, x = null;
+  if (near(a.left, b.left)) { anchor = 'left'; x = a.left; }
+  else if (near(a.right, b.right)) { anchor = 'right'; x = a.right; }
+  else if (near((a.left + a.right) / 2, (b.left + b.right) / 2)) { anchor = 'center'; x = (a.left + a.right) / 2; }
+  return {
+    id, anchor, x, baseline: a.baseline,
+    max_width: wide.height > a.height ? wide.right - wide.left : null,
+    families: cs.fontFamily, weight: parseInt(cs.fontWeight, 10), style: cs.fontStyle,
+    size: parseFloat(cs.fontSize), color: cs.color,
+    letter_spacing: cs.letterSpacing === 'normal' ? 0 : parseFloat(cs.letterSpacing),
+    transform: cs.textTransform,
+  };
+})
+"""
+
+
+@dataclass(frozen=True)
+class FieldLayout:
+    """Where and how the browser draws one field (CSS px, page origin top-left)."""
+    id: str
+    anchor: str  # left | right | center
+    x: float
+    baseline: float
+    max_width: Optional[float]
+    families: str
+    weight: int
+    style: str
+    size: float
+    color: str
+    letter_spacing: float
+    transform: str
+
+
+def _parse_color(css: str) -> Tuple[float, float, float, float]:
+    m = re.match(r"rgba?\(\s*([\d.]+)[,\s]+([\d.]+)[,\s]+([\d.]+)(?:\s*[,/]\s*([\d.]+))?", css)
+    if not m:
+        raise OverlayUnavailable(f"Unsupported text colour: {css}")
+    r, g, b = (float(v) / 255 for v in m.group(1, 2, 3))
+    return r, g, b, float(m.group(4)) if m.group(4) else 1.0
+
+
+# ------------------------------------------------------------------------------
+# Fonts
+# ------------------------------------------------------------------------------
+
+_FONT_FACE_RE = re.compile(r"@font-face\s*\{([^}]*)\}", re.IGNORECASE)
+# `name: value;` where the value may hold `;` inside url(...) or quotes (data:font/woff2;base64,...)
+_DESCRIPTOR_RE = re.compile(r"""([\w-]+)\s*:\s*((?:[^;()"']|\([^)]*\)|"[^"]*"|'[^']*')+)""")
+_SRC_URL_RE = re.compile(r"""url\(\s*(["']?)([^"')]+)\1\s*\)""")
+_DATA_URI_RE = re.compile(r"data:[^;,]*(;base64)?,(.*)", re.DOTALL)
+
+
+@dataclass(frozen=True)
+class FontFace:
+    family: str
+    weight: Tuple[int, int]
+    style: str
+    ranges: Tuple[Tuple[int, int], ...]  # unicode-range; empty = everything
+    data: bytes
+
+    def covers(self, ch: str) -> bool:
+        return not self.ranges or any(lo <= ord(ch) <= hi for lo, hi in self.ranges)
+
+
+def _unicode_ranges(value: str) -> Tuple[Tuple[int, int], ...]:
+    ranges = []
+    for part in value.split(","):
+        part = part.strip().upper().removeprefix("U+")
+        if "?" in part:
+            lo, hi = part.replace("?", "0"), part.replace("?", "F")
+        else:
+            lo, _, hi = part.partition("-")
+        ranges.append((int(lo, 16), int(hi or lo, 16)))
+    return tuple(ranges)
+
+
+def _strip_quotes(s: str) -> str:
+    return s.strip().strip("'\"").strip()
+
+
+class FontBook:
+    """The template's @font-face faces, matched roughly the way the browser matches them."""
+
+    def __init__(self, faces: List[FontFace]):
+        self.faces = faces
+        self._lock = threading.Lock()
+        self._instances: Dict[tuple, Optional[Tuple[str, set]]] = {}
+
+    @classmethod
+    def from_html(cls, html: str, base_dir: Optional[Path] = None) -> "FontBook":
+        faces = []
+        for block in _FONT_FACE_RE.findall(html):
+            desc = {k.lower(): v.strip() for k, v in _DESCRIPTOR_RE.findall(block)}
+            data = None
+            for url in _SRC_URL_RE.findall(desc.get("src", "")):
+                data = cls._load(url[1], base_dir)
+                if data is not None:
+                    break
+            if data is None or "font-family" not in desc:
+                continue
+            weights = [int(w) for w in re.findall(r"\d+", desc.get("font-weight", "400"))] or [400]
+            faces.append(FontFace(
+                family=_strip_quotes(desc["font-family"]).lower(),
+                weight=(min(weights), max(weights)),
+                style=desc.get("font-style", "normal").lower(),
+                ranges=_unicode_ranges(desc["unicode-range"]) if "unicode-range" in desc else (),
+                data=data,
+            ))
+        return cls(faces)
+
+    @staticmethod
+    def _load(url: str, base_dir: Optional[Path]) -> Optional[bytes]:
+        m = _DATA_URI_RE.match(url)
+        if m:
+            return base64.b64decode(m.group(2)) if m.group(1) else m.group(2).encode("latin-1")
+        if url.startswith(("http://", "https://")) or base_dir is None:
+            return None  # remote fonts: bundle the template (lib/template_assets.py)
+        path = base_dir / url
+        return path.read_bytes() if path.is_file() else None
+
+    def _candidates(self, family: str, weight: int, style: str) -> List[FontFace]:
+        faces = [f for f in self.faces if f.family == family and f.style == style] or \
+                [f for f in self.faces if f.family == family]
+
+        def _distance(face: FontFace) -> Tuple[int, int]:
+            lo, hi = face.weight
+            if lo <= weight <= hi:
+                return 0, 0
+            # CSS: bold requests prefer heavier faces, light requests lighter ones
+            heavier_first = weight > 500
+            gap = lo - weight if lo > weight else weight - hi
+            wrong_side = (lo < weight) if heavier_first else (lo > weight)
+            return int(wrong_side), gap
+
+        return sorted(faces, key=_distance)
+
+    def font_for(self, families: str, weight: int, style: str, size_px: float, ch: str) -> Optional[str]:
+        """reportlab font name that draws `ch` like the browser would, or None."""
+        for family in (_strip_quotes(f).lower() for f in families.split(",")):
+            for face in self._candidates(family, weight, style):
+                if not face.covers(ch):
+                    continue
+                instance = self._instance(face, weight, size_px)
+                if instance is not None and ord(ch) in instance[1]:
+                    return instance[0]
+        return None
+
+    def _instance(self, face: FontFace, weight: int, size_px: float) -> Optional[Tuple[str, set]]:
+        wght = min(max(weight, face.weight[0]), face.weight[1])
+        key = (hashlib.sha256(face.data).hexdigest()[:16], wght, round(size_px, 1))
+        with self._lock:
+            if key in self._instances:
+                return self._instances[key]
+            try:
+                font = _FTFont(io.BytesIO(face.data))
+                if "fvar" in font:
+                    axes = {a.axisTag: (a.minValue, a.maxValue) for a in font["fvar"].axes}
+                    location = {}
+                    if "wght" in axes:
+                        location["wght"] = min(max(wght, axes["wght"][0]), axes["wght"][1])
+                    if "opsz" in axes:  # font-optical-sizing: auto
+                        location["opsz"] = min(max(size_px, axes["opsz"][0]), axes["opsz"][1])
+                    font = instancer.instantiateVariableFont(font, location)
+                font.flavor = None
+                buf = io.BytesIO()
+                font.save(buf)
+                name = f"overlay-{key[0]}-{key[1]}-{key[2]}"
+                pdfmetrics.registerFont(TTFont(name, io.BytesIO(buf.getvalue())))
+                instance = (name, set(font.getBestCmap() or {}))
+            except Exception:
+                instance = None  # CFF outlines etc.: reportlab only embeds TrueType
+            self._instances[key] = instance
+            return instance
+
+
+# ------------------------------------------------------------------------------
+# Renderer
+# ------------------------------------------------------------------------------
+
+@dataclass
+class _Background:
+    pdf: bytes
+    width: float  # page size in pt
+    height: float
+    fields: List[FieldLayout]
+    fonts: FontBook
+
+
+class OverlayRenderer:
+    """
+    Background once per template (browser), text layer per certificate (pure Python).
+
+    Pass it to `CertificateGenerator(overlay=...)`; `render` returns None whenever a certificate
+    must go through the browser instead. With `store_dir`, prepared backgrounds survive restarts.
+    A background is prepared by one request at a time; if that fails, certificates go through the
+    browser for `retry_seconds` before the next attempt.
+    """
+
+    def __init__(
+        self,
+        fields: Optional[Dict[str, Callable[[CertificateData], str]]] = None,
+        store_dir: Optional[Path] = None,
+        sample: Optional[CertificateData] = None,
+        retry_seconds: float = 60.0,
+    ):
+        if not _OVERLAY_AVAILABLE:
+            raise OverlayUnavailable("Overlay mode needs pikepdf, fonttools, brotli and reportlab.")
+        self.fields = fields or V18_FIELDS
+        self.store_dir = store_dir
+        self.sample = sample
+        self.retry_seconds = retry_seconds
+        self._lock = threading.Lock()
+        self._backgrounds: Dict[str, Optional[_Background]] = {}
+        self._preparing: Dict[str, threading.Event] = {}
+        self._failed_at: Dict[str, float] = {}  # key -> monotonic time of the last failed prepare
+        self.renders = 0
+        self.fallbacks = 0
+        self.prepared = 0
+        self.errors = 0
+        self._render_seconds = 0.0
+
+    # ---- background ----------------------------------------------------------
+    def _key(self, generator) -> str:
+        h = hashlib.sha256(generator.template_sha256().encode())
+        h.update(",".join(self.fields).encode())
+        if generator.optimizer is not None:
+            h.update(generator.optimizer.signature().encode())
+        return h.hexdigest()
+
+    def background(self, generator) -> Optional[_Background]:
+        """The prepared background for the generator's current template (None: not applicable)."""
+        key = self._key(generator)
+        while True:
+            with self._lock:
+                if key in self._backgrounds:
+                    return self._backgrounds[key]
+                failed_at = self._failed_at.get(key)
+                if failed_at is not None and time.monotonic() - failed_at < self.retry_seconds:
+                    return None
+                flight = self._preparing.get(key)
+                if flight is None:
+                    flight = self._preparing[key] = threading.Event()
+                    break
+            flight.wait()  # another request is preparing it (outside the lock: a full browser render)
+
+        try:
+            bg = self._load(key, generator) or self._prepare(key, generator)
+        except Exception as e:
+            log.warning("overlay background failed, using the browser for %.0fs: %s: %s",
+                        self.retry_seconds, type(e).__name__, e)
+            with self._lock:
+                self._failed_at[key] = time.monotonic()
+                self.errors += 1
+            return None
+        else:
+            with self._lock:
+                self._backgrounds[key] = bg
+                self._failed_at.pop(key, None)
+            return bg
+        finally:
+            with self._lock:
+                del self._preparing[key]
+            flight.set()
+
+    def _fonts(self, generator) -> FontBook:
+        tpl = generator.renderer.get(generator.template_name)
+        return FontBook.from_html(tpl.source, Path(tpl.filename).parent)
+
+    def _load(self, key: str, generator) -> Optional[_Background]:
+        if self.store_dir is None or not (self.store_dir / f"{key}.json").exists():
+            return None
+        meta = json.loads((self.store_dir / f"{key}.json").read_text(encoding="utf-8"))
+        return _Background(
+            pdf=(self.store_dir / f"{key}.pdf").read_bytes(),
+            width=meta["width"],
+            height=meta["height"],
+            fields=[FieldLayout(**f) for f in meta["fields"]],
+            fonts=self._fonts(generator),
+        )
+
+    def _prepare(self, key: str, generator) -> Optional[_Background]:
+        engine = generator.engine
+        if not isinstance(engine, PlaywrightEngine):
+            return None  # measuring the layout needs a page we can script
+        sample = validate_data(self.sample or CertificateData(
+            donor_name="Overlay Sample", amount_in_inr=Decimal("1500.00"), donation_id="DN-000000-0000",
+            donation_date=date.today(),
+        ))
+        html = generator._render_html(sample)
+        ids = list(self.fields)
+        hide = ",".join(f"#{i}" for i in ids) + "{visibility:hidden !important}"
+
+        def _print(page) -> tuple:
+            page.set_viewport_size(_A4_VIEWPORT)
+            page.emulate_media(media="print")
+            page.set_content(html, wait_until="load")
+            page.evaluate(_FONTS_READY_JS)
+            layout = page.evaluate(_MEASURE_FIELDS_JS, ids)
+            page.add_style_tag(content=hide)
+            return page.pdf(**_PDF_OPTIONS), layout
+
+        pdf, layout = engine.pool.run(_print)
+        if any(f is None or f["anchor"] is None for f in layout):
+            return None  # a field is missing or moves in a way a fixed anchor can't reproduce
+        pdf = generator._optimize(pdf, "overlay background")
+        with pikepdf.open(io.BytesIO(pdf)) as doc:
+            if len(doc.pages) != 1:
+                return None
+            box = [float(v) for v in doc.pages[0].mediabox]
+        bg = _Background(pdf, box[2] - box[0], box[3] - box[1], [FieldLayout(**f) for f in layout], self._fonts(generator))
+        if self.store_dir is not None:
+            self.store_dir.mkdir(parents=True, exist_ok=True)
+            write_atomic(self.store_dir / f"{key}.pdf", pdf)
+            meta = {"width": bg.width, "height": bg.height, "fields": [asdict(f) for f in bg.fields]}
+            write_atomic(self.store_dir / f"{key}.json", json.dumps(meta, indent=2).encode("utf-8"))
+        with self._lock:
+            self.prepared += 1
+        return bg
+
+    # ---- per certificate -----------------------------------------------------
+    def _text_layer(self, bg: _Background, clean: CertificateData) -> Optional[bytes]:
+        buf = io.BytesIO()
+        c = canvas.Canvas(buf, pagesize=(bg.width, bg.height), pageCompression=1, invariant=1)
+        for field in bg.fields:
+            text = self.fields[field.id](clean)
+            if field.transform == "uppercase":
+                text = text.upper()
+            elif field.transform == "lowercase":
+                text = text.lower()
+            elif field.transform not in ("none", ""):
+                return None
+
+            # split into runs of characters drawn by the same face (e.g. ₹ from latin-ext)
+            runs: List[Tuple[str, str]] = []
+            for ch in text:
+                font = bg.fonts.font_for(field.families, field.weight, field.style, field.size, ch)
+                if font is None:
+                    return None
+                if runs and runs[-1][0] == font:
+                    runs[-1] = (font, runs[-1][1] + ch)
+                else:
+                    runs.append((font, ch))
+
+            size = field.size * _PX_TO_PT
+            spacing = field.letter_spacing * _PX_TO_PT
+            width = sum(pdfmetrics.stringWidth(t, f, size) for f, t in runs) + spacing * len(text)
+            if field.max_width is not None and width > field.max_width * _PX_TO_PT + 0.5:
+                return None  # the browser would wrap it
+            x = field.x * _PX_TO_PT - {"left": 0, "right": width, "center": width / 2}[field.anchor]
+
+            r, g, b, alpha = _parse_color(field.color)
+            c.setFillColorRGB(r, g, b, alpha=alpha)
+            t = c.beginText(x, bg.height - field.baseline * _PX_TO_PT)
+            t.setCharSpace(spacing)
+            for font, run in runs:
+                t.setFont(font, size)
+                t.textOut(run)
+            c.drawText(t)
+        c.showPage()
+        c.save()
+        return buf.getvalue()
+
+    def render(self, generator, clean: CertificateData) -> Optional[bytes]:
+        """PDF bytes for `clean` stamped on the cached background, or None to render normally."""
+        bg = self.background(generator)
+        layer = self._text_layer(bg, clean) if bg is not None else None
+        if layer is None:
+            with self._lock:
+                self.fallbacks += 1
+            return None
+
+        start = time.perf_counter()
+        with pikepdf.open(io.BytesIO(bg.pdf)) as doc, pikepdf.open(io.BytesIO(layer)) as text:
+            doc.pages[0].add_overlay(text.pages[0])
+            out = io.BytesIO()
+            doc.save(
+                out,
+                object_stream_mode=pikepdf.ObjectStreamMode.generate,
+                stream_decode_level=pikepdf.StreamDecodeLevel.none,  # background streams are copied as-is
+                linearize=generator.optimizer is not None and generator.optimizer.linearize,
+                deterministic_id=True,
+            )
+        with self._lock:
+            self.renders += 1
+            self._render_seconds += time.perf_counter() - start
+        return out.getvalue()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "renders": self.renders,
+                "fallbacks": self.fallbacks,
+                "backgrounds_prepared": self.prepared,
+                "background_errors": self.errors,
+                "avg_merge_ms": round(self._render_seconds / self.renders * 1000, 2) if self.renders else 0.0,
+            }
+
+
+# ------------------------------------------------------------------------------
+# Parity
+# ------------------------------------------------------------------------------
+
+def check_parity(
+    generator,
+    data: CertificateData,
+    scale: float = 2.0,
+    pixel_threshold: int = 64,
+    max_changed_ratio: float = 0.002,
+    diff_out: Optional[Path] = None,
+) -> Dict[str, Any]:
+    """
+    Render `data` through the browser and through the overlay, rasterize both and compare.
+    `changed_ratio` is the share of pixels whose channels differ by more than `pixel_threshold`
+    (anti-aliasing and kerning differences stay below it; a moved or mis-sized field doesn't).
+    """
+    if not _PDFIUM_AVAILABLE:
+        raise RuntimeError("Parity check needs pypdfium2 (pip install pypdfium2).")
+    if generator.overlay is None:
+        raise RuntimeError("Generator has no overlay renderer.")
+    clean = validate_data(data)
+    overlay_pdf = generator.overlay.render(generator, clean)
+    if overlay_pdf is None:
+        raise OverlayUnavailable("This certificate can't be drawn as an overlay (it falls back to the browser).")
+    browser_pdf = generator._optimize(generator.engine.render_pdf_bytes(generator._render_html(clean)), clean.donation_id)
+
+    def _raster(pdf: bytes):
+        return pdfium.PdfDocument(pdf)[0].render(scale=scale).to_pil().convert("RGB")
+
+    a, b = _raster(browser_pdf), _raster(overlay_pdf)
+    if a.size != b.size:
+        return {"ok": False, "reason": f"page size differs: {a.size} vs {b.size}"}
+    diff = ImageChops.difference(a, b).convert("L")
+    changed = sum(diff.point(lambda v: 255 if v > pixel_threshold else 0).histogram()[255:])
+    ratio = changed / (a.size[0] * a.size[1])
+    if diff_out is not None:
+        diff.point(lambda v: 255 - min(255, v * 4)).save(diff_out)
+    return {
+        "ok": ratio <= max_changed_ratio,
+        "changed_ratio": round(ratio, 6),
+        "max_diff": diff.getextrema()[1],
+        "browser_bytes": len(browser_pdf),
+        "overlay_bytes": len(overlay_pdf),
+    }
+
+
+# --- CLI ----------------------------------------------------------------------
+def _cli():
+    import argparse
+    import sys
+
+    from lib.certificate_generator import BrowserPool, CertificateGenerator, PdfOptimizer
+
+    parser = argparse.ArgumentParser(description="Check overlay rendering against the browser output.")
+    parser.add_argument("--html", required=True, help="Template, e.g. templates/donation_certificate_temple_v18.html")
+    parser.add_argument("--bundle-dir", default=None, help="Directory with bundled templates (fonts inlined)")
+    parser.add_argument("--name", required=True)
+    parser.add_argument("--amount", required=True)
+    parser.add_argument("--id", required=True)
+    parser.add_argument("--date", required=True, help="YYYY-MM-DD")
+    parser.add_argument("--optimize", action="store_true", help="Compare optimized PDFs (as the service stores them)")
+    parser.add_argument("--diff-out", default=None, help="Write a diff image (PNG)")
+    args = parser.parse_args()
+
+    html = Path(args.html)
+    gen = CertificateGenerator(
+        template_dir=html.parent,
+        template_name=html.name,
+        engine=PlaywrightEngine(BrowserPool(size=1)),
+        bundle_dir=Path(args.bundle_dir) if args.bundle_dir else None,
+        optimizer=PdfOptimizer() if args.optimize else None,
+        overlay=OverlayRenderer(),
+    )
+    data = CertificateData(
+        donor_name=args.name,
+        amount_in_inr=Decimal(args.amount),
+        donation_id=args.id,
+        donation_date=datetime.strptime(args.date, "%Y-%m-%d").date(),
+    )
+    try:
+        result = check_parity(gen, data, diff_out=Path(args.diff_out) if args.diff_out else None)
+    finally:
+        gen.close()
+    print(f"{'✅' if result['ok'] else '❌'} Overlay parity: {json.dumps(result)}")
+    sys.exit(0 if result["ok"] else 1)
+
+
+if __name__ == "__main__":
+    _cli()
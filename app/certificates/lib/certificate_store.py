@@ -0,0 +1,519 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+SQLite index of generated certificates.
+
+- One row per PDF written to the output directory: donation_id, filename, relative path, size,
+  SHA-256, render fingerprint and creation time.
+- Listing is keyset-paginated, lookups by donation_id and age-based cleanup are index range
+  queries; nothing walks or stats the output directory per request.
+- `select` walks a date range and/or donation_id prefix in batches (used by the ZIP export).
+- `backfill` indexes PDFs that predate the index (one directory scan, at startup).
+- Files live in `YYYY/MM/xx/` shards (creation month, then a 256-way bucket of the donation id),
+  so no directory grows without bound; `migrate_flat` moves files written before the sharding.
+- `RecentCertificates` keeps the bytes of just-generated PDFs in memory, so the download that
+  usually follows a render is served without touching the disk.
+- `RetentionSweeper` expires old certificates from a background thread at a bounded delete rate,
+  instead of a request handler deleting the whole backlog at once.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS certificates (
+    filename    TEXT PRIMARY KEY,
+    donation_id TEXT NOT NULL,
+    relpath     TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    sha256      TEXT NOT NULL,
+    render_key  TEXT,
+    created_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS certificates_donation ON certificates (donation_id, created_at);
+CREATE INDEX IF NOT EXISTS certificates_created ON certificates (created_at, filename);
+"""
+
+# certificate_<donation id>_<timestamp>[_<fingerprint>].pdf, for files written before the index
+_FILENAME_RE = re.compile(r"^certificate_(.+?)_(\d{4}-?\d{2}-?\d{2}[T_][\d-]+)(?:_[0-9a-f]{8})?\.pdf$")
+
+
+def _filename_time(stamp: str) -> Optional[float]:
+    """Local creation time from a filename's timestamp (`20251018_093000`, `2025-10-18T09-30-00`)."""
+    digits = re.sub(r"\D", "", stamp)
+    for fmt, n in (("%Y%m%d%H%M%S", 14), ("%Y%m%d%H%M", 12)):
+        if len(digits) >= n:
+            try:
+                return datetime.strptime(digits[:n], fmt).timestamp()
+            except ValueError:
+                return None
+    return None
+
+
+def _prefix_end(prefix: str) -> Optional[str]:
+    """Smallest string above every string starting with `prefix` (None: there is none)."""
+    stem = prefix.rstrip(chr(sys.maxunicode))
+    if not stem:
+        return None
+    nxt = ord(stem[-1]) + 1
+    if 0xD800 <= nxt <= 0xDFFF:
+        nxt = 0xE000  # surrogates can't be stored as text: skip to the next code point SQLite orders after
+    return stem[:-1] + chr(nxt)
+
+
+@dataclass(frozen=True)
+class StoredCertificate:
+    filename: str
+    donation_id: str
+    relpath: str  # relative to the output directory
+    size: int
+    sha256: str
+    render_key: Optional[str]
+    created_at: float
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "filename": self.filename,
+            "donation_id": self.donation_id,
+            "size": self.size,
+            "sha256": self.sha256,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.created_at)),
+        }
+
+
+def _sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def shard_dir(donation_id: str, created_at: float) -> str:
+    """`YYYY/MM/xx` for a certificate: month it was created, then a bucket of its donation id."""
+    t = time.localtime(created_at)
+    bucket = hashlib.sha1(donation_id.encode("utf-8")).hexdigest()[:2]
+    return f"{t.tm_year:04d}/{t.tm_mon:02d}/{bucket}"
+
+
+class CertificateStore:
+    """Metadata index for the PDFs under `output_dir` (the files themselves stay on disk)."""
+
+    def __init__(self, output_dir: Path, db_path: Path):
+        self.output_dir = output_dir
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self.created = not db_path.exists()  # new index: existing PDFs still need a `backfill`
+        self._db = sqlite3.connect(str(db_path), check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def path(self, cert: StoredCertificate) -> Path:
+        return self.output_dir / cert.relpath
+
+    def path_for(self, donation_id: str, filename: str, created_at: Optional[float] = None) -> Path:
+        """Where a new certificate should be written (its shard under `output_dir`)."""
+        when = time.time() if created_at is None else created_at
+        return self.output_dir / shard_dir(donation_id, when) / filename
+
+    @staticmethod
+    def _row(row: Optional[sqlite3.Row]) -> Optional[StoredCertificate]:
+        return None if row is None else StoredCertificate(**dict(row))
+
+    def add(
+        self, donation_id: str, path: Path, render_key: Optional[str] = None, created_at: Optional[float] = None
+    ) -> StoredCertificate:
+        """Index a PDF that was just written under `output_dir`."""
+        # not the file's mtime: a render cache hit is a hard link to an older file
+        st = path.stat()
+        cert = StoredCertificate(
+            filename=path.name,
+            donation_id=donation_id,
+            relpath=path.relative_to(self.output_dir).as_posix(),
+            size=st.st_size,
+            sha256=_sha256_file(path),
+            render_key=render_key,
+            created_at=time.time() if created_at is None else created_at,
+        )
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO certificates VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (cert.filename, cert.donation_id, cert.relpath, cert.size, cert.sha256, cert.render_key, cert.created_at),
+            )
+        return cert
+
+    def get(self, filename: str) -> Optional[StoredCertificate]:
+        with self._lock:
+            return self._row(self._db.execute("SELECT * FROM certificates WHERE filename = ?", (filename,)).fetchone())
+
+    def latest(self, donation_id: str) -> Optional[StoredCertificate]:
+        with self._lock:
+            return self._row(self._db.execute(
+                "SELECT * FROM certificates WHERE donation_id = ? ORDER BY created_at DESC LIMIT 1", (donation_id,)
+            ).fetchone())
+
+    def for_donation(self, donation_id: str) -> List[StoredCertificate]:
+        """Every version rendered for `donation_id`, newest first."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT * FROM certificates WHERE donation_id = ? ORDER BY created_at DESC", (donation_id,)
+            ).fetchall()
+        return [self._row(r) for r in rows]
+
+    def page(self, limit: int = 50, cursor: Optional[str] = None) -> Tuple[List[StoredCertificate], Optional[str]]:
+        """
+        Newest first. `cursor` is the `next_cursor` of the previous page; the page query is a seek
+        on the (created_at, filename) index however deep into the archive it is.
+        """
+        with self._lock:
+            if cursor:
+                created_at, _, filename = cursor.partition(":")
+                rows = self._db.execute(
+                    "SELECT * FROM certificates WHERE (created_at, filename) < (?, ?) "
+                    "ORDER BY created_at DESC, filename DESC LIMIT ?",
+                    (float(created_at), filename, limit + 1),
+                ).fetchall()
+            else:
+                rows = self._db.execute(
+                    "SELECT * FROM certificates ORDER BY created_at DESC, filename DESC LIMIT ?", (limit + 1,)
+                ).fetchall()
+        certs = [self._row(r) for r in rows[:limit]]
+        next_cursor = f"{certs[-1].created_at!r}:{certs[-1].filename}" if len(rows) > limit else None
+        return certs, next_cursor
+
+    def select(
+        self,
+        created_from: Optional[float] = None,
+        created_to: Optional[float] = None,
+        donation_prefix: Optional[str] = None,
+        batch_size: int = 500,
+    ) -> Iterator[StoredCertificate]:
+        """
+        Certificates created in `[created_from, created_to)` and/or whose donation_id starts with
+        `donation_prefix`, oldest first. Fetched `batch_size` rows at a time (keyset), so a large
+        selection is never held in memory.
+        """
+        where, args = [], []
+        if created_from is not None:
+            where.append("created_at >= ?")
+            args.append(created_from)
+        if created_to is not None:
+            where.append("created_at < ?")
+            args.append(created_to)
+        if donation_prefix:
+            # a range, not LIKE: uses the donation_id index and needs no escaping
+            where.append("donation_id >= ?")
+            args.append(donation_prefix)
+            end = _prefix_end(donation_prefix)
+            if end is not None:
+                where.append("donation_id < ?")
+                args.append(end)
+        cursor: Tuple[float, str] = (float("-inf"), "")
+        while True:
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT * FROM certificates WHERE " + " AND ".join(where + ["(created_at, filename) > (?, ?)"])
+                    + " ORDER BY created_at, filename LIMIT ?",
+                    (*args, *cursor, batch_size),
+                ).fetchall()
+            for row in rows:
+                yield self._row(row)
+            if len(rows) < batch_size:
+                return
+            cursor = (rows[-1]["created_at"], rows[-1]["filename"])
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM certificates").fetchone()[0]
+
+    def older_than(self, cutoff: float, limit: int = 1000) -> List[StoredCertificate]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT * FROM certificates WHERE created_at < ? ORDER BY created_at LIMIT ?", (cutoff, limit)
+            ).fetchall()
+        return [self._row(r) for r in rows]
+
+    def remove(self, filenames: List[str]) -> None:
+        with self._lock:
+            self._db.executemany("DELETE FROM certificates WHERE filename = ?", [(f,) for f in filenames])
+
+    def delete(self, certs: Iterable[StoredCertificate]) -> int:
+        """Unlink the PDFs, drop their rows and any shard directories left empty."""
+        certs = list(certs)
+        for cert in certs:
+            path = self.path(cert)
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            self._prune(path.parent)
+        self.remove([c.filename for c in certs])
+        return len(certs)
+
+    def _prune(self, directory: Path) -> None:
+        while directory != self.output_dir and self.output_dir in directory.parents:
+            try:
+                directory.rmdir()
+            except OSError:  # not empty (or already gone / raced by a writer)
+                return
+            directory = directory.parent
+
+    def delete_older_than(self, cutoff: float) -> int:
+        """Delete the PDFs (and rows) created before `cutoff`; returns how many were removed."""
+        deleted = 0
+        while True:
+            batch = self.older_than(cutoff)
+            if not batch:
+                return deleted
+            deleted += self.delete(batch)
+
+    def flat(self, limit: int = 1000) -> List[StoredCertificate]:
+        """Certificates still at the top of `output_dir` (written before the sharded layout)."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT * FROM certificates WHERE instr(relpath, '/') = 0 LIMIT ?", (limit,)
+            ).fetchall()
+        return [self._row(r) for r in rows]
+
+    def move_to_shard(self, cert: StoredCertificate) -> StoredCertificate:
+        """Move one flat certificate into its shard (by its original creation time)."""
+        src = self.path(cert)
+        dst = self.path_for(cert.donation_id, cert.filename, cert.created_at)
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.replace(src, dst)
+        except FileNotFoundError:
+            if not dst.exists():  # file is gone: drop the dangling row
+                self.remove([cert.filename])
+                return cert
+        relpath = dst.relative_to(self.output_dir).as_posix()
+        with self._lock:
+            self._db.execute("UPDATE certificates SET relpath = ? WHERE filename = ?", (relpath, cert.filename))
+        return StoredCertificate(**{**cert.__dict__, "relpath": relpath})
+
+    def migrate_flat(self) -> int:
+        """Move every flat certificate into the sharded layout; returns how many were moved."""
+        moved = 0
+        while True:
+            batch = self.flat()
+            if not batch:
+                return moved
+            for cert in batch:
+                self.move_to_shard(cert)
+            moved += len(batch)
+
+    def backfill(self) -> int:
+        """Index PDFs under `output_dir` that have no row yet (e.g. written before the index)."""
+        with self._lock:
+            known = {r[0] for r in self._db.execute("SELECT filename FROM certificates")}
+        added = 0
+        for path in self.output_dir.rglob("*.pdf"):
+            if path.name in known or path.name.startswith("."):
+                continue
+            m = _FILENAME_RE.match(path.name)
+            # the name records when it was rendered; the mtime changes with copies and restores
+            created_at = _filename_time(m.group(2)) if m else None
+            self.add(m.group(1) if m else path.stem, path, created_at=created_at or path.stat().st_mtime)
+            added += 1
+        return added
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+# ------------------------------------------------------------------------------
+# Recently generated PDFs, in memory
+# ------------------------------------------------------------------------------
+class RecentCertificates:
+    """Byte-bounded LRU of PDF contents by filename (filenames are unique, contents immutable)."""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def put(self, filename: str, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(filename, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[filename] = data
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes:
+                _, dropped = self._entries.popitem(last=False)
+                self._bytes -= len(dropped)
+                self.evictions += 1
+
+    def get(self, filename: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._entries.get(filename)
+            if data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(filename)
+            self.hits += 1
+            return data
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+
+# ------------------------------------------------------------------------------
+# Background retention
+# ------------------------------------------------------------------------------
+class RetentionSweeper:
+    """
+    Daemon thread that first moves flat (pre-sharding) files into shards, then every
+    `interval_seconds` deletes certificates older than `max_age_seconds`. File operations are
+    paced to `max_ops_per_second` so a large backlog never competes with renders for the disk.
+    `max_age_seconds=None` only runs the migration.
+    """
+
+    def __init__(
+        self,
+        store: CertificateStore,
+        max_age_seconds: Optional[float] = None,
+        interval_seconds: float = 600.0,
+        max_ops_per_second: float = 20.0,
+        batch_size: int = 100,
+    ):
+        self.store = store
+        self.max_age_seconds = max_age_seconds
+        self.interval_seconds = interval_seconds
+        self.max_ops_per_second = max_ops_per_second
+        self.batch_size = batch_size
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.migrated = 0
+        self.deleted = 0
+        self.sweeps = 0
+        self.last_sweep: Optional[float] = None
+
+    def start(self) -> "RetentionSweeper":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="retention-sweeper", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _pace(self, ops: int) -> bool:
+        """Sleep off `ops` file operations; False once the sweeper is stopping."""
+        if self.max_ops_per_second <= 0:
+            return not self._stop.is_set()
+        return not self._stop.wait(ops / self.max_ops_per_second)
+
+    def migrate(self) -> int:
+        moved = 0
+        while True:
+            batch = self.store.flat(self.batch_size)
+            if not batch:
+                return moved
+            for cert in batch:
+                self.store.move_to_shard(cert)
+                moved += 1
+                self.migrated += 1
+                if not self._pace(1):
+                    return moved
+
+    def sweep(self) -> int:
+        """One retention pass; returns how many certificates were deleted."""
+        if self.max_age_seconds is None:
+            return 0
+        cutoff = time.time() - self.max_age_seconds
+        deleted = 0
+        running = True
+        while running:
+            batch = self.store.older_than(cutoff, self.batch_size)
+            if not batch:
+                break
+            for cert in batch:
+                deleted += self.store.delete([cert])
+                self.deleted += 1
+                if not self._pace(1):
+                    running = False
+                    break
+        self.sweeps += 1
+        self.last_sweep = time.time()
+        return deleted
+
+    def _run(self) -> None:
+        try:
+            moved = self.migrate()
+            if moved:
+                log.info("moved %d certificates into the sharded layout", moved)
+        except Exception:
+            log.exception("migrating flat certificates failed")
+        while self.max_age_seconds is not None and not self._stop.is_set():
+            try:
+                deleted = self.sweep()
+                if deleted:
+                    log.info("retention sweep deleted %d certificates", deleted)
+            except Exception:
+                log.exception("retention sweep failed")
+            self._stop.wait(self.interval_seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "max_age_hours": None if self.max_age_seconds is None else self.max_age_seconds / 3600,
+            "interval_seconds": self.interval_seconds,
+            "max_ops_per_second": self.max_ops_per_second,
+            "migrated": self.migrated,
+            "deleted": self.deleted,
+            "sweeps": self.sweeps,
+            "last_sweep": self.last_sweep,
+        }
+
+
+# ------------------------------------------------------------------------------
+# CLI: one-off migration of an existing flat output directory
+# ------------------------------------------------------------------------------
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Index and shard an existing certificate output directory")
+    parser.add_argument("--output-dir", type=Path, required=True)
+    parser.add_argument("--index", type=Path, required=True, help="SQLite index (created if missing)")
+    args = parser.parse_args()
+
+    store = CertificateStore(args.output_dir, args.index)
+    print(f"Indexed {store.backfill()} certificates, moved {store.migrate_flat()} into shards")
+    store.close()
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Latency-aware PDF engine router with hedged fallback.
+
+- `RoutingEngine` is a `PdfEngineBase` over several engines in order of preference
+  (e.g. Playwright, then WeasyPrint). It keeps, per engine, an EWMA of render latency and the
+  outcome of its last `window` renders.
+- A render goes to the first engine whose circuit is closed and whose EWMA is under
+  `hedge_delay`; when every engine is that slow, to the one with the lowest EWMA.
+- An engine passed over as slow gets one render again every `recheck_seconds` (hedged as usual),
+  and a latency sample after that long replaces its EWMA instead of blending into it, so a single
+  slow spell doesn't keep the preferred engine out for good.
+- Hedging: a render still running after `hedge_delay` starts on the next engine too, and
+  whichever PDF comes back first is returned. A render that fails starts the next engine at once.
+  The losing render is left to finish in the background; it still counts towards its engine's stats.
+- Circuit breaker: once `max_failure_rate` of an engine's recent renders failed (and at least
+  `min_samples` were seen), the engine gets no renders for `open_seconds`. It then gets a single
+  trial render (half-open): success closes the circuit, failure opens it again.
+- Engines that run no JavaScript (`runs_scripts = False`) are skipped for script-filled templates
+  (v18's `window.applyCertData`), which would print their placeholders there.
+- Routed output is not put in the render cache (`cacheable = False`): a fallback engine's PDF
+  would otherwise be served for that (template, data) after the preferred engine is back.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from lib.certificate_generator import PdfEngineBase
+
+log = logging.getLogger(__name__)
+
+# same marker CertificateGenerator uses to recognize data-driven templates
+_SCRIPT_FILLED = "applyCertData"
+
+
+class _Route:
+    def __init__(self, name: str, engine: PdfEngineBase, window: int):
+        self.name = name
+        self.engine = engine
+        self.ewma: Optional[float] = None  # seconds
+        self.observed_at = float("-inf")  # last latency sample (monotonic)
+        self.recheck_at = float("-inf")  # last render sent to re-measure a slow engine
+        self.outcomes: deque = deque(maxlen=window)  # True = failed
+        self.opened_at: Optional[float] = None  # circuit open since (monotonic)
+        self.probing = False  # the half-open trial render is running
+        self.renders = 0
+        self.failures = 0
+        self.hedges = 0  # renders this engine started as the hedge
+        self.wins = 0  # hedged renders this engine answered first
+        self.trips = 0
+        self.rechecks = 0
+
+
+class _Attempt:
+    def __init__(self, route: _Route, hedge: bool, probe: bool):
+        self.route = route
+        self.hedge = hedge
+        self.probe = probe  # the half-open circuit's trial render
+        self.started: Optional[float] = None  # when an executor thread picked it up (monotonic)
+        self.latency_recorded = False
+
+
+class RoutingEngine(PdfEngineBase):
+    """
+    `engines` is a sequence of `(name, engine)` pairs, most preferred first. See the module
+    docstring for how renders are routed, hedged and cut off.
+    """
+
+    def __init__(
+        self,
+        engines: Sequence[Tuple[str, PdfEngineBase]],
+        hedge_delay: float = 2.0,
+        ewma_alpha: float = 0.2,
+        window: int = 20,
+        min_samples: int = 5,
+        max_failure_rate: float = 0.5,
+        open_seconds: float = 30.0,
+        recheck_seconds: float = 30.0,
+        max_workers: int = 32,
+    ):
+        if not engines:
+            raise ValueError("RoutingEngine needs at least one engine.")
+        self.hedge_delay = hedge_delay
+        self.ewma_alpha = ewma_alpha
+        self.min_samples = min_samples
+        self.max_failure_rate = max_failure_rate
+        self.open_seconds = open_seconds
+        self.recheck_seconds = recheck_seconds
+        self.runs_scripts = any(e.runs_scripts for _, e in engines)
+        # the bytes depend on which engine answered, not only on (template, data)
+        self.cacheable = False
+        self._routes = [_Route(name, engine, window) for name, engine in engines]
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="engine-router")
+
+    @property
+    def base_url(self) -> Optional[str]:
+        return next((r.engine.base_url for r in self._routes if hasattr(r.engine, "base_url")), "")
+
+    @base_url.setter
+    def base_url(self, value: Optional[str]) -> None:
+        for r in self._routes:
+            if getattr(r.engine, "base_url", "") is None:
+                r.engine.base_url = value
+
+    # ---- lifecycle -------------------------------------------------------------
+    def start(self) -> None:
+        for r in self._routes:
+            try:
+                r.engine.start()
+            except Exception as e:
+                # a missing browser shouldn't stop the service while another engine works
+                log.warning("engine %s failed to start, opening its circuit: %s", r.name, e)
+                with self._lock:
+                    self._open(r, time.monotonic())
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+        for r in self._routes:
+            r.engine.close()
+
+    # ---- routing ---------------------------------------------------------------
+    def _open(self, route: _Route, now: float) -> None:
+        route.opened_at = now
+        route.probing = False
+        route.trips += 1
+
+    def _state(self, route: _Route, now: float) -> str:
+        if route.opened_at is None:
+            return "closed"
+        if now - route.opened_at >= self.open_seconds:
+            return "half-open"
+        return "open"
+
+    def _plan(self, html: str) -> List[_Route]:
+        """Engines to try for this render, in order."""
+        needs_scripts = _SCRIPT_FILLED in html
+        now = time.monotonic()
+        with self._lock:
+            usable = [
+                r for r in self._routes
+                if (r.engine.runs_scripts or not needs_scripts) and self._state(r, now) != "open"
+            ]
+            fast = [r for r in usable if r.ewma is None or r.ewma < self.hedge_delay]
+            slow = sorted((r for r in usable if r not in fast), key=lambda r: r.ewma)
+            # most preferred slow engine not measured for recheck_seconds: this render re-measures it
+            due = [r for r in usable if r in slow and now - max(r.observed_at, r.recheck_at) >= self.recheck_seconds]
+            if due:
+                due[0].recheck_at = now
+                due[0].rechecks += 1
+                slow.remove(due[0])
+                return [due[0]] + fast + slow
+            return fast + slow
+
+    def _claim(self, route: _Route) -> Optional[bool]:
+        """
+        None if `route` can't take a render now, else whether this render is the trial of its
+        half-open circuit (only one runs at a time).
+        """
+        with self._lock:
+            state = self._state(route, time.monotonic())
+            if state == "open" or (state == "half-open" and route.probing):
+                return None
+            if state == "half-open":
+                route.probing = True
+                return True
+            return False
+
+    def _record(self, attempt: _Attempt, failed: bool) -> None:
+        route = attempt.route
+        now = time.monotonic()
+        with self._lock:
+            route.renders += 1
+            if not attempt.latency_recorded and not failed:
+                self._observe(route, now - attempt.started)
+            if failed:
+                route.failures += 1
+            if attempt.probe:
+                route.probing = False
+                if failed:
+                    route.opened_at = now  # still the same outage
+                else:
+                    route.opened_at = None
+                    route.outcomes.clear()
+                    log.info("engine %s recovered, circuit closed", route.name)
+                return
+            route.outcomes.append(failed)
+            if route.opened_at is None and len(route.outcomes) >= self.min_samples:
+                rate = sum(route.outcomes) / len(route.outcomes)
+                if rate >= self.max_failure_rate:
+                    self._open(route, now)
+                    log.warning("engine %s failing (%.0f%% of last %d renders), circuit opened",
+                                route.name, rate * 100, len(route.outcomes))
+
+    def _observe(self, route: _Route, seconds: float) -> None:
+        now = time.monotonic()
+        if route.ewma is None or now - route.observed_at >= self.recheck_seconds:
+            route.ewma = seconds  # no average yet, or one too old to say anything
+        else:
+            route.ewma += self.ewma_alpha * (seconds - route.ewma)
+        route.observed_at = now
+
+    def _run(self, attempt: _Attempt, html: str) -> bytes:
+        attempt.started = time.monotonic()  # time spent queued for a thread is not the engine's latency
+        try:
+            pdf = attempt.route.engine.render_pdf_bytes(html)
+        except BaseException:
+            self._record(attempt, failed=True)
+            raise
+        self._record(attempt, failed=False)
+        return pdf
+
+    def render_pdf_bytes(self, html: str) -> bytes:
+        plan = self._plan(html)
+        pending: Dict[Future, _Attempt] = {}
+        errors: List[str] = []
+
+        def _launch(hedge: bool) -> bool:
+            while plan:
+                route = plan.pop(0)
+                probe = self._claim(route)
+                if probe is not None:
+                    break
+            else:
+                return False
+            attempt = _Attempt(route, hedge, probe)
+            if hedge:
+                with self._lock:
+                    route.hedges += 1
+            pending[self._executor.submit(self._run, attempt, html)] = attempt
+            return True
+
+        if not _launch(hedge=False):
+            raise RuntimeError("No PDF engine available for this template (all circuits open).")
+        hedge_at = time.monotonic() + self.hedge_delay
+        while pending:
+            timeout = max(0.0, hedge_at - time.monotonic()) if plan else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                _launch(hedge=True)
+                hedge_at = time.monotonic() + self.hedge_delay
+                continue
+            for fut in done:
+                attempt = pending.pop(fut)
+                try:
+                    pdf = fut.result()
+                except Exception as e:
+                    errors.append(f"{attempt.route.name}: {type(e).__name__}: {e}")
+                    if not pending and _launch(hedge=False):  # failed outright: fall back without waiting
+                        hedge_at = time.monotonic() + self.hedge_delay
+                    continue
+                self._won(attempt, pending.values())
+                return pdf
+        raise RuntimeError("All PDF engines failed: " + "; ".join(errors))
+
+    def _won(self, winner: _Attempt, losers) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if winner.hedge:
+                winner.route.wins += 1
+            for attempt in losers:
+                if attempt.started is None:
+                    continue  # still queued: says nothing about the engine
+                # still running: what it took so far is a lower bound on its latency
+                self._observe(attempt.route, now - attempt.started)
+                attempt.latency_recorded = True
+
+    # ---- reporting -------------------------------------------------------------
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            engines = [
+                {
+                    "name": r.name,
+                    "state": self._state(r, now),
+                    "ewma_ms": round(r.ewma * 1000, 1) if r.ewma is not None else None,
+                    "recent_failure_rate": round(sum(r.outcomes) / len(r.outcomes), 3) if r.outcomes else 0.0,
+                    "renders": r.renders,
+                    "failures": r.failures,
+                    "hedges": r.hedges,
+                    "hedge_wins": r.wins,
+                    "circuit_trips": r.trips,
+                    "rechecks": r.rechecks,
+                }
+                for r in self._routes
+            ]
+        return {"hedge_delay_seconds": self.hedge_delay, "engines": engines}
@@ -0,0 +1,513 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Multi-process render farm: a PDF engine that spreads renders over worker processes.
+
+- Each worker is a separate Python process (`python -m lib.render_farm --worker ...`) with its
+  own Chromium `BrowserPool`, so rendering is not bound to the web process or its GIL.
+- Renders go to the worker with the fewest renders in flight.
+- A supervisor thread restarts workers that exit, kills workers whose render runs past the
+  deadline (and their browsers), and recycles workers whose process tree (worker + Chromium)
+  outgrows `max_rss_mb`: the replacement starts first, the old worker finishes its renders.
+- A worker lost again before its engine came up is restarted after an exponential backoff
+  (`restart_backoff`, doubling per failure). After `max_start_failures` such losses in a row its
+  slot stays empty and the farm reports itself unhealthy (`healthy`), instead of crash-looping
+  when e.g. Chromium can't launch.
+- `close()` stops taking renders, lets in-flight ones finish, then stops the workers.
+"""
+
+from __future__ import annotations
+
+import atexit
+import importlib
+import itertools
+import json
+import logging
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from multiprocessing.connection import Connection
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from lib.certificate_generator import BrowserPool, PdfEngineBase, observe_stages, pick_engine, record_stage
+
+log = logging.getLogger(__name__)
+
+_ROOT = Path(__file__).resolve().parent.parent  # `lib` is importable from here
+
+
+class WorkerLost(RuntimeError):
+    """The worker running a render exited or was killed before answering."""
+
+    def __init__(self, message: str, overdue: bool = False):
+        super().__init__(message)
+        self.overdue = overdue  # this render is the one that ran past the deadline
+
+
+def _tree_rss(pid: int) -> Optional[int]:
+    """Resident bytes of `pid` and all its descendants (Linux /proc), None if unavailable."""
+    proc = Path("/proc")
+    if not proc.is_dir():
+        return None
+    page = os.sysconf("SC_PAGE_SIZE")
+    children: Dict[int, List[int]] = {}
+    rss: Dict[int, int] = {}
+    for entry in proc.iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / "stat").read_text()
+        except OSError:
+            continue  # exited while we were looking
+        fields = stat[stat.rindex(")") + 2:].split()  # after "pid (comm) "
+        child = int(entry.name)
+        children.setdefault(int(fields[1]), []).append(child)
+        rss[child] = int(fields[21]) * page
+    if pid not in rss:
+        return None
+    total, todo = 0, [pid]
+    while todo:
+        p = todo.pop()
+        total += rss.get(p, 0)
+        todo.extend(children.get(p, ()))
+    return total
+
+
+# ------------------------------------------------------------------------------
+# Supervisor side
+# ------------------------------------------------------------------------------
+@dataclass
+class _Task:
+    future: Future
+    deadline: float
+
+
+class _Worker:
+    def __init__(self, index: int, proc: subprocess.Popen, conn: Connection):
+        self.index = index
+        self.proc = proc
+        self.conn = conn
+        self.send_lock = threading.Lock()
+        self.pending: Dict[int, _Task] = {}
+        self.templates: set = set()  # template keys this worker already holds
+        self.renders = 0
+        self.rss: Optional[int] = None
+        self.started = time.monotonic()
+        self.ready = False  # its engine started
+        self.error: Optional[str] = None  # why its engine failed to start
+        self.draining = False  # replaced: takes no new renders, exits once idle
+        self.retired = False  # asked to stop; its exit is expected
+        self.lost = False
+
+
+class RenderFarm(PdfEngineBase):
+    """
+    `PdfEngineBase` backed by `workers` render processes, each running `engine`
+    ("playwright", "weasyprint", or "module:factory" returning an engine) with a browser
+    pool of `pool_size`.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        pool_size: int = 2,
+        max_renders_per_browser: int = 200,
+        block_remote: bool = False,
+        engine: str = "playwright",
+        max_rss_mb: Optional[int] = 1024,
+        render_timeout: float = 60.0,
+        check_interval: float = 2.0,
+        shutdown_timeout: float = 30.0,
+        base_url: Optional[str] = None,
+        restart_backoff: float = 1.0,
+        max_restart_backoff: float = 60.0,
+        max_start_failures: int = 5,
+    ):
+        self.size = workers or os.cpu_count() or 1
+        self.pool_size = pool_size
+        self.max_rss = max_rss_mb * 1024 * 1024 if max_rss_mb else None
+        self.render_timeout = render_timeout
+        self.check_interval = check_interval
+        self.shutdown_timeout = shutdown_timeout
+        self.restart_backoff = restart_backoff
+        self.max_restart_backoff = max_restart_backoff
+        self.max_start_failures = max_start_failures
+        # a loaded template is re-filled inside the worker's browsers, as with PlaywrightEngine
+        self.supports_injection = engine == "playwright"
+        self.runs_scripts = engine.startswith("playwright")
+        self._config = {
+            "engine": engine,
+            "pool_size": pool_size,
+            "max_renders_per_browser": max_renders_per_browser,
+            "block_remote": block_remote,
+            "base_url": base_url,
+        }
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._workers: List[_Worker] = []
+        self._ids = itertools.count()
+        self._started = False
+        self._spawned = threading.Event()  # the first workers are up
+        self._failures: Dict[int, int] = {}  # worker index -> losses since its engine last started
+        self._given_up: set = set()  # worker indexes no longer restarted
+        self._closing = False
+        self._stop = threading.Event()
+        self.restarts = 0
+        self.timeouts = 0
+        self.recycled = 0
+
+    @property
+    def base_url(self) -> Optional[str]:
+        """Where the workers' WeasyPrint engines resolve relative asset URLs (read when a worker starts)."""
+        return self._config["base_url"]
+
+    @base_url.setter
+    def base_url(self, value: Optional[str]) -> None:
+        self._config["base_url"] = value
+
+    @property
+    def healthy(self) -> bool:
+        """False once a worker slot was given up on after `max_start_failures` failed starts."""
+        with self._lock:
+            return not self._given_up
+
+    # ---- lifecycle -------------------------------------------------------------
+    def start(self) -> None:
+        with self._lock:
+            first = not self._started
+            if first and self._closing:
+                raise RuntimeError("RenderFarm is closed.")
+            self._started = True
+        if not first:
+            self._spawned.wait()
+            return
+        # processes are started outside the lock, which every render takes
+        try:
+            workers = [self._spawn(i) for i in range(self.size)]
+            with self._lock:
+                self._workers.extend(workers)
+        finally:
+            self._spawned.set()
+        threading.Thread(target=self._supervise, name="render-farm-supervisor", daemon=True).start()
+        atexit.register(self.close)
+
+    def _spawn(self, index: int) -> _Worker:
+        parent_sock, child_sock = socket.socketpair()
+        fd = child_sock.fileno()
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "lib.render_farm", "--worker", str(fd), json.dumps(self._config)],
+            cwd=str(_ROOT),
+            pass_fds=(fd,),
+            start_new_session=True,  # own process group: a kill takes its Chromium along
+        )
+        child_sock.close()
+        worker = _Worker(index, proc, Connection(parent_sock.detach()))
+        threading.Thread(target=self._read, args=(worker,), name=f"render-farm-{index}", daemon=True).start()
+        log.info("render worker %d started (pid %d)", index, proc.pid)
+        return worker
+
+    def _respawn(self, index: int) -> None:
+        """Start a replacement for worker `index` (called without the farm lock held)."""
+        if self._closing:
+            return
+        worker = self._spawn(index)
+        with self._lock:
+            if not self._closing:
+                self._workers.append(worker)
+                return
+        self._retire(worker)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closing:
+                return
+            self._closing = True
+            # in-flight renders finish; new ones are refused
+            deadline = time.monotonic() + self.shutdown_timeout
+            while any(w.pending for w in self._workers) and time.monotonic() < deadline:
+                self._idle.wait(deadline - time.monotonic())
+            workers = list(self._workers)
+        self._stop.set()
+        for w in workers:
+            self._retire(w)
+        for w in workers:
+            try:
+                w.proc.wait(self.shutdown_timeout)
+            except subprocess.TimeoutExpired:
+                self._kill(w)
+
+    # ---- rendering -------------------------------------------------------------
+    def render_pdf_bytes(self, html: str) -> bytes:
+        return self._call(lambda w: ("render", html))
+
+    def render_injected_bytes(self, template_key: str, template_html: str, payload: dict) -> bytes:
+        # the template itself crosses the process boundary once per worker
+        return self._call(
+            lambda w: ("inject", template_key, None if template_key in w.templates else template_html, payload),
+            template_key,
+        )
+
+    def _call(self, message: Callable[[_Worker], tuple], template_key: Optional[str] = None) -> bytes:
+        self.start()
+        for attempt in range(2):
+            worker, future = self._dispatch(message, template_key)
+            try:
+                return future.result()
+            except WorkerLost as e:
+                # another render took this worker down: retry once on a healthy one
+                if e.overdue or attempt:
+                    raise
+        raise AssertionError("unreachable")
+
+    def _dispatch(self, message: Callable[[_Worker], tuple], template_key: Optional[str]) -> tuple:
+        with self._lock:
+            if self._closing:
+                raise RuntimeError("RenderFarm is shutting down.")
+            live = [w for w in self._workers if not w.draining and not w.lost]
+            if not live:
+                raise RuntimeError("No render worker available.")
+            worker = min(live, key=lambda w: (len(w.pending), w.renders))
+            task_id = next(self._ids)
+            future: Future = Future()
+            worker.pending[task_id] = _Task(future, time.monotonic() + self.render_timeout)
+            op, *args = message(worker)
+            if template_key is not None:
+                worker.templates.add(template_key)
+            # taken before releasing the farm lock: messages reach the worker in the order they
+            # were built, so a template is always sent before the renders that omit it
+            worker.send_lock.acquire()
+        try:
+            worker.conn.send((op, task_id, *args))
+        except OSError:
+            worker.send_lock.release()
+            self._lost(worker, "worker pipe closed")
+        else:
+            worker.send_lock.release()
+        return worker, future
+
+    def _read(self, worker: _Worker) -> None:
+        while True:
+            try:
+                msg = worker.conn.recv()
+            except (EOFError, OSError):
+                try:
+                    code = worker.proc.wait(5)
+                except subprocess.TimeoutExpired:
+                    code = None
+                self._lost(worker, f"worker exited (code {code})")
+                return
+            if msg[0] == "ready":
+                with self._lock:
+                    worker.ready = True
+                    self._failures.pop(worker.index, None)
+                continue
+            if msg[0] == "failed":
+                worker.error = msg[1]  # its engine didn't start; the worker exits next
+                continue
+            if msg[0] == "stage":
+                record_stage(msg[1], msg[2])  # timed in the worker, reported here
+                continue
+            with self._lock:
+                task = worker.pending.pop(msg[1], None)
+                if task is None:
+                    continue  # timed out and already failed
+                worker.renders += 1
+                done_draining = worker.draining and not worker.pending
+                self._idle.notify_all()
+            if msg[0] == "done":
+                task.future.set_result(msg[2])
+            else:
+                task.future.set_exception(RuntimeError(f"Render failed in worker {worker.index}: {msg[2]}"))
+            if done_draining:
+                self._retire(worker)
+
+    # ---- supervision -----------------------------------------------------------
+    def _supervise(self) -> None:
+        while not self._stop.wait(self.check_interval):
+            now = time.monotonic()
+            for w in list(self._workers):
+                overdue = [tid for tid, t in list(w.pending.items()) if t.deadline < now]
+                if overdue:
+                    self.timeouts += len(overdue)
+                    log.warning("render worker %d hung past %.0fs; restarting it", w.index, self.render_timeout)
+                    self._kill(w)
+                    self._lost(w, f"render exceeded {self.render_timeout:.0f}s", overdue)
+                    continue
+                w.rss = _tree_rss(w.proc.pid)
+                if self.max_rss and w.rss and w.rss > self.max_rss and not w.draining:
+                    self._recycle(w)
+
+    def _recycle(self, worker: _Worker) -> None:
+        """Replace a bloated worker: the new one starts now, the old one drains."""
+        log.info("render worker %d uses %d MB; recycling it", worker.index, worker.rss // (1024 * 1024))
+        replacement = self._spawn(worker.index)
+        with self._lock:
+            closing = self._closing
+            if not closing:
+                worker.draining = True
+                self.recycled += 1
+                self._workers.append(replacement)
+            idle = not worker.pending
+        if closing:
+            self._retire(replacement)
+        elif idle:
+            self._retire(worker)
+
+    def _retire(self, worker: _Worker) -> None:
+        worker.retired = True
+        try:
+            with worker.send_lock:
+                worker.conn.send(("stop",))
+        except OSError:
+            pass
+
+    @staticmethod
+    def _kill(worker: _Worker) -> None:
+        try:
+            os.killpg(worker.proc.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def _lost(self, worker: _Worker, reason: str, overdue: tuple = ()) -> None:
+        with self._lock:
+            if worker.lost:
+                return
+            worker.lost = True
+            if worker in self._workers:
+                self._workers.remove(worker)
+            pending, worker.pending = worker.pending, {}
+            if worker.error:
+                reason = f"engine failed to start: {worker.error}"
+            replace = not (self._closing or worker.retired)
+            gave_up, delay = False, 0.0
+            if replace:
+                failures = self._failures[worker.index] = self._failures.get(worker.index, 0) + 1
+                if failures >= self.max_start_failures:
+                    replace, gave_up = False, True
+                    self._given_up.add(worker.index)
+                else:
+                    self.restarts += 1
+                    # the first loss after a good start is replaced at once; repeats back off
+                    if failures > 1:
+                        delay = min(self.restart_backoff * 2 ** (failures - 2), self.max_restart_backoff)
+            self._idle.notify_all()
+        if gave_up:
+            log.error("render worker %d lost %d times in a row (%s); not restarting it",
+                      worker.index, self.max_start_failures, reason)
+        elif pending or replace:
+            log.warning("render worker %d lost: %s%s", worker.index, reason,
+                        f"; restarting in {delay:.0f}s" if delay else "")
+        if replace:
+            if delay:
+                timer = threading.Timer(delay, self._respawn, (worker.index,))
+                timer.daemon = True
+                timer.start()
+            else:
+                self._respawn(worker.index)
+        self._kill(worker)  # the worker's browsers must not outlive it
+        worker.proc.wait()
+        worker.conn.close()
+        for tid, task in pending.items():
+            task.future.set_exception(WorkerLost(f"Render worker {worker.index}: {reason}", tid in overdue))
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            workers = [
+                {
+                    "index": w.index,
+                    "pid": w.proc.pid,
+                    "in_flight": len(w.pending),
+                    "renders": w.renders,
+                    "rss_mb": round(w.rss / (1024 * 1024), 1) if w.rss else None,
+                    "uptime_seconds": round(now - w.started),
+                    "draining": w.draining,
+                }
+                for w in self._workers
+            ]
+            failed = sorted(self._given_up)
+        return {
+            "healthy": not failed,
+            "failed_workers": failed,
+            "workers": workers,
+            "restarts": self.restarts,
+            "timeouts": self.timeouts,
+            "recycled_for_memory": self.recycled,
+        }
+
+
+# ------------------------------------------------------------------------------
+# Worker side
+# ------------------------------------------------------------------------------
+def _make_engine(config: Dict[str, Any]) -> PdfEngineBase:
+    name = config["engine"]
+    if ":" in name:
+        module, _, factory = name.partition(":")
+        return getattr(importlib.import_module(module), factory)(config)
+    pool = BrowserPool(
+        size=config["pool_size"],
+        max_renders_per_browser=config["max_renders_per_browser"],
+        block_remote=config["block_remote"],
+    )
+    return pick_engine(name, pool=pool, block_remote=config["block_remote"], base_url=config.get("base_url"))
+
+
+def _worker_main(fd: int, config: Dict[str, Any]) -> None:
+    conn = Connection(fd)
+    try:
+        engine = _make_engine(config)
+        engine.start()
+    except Exception as e:
+        # e.g. Chromium can't launch: say why, and let the supervisor decide about a restart
+        conn.send(("failed", f"{type(e).__name__}: {e}"))
+        sys.exit(1)
+    templates: Dict[str, str] = {}
+    send_lock = threading.Lock()
+
+    def _reply(msg: tuple) -> None:
+        with send_lock:
+            conn.send(msg)
+
+    observe_stages(lambda stage, seconds: _reply(("stage", stage, seconds)))
+
+    def _run(op: str, task_id: int, args: tuple) -> None:
+        try:
+            if op == "render":
+                pdf = engine.render_pdf_bytes(args[0])
+            else:
+                key, _, payload = args
+                pdf = engine.render_injected_bytes(key, templates[key], payload)
+            _reply(("done", task_id, pdf))
+        except Exception as e:
+            _reply(("error", task_id, f"{type(e).__name__}: {e}"))
+
+    executor = ThreadPoolExecutor(max_workers=config["pool_size"])
+    _reply(("ready", os.getpid()))
+    while True:
+        try:
+            msg = conn.recv()
+        except EOFError:
+            break  # supervisor is gone
+        if msg[0] == "stop":
+            break
+        if msg[0] == "inject" and msg[3] is not None:
+            templates[msg[2]] = msg[3]
+        executor.submit(_run, msg[0], msg[1], msg[2:])
+    executor.shutdown(wait=True)
+    engine.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--worker":
+        logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper())
+        _worker_main(int(sys.argv[2]), json.loads(sys.argv[3]))
+    else:
+        sys.exit("render workers are started by RenderFarm (PDF_ENGINE=farm), not by hand")
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Request-level coordination for certificate renders.
+
+- `SingleFlight` coalesces concurrent calls for the same key onto one execution.
+- `JobQueue` runs renders on a bounded local worker pool for clients that poll for the result.
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Run `fn` once per key at a time: callers arriving while a call for the same key
+    is in flight wait for that call and share its result (or exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+
+    def do(self, key: str, fn: Callable[[], T]) -> Tuple[T, bool]:
+        """Returns `(result, shared)`; `shared` is True when another caller did the work."""
+        with self._lock:
+            fut = self._calls.get(key)
+            leader = fut is None
+            if leader:
+                fut = Future()
+                self._calls[key] = fut
+
+        if not leader:
+            return fut.result(), True
+
+        try:
+            fut.set_result(fn())
+        except BaseException as e:
+            fut.set_exception(e)
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+        return fut.result(), False
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+# ------------------------------------------------------------------------------
+# Background jobs
+# ------------------------------------------------------------------------------
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+class QueueFull(RuntimeError):
+    pass
+
+
+@dataclass
+class Job:
+    id: str
+    donation_id: str
+    payload: Any = field(repr=False)
+    status: str = JOB_QUEUED
+    filename: Optional[str] = None
+    reused: bool = False
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "donation_id": self.donation_id,
+            "status": self.status,
+            "filename": self.filename,
+            "reused": self.reused,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobQueue:
+    """
+    Bounded local worker pool for background renders.
+
+    `worker(payload)` returns `(filename, reused)`. At most `max_pending` jobs may be
+    queued or running at once; beyond that `submit` raises `QueueFull` so a burst is
+    pushed back to the client instead of piling up in memory. The newest `max_finished`
+    finished jobs stay available for polling.
+    """
+
+    def __init__(
+        self,
+        worker: Callable[[Any], Tuple[str, bool]],
+        workers: int = 2,
+        max_pending: int = 100,
+        max_finished: int = 1000,
+    ):
+        self.worker = worker
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_finished = max_finished
+        self._queue: "queue.Queue[Job]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Job] = {}
+        self._finished: "OrderedDict[str, None]" = OrderedDict()
+        self._pending = 0
+        self._running = 0
+        self._threads: List[threading.Thread] = []
+
+    def _start(self) -> None:
+        # caller holds self._lock
+        if self._threads:
+            return
+        for i in range(self.workers):
+            t = threading.Thread(target=self._loop, name=f"render-job-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, donation_id: str, payload: Any) -> Job:
+        job = Job(id=uuid.uuid4().hex, donation_id=donation_id, payload=payload)
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise QueueFull(f"Render queue is full ({self.max_pending} jobs pending).")
+            self._start()
+            self._pending += 1
+            self._jobs[job.id] = job
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def depth(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "queued": self._pending - self._running,
+                "running": self._running,
+                "max_pending": self.max_pending,
+                "workers": self.workers,
+            }
+
+    def _loop(self) -> None:
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                self._running += 1
+                job.status, job.started_at = JOB_RUNNING, time.time()
+            try:
+                job.filename, job.reused = self.worker(job.payload)
+                status, error = JOB_DONE, None
+            except Exception as e:
+                status, error = JOB_FAILED, str(e)
+            with self._lock:
+                job.status, job.error, job.finished_at = status, error, time.time()
+                job.payload = None
+                self._running -= 1
+                self._pending -= 1
+                self._finished[job.id] = None
+                while len(self._finished) > self.max_finished:
+                    old_id, _ = self._finished.popitem(last=False)
+                    self._jobs.pop(old_id, None)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Template asset bundler: make certificate templates self-contained.
+
+- Remote stylesheets (Google Fonts), the font files they reference and remote images are
+  downloaded once and vendored under `assets_dir` (with a `manifest.json`).
+- A bundled copy of the template is written with everything inlined as data: URIs, so a
+  render needs no network and engines can wait on `document.fonts.ready` instead of `networkidle`.
+- `--offline` bundles from the vendored assets only (e.g. CI or an air-gapped build).
+- A bundle records the SHA-256 of the source it was built from; `current_bundle` rebuilds it
+  (offline) once the source changed, so an edited template is never shadowed by a stale bundle.
+
+    python lib/template_assets.py templates/donation_certificate_temple_v18.html
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import urllib.request
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Google Fonts serves woff2 (smallest) only to modern browsers.
+_USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/124.0 Safari/537.36"
+)
+# ₹ (U+20B9) lives in Google's latin-ext subset.
+DEFAULT_FONT_SUBSETS = ("latin", "latin-ext")
+
+_LINK_RE = re.compile(r"<link\b[^>]*>", re.IGNORECASE)
+_HREF_RE = re.compile(r"""\bhref\s*=\s*(["'])(https?://[^"']+)\1""", re.IGNORECASE)
+_REL_STYLESHEET_RE = re.compile(r"""\brel\s*=\s*(["']?)stylesheet\1""", re.IGNORECASE)
+_CSS_URL_RE = re.compile(r"""url\(\s*(["']?)(https?://[^"')]+)\1\s*\)""", re.IGNORECASE)
+_IMG_SRC_RE = re.compile(r"""(<img\b[^>]*\bsrc\s*=\s*)(["'])(https?://[^"']+)\2""", re.IGNORECASE)
+_FONT_FACE_RE = re.compile(r"(?:/\*\s*([\w-]+)\s*\*/\s*)?(@font-face\s*\{[^}]*\})", re.IGNORECASE)
+# appended to every bundle; an HTML comment, so Jinja and the browser both leave it alone
+_SOURCE_MARK = "<!-- bundled from sha256:{} -->\n"
+_SOURCE_MARK_RE = re.compile(r"<!-- bundled from sha256:([0-9a-f]{64}) -->\s*\Z")
+
+
+class AssetUnavailable(RuntimeError):
+    pass
+
+
+class AssetFetcher:
+    """Download-once store for remote template assets."""
+
+    def __init__(self, assets_dir: Path, offline: bool = False, timeout: float = 30.0):
+        self.assets_dir = assets_dir
+        self.offline = offline
+        self.timeout = timeout
+        self._manifest_path = assets_dir / "manifest.json"
+        self._manifest: Dict[str, Dict[str, str]] = {}
+        if self._manifest_path.exists():
+            self._manifest = json.loads(self._manifest_path.read_text(encoding="utf-8"))
+
+    def fetch(self, url: str) -> Tuple[bytes, str]:
+        """Returns `(body, content_type)`, from the vendored copy when there is one."""
+        entry = self._manifest.get(url)
+        if entry and (self.assets_dir / entry["file"]).exists():
+            return (self.assets_dir / entry["file"]).read_bytes(), entry["content_type"]
+        if self.offline:
+            raise AssetUnavailable(f"Not vendored (offline): {url}")
+
+        req = urllib.request.Request(url, headers={"User-Agent": _USER_AGENT})
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                body = resp.read()
+                ctype = resp.headers.get_content_type()
+        except OSError as e:
+            raise AssetUnavailable(f"Could not download {url}: {e}") from e
+
+        if ctype in ("application/octet-stream", "binary/octet-stream"):
+            ctype = mimetypes.guess_type(url)[0] or ctype
+        ext = mimetypes.guess_extension(ctype) or ""
+        name = hashlib.sha256(url.encode()).hexdigest()[:16] + ext
+        self.assets_dir.mkdir(parents=True, exist_ok=True)
+        (self.assets_dir / name).write_bytes(body)
+        self._manifest[url] = {"file": name, "content_type": ctype}
+        self._manifest_path.write_text(json.dumps(self._manifest, indent=2, sort_keys=True), encoding="utf-8")
+        return body, ctype
+
+    def data_uri(self, url: str) -> str:
+        body, ctype = self.fetch(url)
+        return f"data:{ctype};base64,{base64.b64encode(body).decode('ascii')}"
+
+
+@dataclass
+class BundleReport:
+    source: Path
+    output: Path
+    inlined: List[str] = field(default_factory=list)
+    dropped_font_faces: int = 0
+
+
+def _keep_subsets(css: str, subsets: Optional[Iterable[str]]) -> Tuple[str, int]:
+    """Drop @font-face blocks for unicode subsets we never print (cyrillic, vietnamese, ...)."""
+    if not subsets:
+        return css, 0
+    keep = set(subsets)
+    dropped = 0
+
+    def _filter(m: re.Match) -> str:
+        nonlocal dropped
+        subset = m.group(1)
+        if subset and subset not in keep:
+            dropped += 1
+            return ""
+        return m.group(0)
+
+    return _FONT_FACE_RE.sub(_filter, css), dropped
+
+
+def bundle_template(
+    src: Path,
+    dst: Path,
+    fetcher: AssetFetcher,
+    font_subsets: Optional[Iterable[str]] = DEFAULT_FONT_SUBSETS,
+) -> BundleReport:
+    """Write `dst`: `src` with remote stylesheets, fonts and images inlined."""
+    report = BundleReport(source=src, output=dst)
+    html = src.read_text(encoding="utf-8")
+
+    def _inline_css_urls(css: str) -> str:
+        def _sub(m: re.Match) -> str:
+            report.inlined.append(m.group(2))
+            return f'url("{fetcher.data_uri(m.group(2))}")'
+        return _CSS_URL_RE.sub(_sub, css)
+
+    def _inline_link(m: re.Match) -> str:
+        tag = m.group(0)
+        href = _HREF_RE.search(tag)
+        if not href or not _REL_STYLESHEET_RE.search(tag):
+            return tag
+        css, _ = fetcher.fetch(href.group(2))
+        report.inlined.append(href.group(2))
+        css, dropped = _keep_subsets(css.decode("utf-8"), font_subsets)
+        report.dropped_font_faces += dropped
+        return f"<style>\n{_inline_css_urls(css)}\n</style>"
+
+    def _inline_img(m: re.Match) -> str:
+        report.inlined.append(m.group(3))
+        return f"{m.group(1)}{m.group(2)}{fetcher.data_uri(m.group(3))}{m.group(2)}"
+
+    html = _LINK_RE.sub(_inline_link, html)
+    html = _inline_css_urls(html)  # url(...) in inline <style> / style="" attributes
+    html = _IMG_SRC_RE.sub(_inline_img, html)
+    html = html.rstrip("\n") + "\n" + _SOURCE_MARK.format(hashlib.sha256(src.read_bytes()).hexdigest())
+
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dst.with_name(f".{dst.name}.{os.getpid()}.tmp")
+    tmp.write_text(html, encoding="utf-8")
+    os.replace(tmp, dst)  # a reader sees the old bundle or the new one, never half of it
+    return report
+
+
+def bundled_from(bundle: Path) -> Optional[str]:
+    """SHA-256 of the source `bundle` was built from, None if it doesn't say (or doesn't exist)."""
+    try:
+        m = _SOURCE_MARK_RE.search(bundle.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+    return m.group(1) if m else None
+
+
+def current_bundle(src: Path, dst: Path, assets_dir: Path) -> Path:
+    """
+    `dst`, rebuilt from the vendored assets in `assets_dir` unless it was built from `src` as it
+    is now. Raises `AssetUnavailable` when an asset isn't vendored (the bundle is left alone).
+    """
+    if bundled_from(dst) != hashlib.sha256(src.read_bytes()).hexdigest():
+        bundle_template(src, dst, AssetFetcher(assets_dir, offline=True))
+    return dst
+
+
+# --- CLI ----------------------------------------------------------------------
+def _cli():
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Inline remote fonts/images into certificate templates.")
+    parser.add_argument("templates", nargs="+", help="Template HTML files to bundle")
+    parser.add_argument("--out-dir", default="bundled", help="Where bundled templates are written")
+    parser.add_argument("--assets-dir", default="templates/assets", help="Vendored asset store")
+    parser.add_argument("--offline", action="store_true", help="Use vendored assets only, never download")
+    parser.add_argument("--subsets", default=",".join(DEFAULT_FONT_SUBSETS),
+                        help="Comma-separated font unicode subsets to keep ('' keeps all)")
+    args = parser.parse_args()
+
+    fetcher = AssetFetcher(Path(args.assets_dir), offline=args.offline)
+    subsets = [s for s in args.subsets.split(",") if s]
+    failed = False
+    for tpl in map(Path, args.templates):
+        try:
+            report = bundle_template(tpl, Path(args.out_dir) / tpl.name, fetcher, subsets)
+        except AssetUnavailable as e:
+            print(f"❌ {tpl}: {e}", file=sys.stderr)
+            failed = True
+            continue
+        print(f"✅ {report.output}: {len(report.inlined)} assets inlined, "
+              f"{report.dropped_font_faces} unused font subsets dropped")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    _cli()
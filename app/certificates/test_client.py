@@ -4,14 +4,28 @@
 """
 Test client for certificate generation service.
 Run this to test the certificate service independently.
+
+    python test_client.py                 # smoke test: health, generate, download, list
+    python test_client.py load --help     # load generator (festival-day surge)
 """
 
-import requests
+import argparse
 import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
 import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, date
 from decimal import Decimal
 
+import requests
+
 # Service configuration (DONATION CERTIFICATES ONLY)
 BASE_URL = "http://localhost:5001"
 
@@ -114,13 +128,211 @@ def test_certificate_list():
         print(f"❌ List error: {e}")
         return False
 
+# ---- Load generator ------------------------------------------------------------
+
+HISTOGRAM_BOUNDS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0)
+
+class LoadStats:
+    """Per-endpoint outcomes and latencies (thread-safe)"""
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.timeouts = defaultdict(int)
+        self.reused = 0
+        self.dropped = 0
+
+    def record(self, endpoint, seconds, ok, timed_out=False):
+        with self.lock:
+            self.latencies[endpoint].append(seconds)
+            if not ok:
+                self.errors[endpoint] += 1
+            if timed_out or seconds > self.budget:
+                self.timeouts[endpoint] += 1
+
+    def report(self, wall):
+        print(f"\n📊 Load test results ({wall:.0f}s, {self.budget:.0f}s budget)")
+        print(f"{'endpoint':12} {'requests':>9} {'req/s':>7} {'errors':>7} {'err %':>6} {'> budget':>9} "
+              f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        for endpoint, values in sorted(self.latencies.items()):
+            ordered = sorted(values)
+            pct = lambda q: ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))] * 1000
+            n = len(ordered)
+            print(f"{endpoint:12} {n:>9} {n / wall:>7.1f} {self.errors[endpoint]:>7} "
+                  f"{100 * self.errors[endpoint] / n:>6.1f} {self.timeouts[endpoint]:>9} "
+                  f"{pct(50):>8.0f} {pct(95):>8.0f} {pct(99):>8.0f} {ordered[-1] * 1000:>8.0f}")
+        for endpoint, values in sorted(self.latencies.items()):
+            print(f"\n   {endpoint} latency histogram")
+            lower = 0.0
+            for upper in HISTOGRAM_BOUNDS + (float("inf"),):
+                count = sum(1 for v in values if lower <= v < upper)
+                bar = "█" * round(40 * count / len(values))
+                label = f"< {upper:g}s" if upper != float("inf") else f">= {lower:g}s"
+                print(f"   {label:>8} {count:>7} {bar}")
+                lower = upper
+        if self.reused:
+            print(f"\n♻️  {self.reused} /generate calls returned an earlier render (duplicate donation_id)")
+        if self.dropped:
+            print(f"⚠️  {self.dropped} arrivals dropped: more than --max-in-flight requests outstanding")
+
+def arrival_times(start_rate, rate, ramp, steady):
+    """Open-loop schedule: linear ramp from start_rate to rate over `ramp` s, then `steady` s at rate"""
+    t = 0.0
+    while t < ramp + steady:
+        current = start_rate + (rate - start_rate) * (t / ramp) if t < ramp else rate
+        t += random.expovariate(max(current, 0.01))  # Poisson arrivals at the current rate
+        if t < ramp + steady:
+            yield t
+
+def random_donation(index):
+    return {
+        "donor_name": random.choice(["Ravi Kumar", "Lakshmi Narayan", "Anita Rao", "Suresh Bhat", "Meera Iyer"]),
+        "amount": str(Decimal(random.choice([101, 251, 501, 1001, 2100, 5001, 10001])).quantize(Decimal("0.01"))),
+        "donation_id": f"LOAD-{datetime.now().strftime('%d%m%y')}-{os.getpid()}-{index:06d}",
+        "donation_date": date.today().isoformat(),
+        "payment_mode": "Razorpay",
+    }
+
+def start_local_server(port):
+    """Start app.py on `port` with a throwaway output directory, index and render cache; returns (server, tmp dir)"""
+    tmp = tempfile.mkdtemp(prefix="certificate-load-")
+    env = dict(os.environ, CERTIFICATE_PORT=str(port), OUTPUT_DIR=os.path.join(tmp, "output"),
+               CERTIFICATE_INDEX=os.path.join(tmp, "certificates.db"), RENDER_CACHE_DIR=os.path.join(tmp, "cache"))
+    server = subprocess.Popen([sys.executable, "app.py"], cwd=os.path.dirname(os.path.abspath(__file__)), env=env)
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        try:
+            requests.get(f"{BASE_URL}/health", timeout=1)
+            print(f"✅ Local server started (pid {server.pid}, output in {tmp})")
+            return server, tmp
+        except requests.RequestException:
+            if server.poll() is not None:
+                break
+            time.sleep(0.2)
+    server.kill()
+    server.wait()
+    shutil.rmtree(tmp, ignore_errors=True)
+    raise SystemExit("❌ Local server did not start")
+
+def run_load(args):
+    """Open-loop load: requests are sent on schedule whether or not earlier ones have finished"""
+    stats = LoadStats(args.budget)
+    mix = {}
+    for part in args.mix.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight)
+    endpoints, weights = list(mix), list(mix.values())
+
+    sent = []          # payloads already posted (duplicates re-send one of these)
+    filenames = []     # certificates available for /download
+    state_lock = threading.Lock()
+    in_flight = threading.Semaphore(args.max_in_flight)
+    local = threading.local()
+
+    def session():
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        return local.session
+
+    def call(endpoint, index):
+        try:
+            if endpoint == "download":
+                with state_lock:
+                    filename = random.choice(filenames) if filenames else None
+                if filename is None:
+                    endpoint = "generate"  # nothing to download yet
+            if endpoint == "generate":
+                with state_lock:
+                    duplicate = sent and random.random() < args.duplicate_ratio
+                    payload = random.choice(sent) if duplicate else random_donation(index)
+                    if not duplicate:
+                        sent.append(payload)
+                method, url, kwargs = "post", f"{BASE_URL}/generate", {"json": payload}
+            elif endpoint == "download":
+                method, url, kwargs = "get", f"{BASE_URL}/download/{filename}", {}
+            else:
+                method, url, kwargs = "get", f"{BASE_URL}/certificates", {"params": {"limit": 50}}
+
+            start = time.perf_counter()
+            try:
+                response = getattr(session(), method)(url, timeout=args.request_timeout, **kwargs)
+            except requests.Timeout:
+                stats.record(endpoint, time.perf_counter() - start, ok=False, timed_out=True)
+                return
+            except requests.RequestException:
+                stats.record(endpoint, time.perf_counter() - start, ok=False)
+                return
+            elapsed = time.perf_counter() - start
+            stats.record(endpoint, elapsed, ok=response.ok)
+            if endpoint == "generate" and response.ok:
+                body = response.json()
+                with state_lock:
+                    filenames.append(body["filename"])
+                    stats.reused += bool(body.get("reused"))
+        finally:
+            in_flight.release()
+
+    print(f"🚦 Ramp {args.start_rate:g} -> {args.rate:g} req/s over {args.ramp:g}s, then {args.steady:g}s steady "
+          f"(mix {args.mix}, {args.duplicate_ratio:.0%} duplicate donation_ids)")
+    executor = ThreadPoolExecutor(max_workers=args.max_in_flight)
+    started = time.perf_counter()
+    for index, at in enumerate(arrival_times(args.start_rate, args.rate, args.ramp, args.steady)):
+        delay = at - (time.perf_counter() - started)
+        if delay > 0:
+            time.sleep(delay)
+        if not in_flight.acquire(blocking=False):
+            stats.dropped += 1
+            continue
+        executor.submit(call, random.choices(endpoints, weights)[0], index)
+    executor.shutdown(wait=True)
+    stats.report(time.perf_counter() - started)
+    return stats
+
+def load_main(argv):
+    global BASE_URL
+    parser = argparse.ArgumentParser(prog="test_client.py load", description="Open-loop load generator")
+    parser.add_argument("--url", default=BASE_URL)
+    parser.add_argument("--start-server", action="store_true", help="start app.py locally on the --url port")
+    parser.add_argument("--rate", type=float, default=10.0, help="steady arrival rate (requests/s)")
+    parser.add_argument("--start-rate", type=float, default=1.0, help="arrival rate at the start of the ramp")
+    parser.add_argument("--ramp", type=float, default=30.0, help="ramp-up seconds")
+    parser.add_argument("--steady", type=float, default=60.0, help="steady-phase seconds")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.1,
+                        help="share of /generate calls repeating an earlier donation (retries)")
+    parser.add_argument("--mix", default="generate=0.6,download=0.3,list=0.1",
+                        help="endpoint weights: generate, download, list")
+    parser.add_argument("--budget", type=float, default=5.0, help="latency budget (frontend timeout), seconds")
+    parser.add_argument("--request-timeout", type=float, default=30.0)
+    parser.add_argument("--max-in-flight", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    random.seed(args.seed)
+    BASE_URL = args.url.rstrip("/")
+    server, tmp = start_local_server(int(BASE_URL.rsplit(":", 1)[1])) if args.start_server else (None, None)
+    try:
+        if not test_health_check():
+            print("\n❌ Service is not responding. Start it first (./start.sh) or pass --start-server")
+            return 1
+        stats = run_load(args)
+        return 1 if any(stats.errors.values()) else 0
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(60)
+            shutil.rmtree(tmp, ignore_errors=True)
+
 def main():
     """Run all tests"""
+    if len(sys.argv) > 1 and sys.argv[1] == "load":
+        sys.exit(load_main(sys.argv[2:]))
+
     print("🚀 Certificate Service Test Client")
     print("=" * 50)
 
     # Create test downloads directory
-    import os
     os.makedirs("test_downloads", exist_ok=True)
 
     # Run tests
@@ -0,0 +1,12 @@
+"""Engines for render farm workers in tests (`RENDER_WORKER_ENGINE`-style "module:factory" specs)."""
+
+from lib.certificate_generator import PdfEngineBase
+
+
+class _Broken(PdfEngineBase):
+    def start(self) -> None:
+        raise RuntimeError("Executable doesn't exist")
+
+
+def broken(config) -> PdfEngineBase:
+    return _Broken()
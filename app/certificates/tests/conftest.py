@@ -0,0 +1,19 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture(scope="session")
+def chromium():
+    """Skips the test unless Playwright can launch Chromium here."""
+    try:
+        from playwright.sync_api import sync_playwright
+
+        with sync_playwright() as p:
+            p.chromium.launch().close()
+    except Exception as e:
+        pytest.skip(f"Chromium not available (playwright install chromium): {type(e).__name__}")
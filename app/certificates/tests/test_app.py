@@ -0,0 +1,75 @@
+import re
+import threading
+
+import pytest
+
+from lib.render_jobs import JobQueue
+
+_SAMPLE_RE = re.compile(r'^[a-z_]+(\{[a-z_]+="[^"]*"(,[a-z_]+="[^"]*")*\})? ([0-9.e+-]+|[+-]Inf|NaN)$')
+
+
+@pytest.fixture(scope="module")
+def service(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp("service")
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("OUTPUT_DIR", str(tmp / "output"))
+        mp.setenv("RENDER_CACHE_DIR", str(tmp / "cache"))
+        mp.setenv("PDF_ENGINE", "playwright")
+        mp.delenv("CERTIFICATE_INDEX", raising=False)
+        import app
+
+        app._background_started = True  # no warm-up renders or retention sweeps
+        yield app
+
+
+@pytest.fixture
+def client(service):
+    return service.app.test_client()
+
+
+def _job(**kw):
+    body = {"donor_name": "John Doe", "amount": 1500, "donation_id": "DN-171025-0001", "donation_date": "2025-10-17"}
+    body.update(kw)
+    return body
+
+
+def test_jobs_answers_503_with_retry_after_when_the_queue_is_full(service, client, monkeypatch):
+    release = threading.Event()
+
+    def _render(payload):
+        release.wait(5)
+        return "certificate.pdf", False
+
+    monkeypatch.setattr(service, "render_jobs", JobQueue(_render, max_pending=1))
+    try:
+        assert client.post("/jobs", json=_job()).status_code == 202
+        full = client.post("/jobs", json=_job(donation_id="DN-171025-0002"))
+        assert full.status_code == 503
+        assert full.headers["Retry-After"] == "5"
+        assert "full" in full.get_json()["error"]
+        assert client.post("/jobs", json=_job(amount="NaN")).status_code == 400  # validated before queueing
+    finally:
+        release.set()
+
+
+def test_metrics_are_prometheus_text(service, client):
+    assert client.get("/health").status_code == 200
+    service.RENDERS.inc(result="cached")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.content_type == service.CONTENT_TYPE
+    text = response.get_data(as_text=True)
+    lines = text.splitlines()
+
+    assert "# TYPE certificate_http_request_seconds histogram" in lines
+    assert 'certificate_http_request_seconds_count{endpoint="/health",method="GET",status="200"} 1' in lines
+    assert 'certificate_http_request_seconds_bucket{endpoint="/health",method="GET",status="200",le="+Inf"} 1' in lines
+    assert 'certificate_renders_total{result="cached"} 1' in lines
+    assert 'certificate_job_queue{state="queued"} 0' in lines
+    for line in lines:
+        if not line.startswith("#"):
+            assert _SAMPLE_RE.match(line), line
+    # every family is announced once, before its samples
+    families = [line.split()[2] for line in lines if line.startswith("# TYPE")]
+    assert len(families) == len(set(families))
@@ -0,0 +1,62 @@
+import csv
+import hashlib
+import io
+import zipfile
+from datetime import datetime
+
+import pytest
+
+from lib.certificate_export import stream_zip
+from lib.certificate_store import CertificateStore
+
+T0 = datetime(2025, 10, 1, 12, 0).timestamp()
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = CertificateStore(tmp_path / "output", tmp_path / "certificates.db")
+    yield s
+    s.close()
+
+
+def _add(store, donation_id, created_at, body=b""):
+    filename = f"certificate_{donation_id}_{datetime.fromtimestamp(created_at):%Y%m%d_%H%M%S}.pdf"
+    path = store.path_for(donation_id, filename, created_at)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"%PDF-1.7 " + donation_id.encode() + body)
+    return store.add(donation_id, path, render_key="k", created_at=created_at)
+
+
+def _unzip(chunks):
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+    assert archive.testzip() is None
+    manifest = list(csv.DictReader(io.StringIO(archive.read("manifest.csv").decode())))
+    return archive, manifest
+
+
+def test_zip_holds_the_prefix_matches_and_a_manifest_of_them(store):
+    wanted = [_add(store, f"DN-2510-{i}", T0 + i, body=b"x" * 3000) for i in range(3)]
+    _add(store, "DN-2511-0", T0)  # next prefix up: not part of the export
+    _add(store, "DN-251", T0)  # shorter id sharing the prefix's start
+
+    archive, manifest = _unzip(stream_zip(store, store.select(donation_prefix="DN-2510"), chunk_size=1024))
+
+    names = [c.filename for c in wanted]
+    assert archive.namelist() == names + ["manifest.csv"]
+    assert [row["filename"] for row in manifest] == names
+    for cert, row in zip(wanted, manifest):
+        data = archive.read(cert.filename)
+        assert data == store.path(cert).read_bytes()
+        assert row["donation_id"] == cert.donation_id
+        assert int(row["size"]) == len(data)
+        assert row["sha256"] == hashlib.sha256(data).hexdigest()
+
+
+def test_certificates_deleted_after_selection_are_left_out(store):
+    kept, gone = _add(store, "DN-1", T0), _add(store, "DN-2", T0 + 1)
+    certs = list(store.select(donation_prefix="DN-"))
+    store.path(gone).unlink()
+
+    archive, manifest = _unzip(stream_zip(store, certs))
+    assert archive.namelist() == [kept.filename, "manifest.csv"]
+    assert [row["filename"] for row in manifest] == [kept.filename]
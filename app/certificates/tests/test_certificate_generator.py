@@ -0,0 +1,149 @@
+import io
+import os
+import time
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from conftest import ROOT
+from lib.certificate_generator import (
+    _PIKEPDF_AVAILABLE,
+    CertificateData,
+    CertificateGenerator,
+    PdfEngineBase,
+    PdfOptimizer,
+    RenderCache,
+    ValidationError,
+    _with_parent_dir,
+    parse_certificate_request,
+    validate_data,
+    write_atomic,
+)
+
+
+def _request(**kw):
+    body = {"donor_name": "John Doe", "amount": 1500, "donation_id": "DN-171025-0001", "donation_date": "2025-10-17"}
+    body.update(kw)
+    return body
+
+
+@pytest.mark.parametrize("amount", ["NaN", "nan", "sNaN", "Infinity", "-Infinity", "inf"])
+def test_non_finite_amount_is_a_validation_error(amount):
+    with pytest.raises(ValidationError, match="finite"):
+        parse_certificate_request(_request(amount=amount))
+
+
+@pytest.mark.parametrize("amount", [Decimal("NaN"), Decimal("Infinity")])
+def test_validate_data_rejects_non_finite_amount(amount):
+    data = CertificateData(donor_name="John Doe", amount_in_inr=amount, donation_id="DN-1", donation_date=date(2025, 10, 17))
+    with pytest.raises(ValidationError, match="finite"):
+        validate_data(data)
+
+
+def test_amount_too_large_to_round_is_a_validation_error():
+    with pytest.raises(ValidationError, match="too large"):
+        validate_data(parse_certificate_request(_request(amount="1e40")))
+
+
+def test_amount_is_rounded_to_paise():
+    assert validate_data(parse_certificate_request(_request(amount="1500.005"))).amount_in_inr == Decimal("1500.01")
+
+
+def test_write_is_retried_when_a_sweep_prunes_the_shard_directory(tmp_path):
+    out = tmp_path / "2025" / "10" / "ab" / "certificate_DN-1.pdf"
+    calls = []
+
+    def _write():
+        calls.append(out.parent.is_dir())
+        if len(calls) == 1:
+            out.parent.rmdir()  # the sweeper removed the (empty) shard right after mkdir
+        write_atomic(out, b"%PDF-1.7")
+
+    _with_parent_dir(out, _write)
+    assert out.read_bytes() == b"%PDF-1.7"
+    assert calls == [True, True]
+
+
+def test_missing_source_is_not_retried(tmp_path):
+    out = tmp_path / "shard" / "certificate_DN-1.pdf"
+    calls = []
+
+    def _write():
+        calls.append(1)
+        raise FileNotFoundError("cache entry evicted")
+
+    with pytest.raises(FileNotFoundError):
+        _with_parent_dir(out, _write)
+    assert calls == [1]
+
+
+def _generator(template_name="certificate_template.html", **kw) -> CertificateGenerator:
+    return CertificateGenerator(ROOT / "templates", template_name, engine=PdfEngineBase(), **kw)
+
+
+def _data(**kw) -> CertificateData:
+    fields = dict(donor_name="John Doe", amount_in_inr=Decimal("1500"), donation_id="DN-1", donation_date=date(2025, 10, 17))
+    fields.update(kw)
+    return validate_data(CertificateData(**fields))
+
+
+def test_cache_key_covers_data_template_and_optimizer():
+    gen = _generator()
+    key = gen.cache_key(_data())
+    assert gen.cache_key(_data(amount_in_inr=Decimal("1500.00"))) == key  # same validated data
+    assert gen.cache_key(_data(donor_name="Jane Doe")) != key
+    assert _generator(template_name="donation_certificate_temple_v18.html").cache_key(_data()) != key
+    if _PIKEPDF_AVAILABLE:
+        assert _generator(optimizer=PdfOptimizer(dpi=150)).cache_key(_data()) != key
+        assert _generator(optimizer=PdfOptimizer(dpi=150)).cache_key(_data()) != \
+            _generator(optimizer=PdfOptimizer(dpi=96)).cache_key(_data())
+
+
+def test_render_cache_evicts_least_recently_used_past_max_bytes(tmp_path):
+    cache = RenderCache(tmp_path / "cache", max_bytes=250)
+    for key in ("a", "b"):
+        cache.put_bytes(key, b"x" * 100)
+    assert cache.get("a") is not None  # "b" is now the least recently used
+    cache.put_bytes("c", b"x" * 100)
+
+    assert cache.get("b") is None
+    assert cache.get("a").read_bytes() == b"x" * 100
+    assert cache.get("c") is not None
+    assert not (tmp_path / "cache" / "b.pdf").exists()
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] == 200
+
+
+def test_render_cache_expires_old_entries_and_reloads_from_disk(tmp_path):
+    cache = RenderCache(tmp_path / "cache", max_age_seconds=60)
+    cache.put_bytes("old", b"%PDF old")
+    cache.put_bytes("new", b"%PDF new")
+    stale = time.time() - 120
+    os.utime(tmp_path / "cache" / "old.pdf", (stale, stale))
+
+    reopened = RenderCache(tmp_path / "cache", max_age_seconds=60)  # entries come back from the directory
+    assert reopened.get("old") is None
+    assert not (tmp_path / "cache" / "old.pdf").exists()
+    assert reopened.get("new").read_bytes() == b"%PDF new"
+    assert reopened.stats()["hits"] == 1 and reopened.stats()["misses"] == 1
+
+
+@pytest.mark.skipif(not _PIKEPDF_AVAILABLE, reason="pikepdf not installed")
+def test_optimizer_output_is_deterministic_and_smaller():
+    canvas = pytest.importorskip("reportlab.pdfgen.canvas")
+    from PIL import Image
+    from reportlab.lib.utils import ImageReader
+
+    image = Image.frombytes("RGB", (1200, 1200), os.urandom(1200 * 1200 * 3))
+    out = io.BytesIO()
+    c = canvas.Canvas(out, pageCompression=1, invariant=1)
+    c.drawImage(ImageReader(image), 50, 600, width=57, height=57)  # 1200 px printed 2 cm wide
+    c.save()
+    pdf = out.getvalue()
+
+    optimizer = PdfOptimizer(dpi=150)
+    first, report = optimizer.optimize(pdf)
+    assert report.images == 1 and report.bytes_out < report.bytes_in / 10
+    assert optimizer.optimize(pdf)[0] == first  # memoised images
+    assert PdfOptimizer(dpi=150).optimize(pdf)[0] == first  # a fresh optimizer (another process)
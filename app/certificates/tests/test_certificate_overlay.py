@@ -0,0 +1,94 @@
+import threading
+import time
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from conftest import ROOT
+from lib.certificate_generator import BrowserPool, CertificateData, CertificateGenerator, PlaywrightEngine
+from lib.certificate_overlay import _OVERLAY_AVAILABLE, _PDFIUM_AVAILABLE, OverlayRenderer, check_parity
+
+pytestmark = pytest.mark.skipif(not _OVERLAY_AVAILABLE, reason="overlay dependencies not installed")
+
+V18 = "donation_certificate_temple_v18.html"
+
+
+class _Generator:
+    """What `OverlayRenderer.background` reads from a generator."""
+
+    optimizer = None
+
+    def template_sha256(self) -> str:
+        return "template"
+
+
+def _data(**kw) -> CertificateData:
+    fields = dict(donor_name="John Doe", amount_in_inr=Decimal("1500"), donation_id="DN-171025-0001",
+                  donation_date=date(2025, 10, 17))
+    fields.update(kw)
+    return CertificateData(**fields)
+
+
+def test_background_is_prepared_once_outside_the_lock():
+    overlay = OverlayRenderer()
+    started, release, calls = threading.Event(), threading.Event(), []
+
+    def _prepare(key, generator):
+        calls.append(key)
+        started.set()
+        release.wait(5)
+        return "background"
+
+    overlay._prepare = _prepare
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(overlay.background(_Generator()))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    assert started.wait(5)
+    overlay.stats()  # would block if the render held the lock
+    release.set()
+    for t in threads:
+        t.join(5)
+    assert calls == [overlay._key(_Generator())]
+    assert results == ["background"] * 8
+
+
+def test_failed_background_falls_back_and_cools_down():
+    overlay = OverlayRenderer(retry_seconds=60)
+    calls = []
+
+    def _prepare(key, generator):
+        calls.append(key)
+        raise RuntimeError("browser crashed")
+
+    overlay._prepare = _prepare
+    assert overlay.render(_Generator(), _data()) is None
+    assert overlay.render(_Generator(), _data()) is None
+    assert len(calls) == 1  # no second browser render during the cool-down
+    assert overlay.stats()["background_errors"] == 1
+    assert overlay.stats()["fallbacks"] == 2
+
+    overlay._failed_at[overlay._key(_Generator())] = time.monotonic() - 61
+    assert overlay.background(_Generator()) is None
+    assert len(calls) == 2
+
+
+@pytest.mark.skipif(not _PDFIUM_AVAILABLE, reason="pypdfium2 not installed")
+@pytest.mark.parametrize("name", ["John Doe", "Lakshmi Narayanan Venkataraman"])
+def test_overlay_matches_browser_pixels(chromium, tmp_path, name):
+    bundle_dir = ROOT / "bundled"
+    if not (bundle_dir / V18).exists():
+        pytest.skip("bundle the template first: python lib/template_assets.py templates/*.html --out-dir bundled")
+    gen = CertificateGenerator(
+        template_dir=ROOT / "templates",
+        template_name=V18,
+        engine=PlaywrightEngine(BrowserPool(size=1)),
+        bundle_dir=bundle_dir,
+        overlay=OverlayRenderer(store_dir=tmp_path),
+    )
+    try:
+        result = check_parity(gen, _data(donor_name=name), diff_out=tmp_path / "diff.png")
+    finally:
+        gen.close()
+    assert result["ok"], result
@@ -0,0 +1,96 @@
+from datetime import datetime
+
+import pytest
+
+from lib.certificate_store import CertificateStore
+
+T0 = datetime(2025, 10, 1, 12, 0).timestamp()
+DAY = 86400.0
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = CertificateStore(tmp_path / "output", tmp_path / "certificates.db")
+    yield s
+    s.close()
+
+
+def _add(store, donation_id, created_at, suffix=""):
+    filename = f"certificate_{donation_id}_{datetime.fromtimestamp(created_at):%Y%m%d_%H%M%S}{suffix}.pdf"
+    path = store.path_for(donation_id, filename, created_at)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"%PDF-1.7 " + filename.encode())
+    return store.add(donation_id, path, render_key="k", created_at=created_at)
+
+
+def test_page_walks_newest_first_without_gaps_or_repeats(store):
+    added = [_add(store, f"DN-{i:03d}", T0 + i * 60) for i in range(7)]
+    added += [_add(store, "DN-TIE", T0 + 3 * 60, suffix=f"_{n}") for n in ("a", "b")]  # same created_at
+
+    seen, cursor = [], None
+    while True:
+        certs, cursor = store.page(limit=3, cursor=cursor)
+        seen += certs
+        if cursor is None:
+            break
+
+    expected = sorted(added, key=lambda c: (c.created_at, c.filename), reverse=True)
+    assert [c.filename for c in seen] == [c.filename for c in expected]
+
+
+def test_select_by_date_range_and_prefix(store):
+    for i in range(6):
+        _add(store, f"DN-2510-{i}", T0 + i * DAY)
+    _add(store, "DN-2511-0", T0 + 2 * DAY)
+    _add(store, "XX-2510-0", T0 + 2 * DAY)
+
+    in_range = list(store.select(T0 + DAY, T0 + 4 * DAY, batch_size=2))  # [from, to): keyset over 3 batches
+    assert [c.created_at for c in in_range] == sorted(c.created_at for c in in_range)
+    assert {c.donation_id for c in in_range} == {"DN-2510-1", "DN-2510-2", "DN-2510-3", "DN-2511-0", "XX-2510-0"}
+
+    by_prefix = list(store.select(donation_prefix="DN-2510", batch_size=2))
+    assert [c.donation_id for c in by_prefix] == [f"DN-2510-{i}" for i in range(6)]
+
+    both = list(store.select(T0 + 2 * DAY, T0 + 3 * DAY, donation_prefix="DN-25"))
+    assert {c.donation_id for c in both} == {"DN-2510-2", "DN-2511-0"}
+
+    assert list(store.select(donation_prefix="ZZ")) == []
+
+
+def test_delete_older_than_removes_files_rows_and_empty_shards(store):
+    old = [_add(store, f"OLD-{i}", T0 - 40 * DAY + i) for i in range(3)]
+    new = [_add(store, f"NEW-{i}", T0 + i) for i in range(2)]
+
+    assert store.delete_older_than(T0 - DAY) == 3
+    assert store.count() == 2
+    for cert in old:
+        assert store.get(cert.filename) is None
+        assert not store.path(cert).exists()
+        assert not store.path(cert).parent.exists()  # shard pruned
+    for cert in new:
+        assert store.path(cert).exists()
+    assert store.output_dir.is_dir()
+    assert store.delete_older_than(T0 - DAY) == 0
+
+
+def test_backfill_takes_created_at_from_the_filename(store):
+    stamped = store.output_dir / "certificate_DN-1_20250917_093000_0123abcd.pdf"
+    iso = store.output_dir / "certificate_DN-2_2025-09-18T10-15-00.pdf"
+    other = store.output_dir / "receipt.pdf"
+    for path in (stamped, iso, other):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"%PDF-1.7")
+
+    assert store.backfill() == 3
+    assert store.get(stamped.name).created_at == datetime(2025, 9, 17, 9, 30).timestamp()
+    assert store.get(stamped.name).donation_id == "DN-1"
+    assert store.get(iso.name).created_at == datetime(2025, 9, 18, 10, 15).timestamp()
+    assert store.get(other.name).created_at == other.stat().st_mtime  # no timestamp in the name
+    assert store.backfill() == 0
+
+
+@pytest.mark.parametrize("prefix", ["DN-\U0010ffff", "\U0010ffff", "DN-퟿"])
+def test_select_prefix_at_the_top_of_unicode(store, prefix):
+    _add(store, "DN-1", T0)
+    match = _add(store, prefix + "9", T0 + 1)
+    assert [c.filename for c in store.select(donation_prefix=prefix)] == [match.filename]
@@ -0,0 +1,117 @@
+import time
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from conftest import ROOT
+from lib.certificate_generator import CertificateData, CertificateGenerator, PdfEngineBase, RenderCache
+from lib.engine_router import RoutingEngine
+
+
+class _Engine(PdfEngineBase):
+    """Answers with its own name after `delay` seconds, or raises while `fail` is set."""
+
+    runs_scripts = True
+
+    def __init__(self, name: str, delay: float = 0.0):
+        self.name = name
+        self.delay = delay
+        self.fail = False
+        self.calls = 0
+
+    def render_pdf_bytes(self, html: str) -> bytes:
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError(f"{self.name} down")
+        return self.name.encode()
+
+
+@pytest.fixture
+def router():
+    routers = []
+
+    def _make(*engines, **kw):
+        r = RoutingEngine([(e.name, e) for e in engines], **kw)
+        routers.append(r)
+        return r
+
+    yield _make
+    for r in routers:
+        r.close()
+
+
+def _engine_stats(router, name):
+    return next(e for e in router.stats()["engines"] if e["name"] == name)
+
+
+def test_slow_render_is_hedged_to_the_next_engine(router):
+    slow, fast = _Engine("slow", delay=0.5), _Engine("fast", delay=0.01)
+    r = router(slow, fast, hedge_delay=0.1)
+    started = time.monotonic()
+    assert r.render_pdf_bytes("<html></html>") == b"fast"
+    assert time.monotonic() - started < 0.4
+    assert _engine_stats(r, "fast")["hedge_wins"] == 1
+
+
+def test_failing_engine_falls_back_and_opens_its_circuit(router):
+    broken, spare = _Engine("broken"), _Engine("spare")
+    broken.fail = True
+    r = router(broken, spare, hedge_delay=1.0, min_samples=3, open_seconds=60)
+    for _ in range(5):
+        assert r.render_pdf_bytes("<html></html>") == b"spare"
+    assert broken.calls == 3  # no renders once the circuit opened
+    assert _engine_stats(r, "broken")["state"] == "open"
+
+
+def test_preferred_engine_gets_renders_back_after_a_slow_spell(router):
+    preferred, fallback = _Engine("preferred", delay=0.3), _Engine("fallback", delay=0.01)
+    r = router(preferred, fallback, hedge_delay=0.1, recheck_seconds=0.5)
+
+    assert r.render_pdf_bytes("<html></html>") == b"fallback"  # hedged: preferred looks slow now
+    preferred.delay = 0.01  # ... and recovers
+    for _ in range(5):
+        assert r.render_pdf_bytes("<html></html>") == b"fallback"
+    assert preferred.calls == 1
+
+    time.sleep(0.6)  # its average is stale: one render re-measures it
+    assert r.render_pdf_bytes("<html></html>") == b"preferred"
+    for _ in range(5):
+        assert r.render_pdf_bytes("<html></html>") == b"preferred"
+    stats = _engine_stats(r, "preferred")
+    assert stats["rechecks"] == 1
+    assert stats["ewma_ms"] < 100
+
+
+def test_engine_still_slow_on_recheck_stays_passed_over(router):
+    preferred, fallback = _Engine("preferred", delay=0.3), _Engine("fallback", delay=0.01)
+    r = router(preferred, fallback, hedge_delay=0.1, recheck_seconds=0.5)
+
+    assert r.render_pdf_bytes("<html></html>") == b"fallback"
+    time.sleep(0.6)
+    assert r.render_pdf_bytes("<html></html>") == b"fallback"  # re-measured, hedged again
+    assert preferred.calls == 2
+    for _ in range(3):
+        assert r.render_pdf_bytes("<html></html>") == b"fallback"
+    assert preferred.calls == 2
+
+
+def test_latency_is_measured_from_when_the_render_starts(router):
+    engine = _Engine("only", delay=0.05)
+    r = router(engine, hedge_delay=5.0, max_workers=1)
+    r._executor.submit(time.sleep, 0.4)  # holds the router's only thread
+    assert r.render_pdf_bytes("<html></html>") == b"only"
+    assert _engine_stats(r, "only")["ewma_ms"] < 300
+
+
+
+def test_routed_renders_skip_the_render_cache(router, tmp_path):
+    cache = RenderCache(tmp_path / "cache")
+    gen = CertificateGenerator(ROOT / "templates", "certificate_template.html", engine=router(_Engine("a")),
+                               cache=cache)
+    data = CertificateData(donor_name="John Doe", amount_in_inr=Decimal("1500"), donation_id="DN-1",
+                           donation_date=date(2025, 10, 17))
+    assert gen.generate_bytes(data) == b"a"
+    assert gen.generate_bytes(data) == b"a"
+    assert cache.stats()["entries"] == 0
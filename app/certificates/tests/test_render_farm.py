@@ -0,0 +1,38 @@
+import time
+
+import pytest
+
+from lib.render_farm import RenderFarm
+
+
+@pytest.fixture
+def farm():
+    farms = []
+
+    def _make(**kw):
+        f = RenderFarm(**kw)
+        farms.append(f)
+        return f
+
+    yield _make
+    for f in farms:
+        f.close()
+
+
+def test_worker_whose_engine_cannot_start_backs_off_then_gives_up(farm):
+    f = farm(workers=1, engine="tests._farm_engines:broken", restart_backoff=0.2, max_start_failures=3)
+    started = time.monotonic()
+    f.start()
+    while f.healthy and time.monotonic() - started < 15:
+        time.sleep(0.05)
+
+    assert not f.healthy
+    assert time.monotonic() - started >= 0.2  # the first restart is immediate, the second backs off
+    stats = f.stats()
+    assert stats["restarts"] == 2
+    assert stats["failed_workers"] == [0]
+    assert stats["workers"] == []
+    time.sleep(0.5)
+    assert f.stats()["restarts"] == 2  # no more spawns
+    with pytest.raises(RuntimeError, match="No render worker available"):
+        f.render_pdf_bytes("<html></html>")
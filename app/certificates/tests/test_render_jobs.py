@@ -0,0 +1,81 @@
+import threading
+import time
+
+import pytest
+
+from lib.render_jobs import JOB_DONE, JOB_FAILED, JobQueue, QueueFull, SingleFlight
+
+
+def test_single_flight_shares_one_call_per_key():
+    flights = SingleFlight()
+    release, calls, results = threading.Event(), [], []
+
+    def _render():
+        calls.append(1)
+        release.wait(5)
+        return "certificate.pdf"
+
+    threads = [threading.Thread(target=lambda: results.append(flights.do("DN-1", _render))) for _ in range(6)]
+    for t in threads:
+        t.start()
+    while flights.in_flight() == 0:
+        time.sleep(0.01)
+    time.sleep(0.1)  # let the followers reach the flight
+    release.set()
+    for t in threads:
+        t.join(5)
+
+    assert calls == [1]
+    assert sorted(shared for _, shared in results) == [False] + [True] * 5
+    assert {r for r, _ in results} == {"certificate.pdf"}
+    assert flights.in_flight() == 0
+    assert flights.do("DN-1", lambda: "again") == ("again", False)  # a finished flight isn't reused
+
+
+def test_single_flight_shares_the_exception_too():
+    flights = SingleFlight()
+
+    def _fail():
+        raise RuntimeError("browser crashed")
+
+    with pytest.raises(RuntimeError, match="browser crashed"):
+        flights.do("DN-1", _fail)
+    assert flights.in_flight() == 0
+
+
+def _wait_for(job, status, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while job.status != status and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return job
+
+
+def test_job_queue_pushes_back_once_max_pending_jobs_are_waiting():
+    release = threading.Event()
+
+    def _worker(payload):
+        release.wait(5)
+        if payload == "bad":
+            raise ValueError("bad payload")
+        return f"{payload}.pdf", False
+
+    jobs = JobQueue(_worker, workers=1, max_pending=2)
+    first, second = jobs.submit("DN-1", "one"), jobs.submit("DN-2", "bad")
+    with pytest.raises(QueueFull):
+        jobs.submit("DN-3", "three")
+    assert jobs.depth()["queued"] + jobs.depth()["running"] == 2
+
+    release.set()
+    assert _wait_for(first, JOB_DONE).filename == "one.pdf"
+    failed = _wait_for(second, JOB_FAILED)
+    assert failed.error == "bad payload" and failed.payload is None
+    assert _wait_for(jobs.submit("DN-3", "three"), JOB_DONE).filename == "three.pdf"  # room again
+
+
+def test_job_queue_forgets_the_oldest_finished_jobs():
+    jobs = JobQueue(lambda payload: (payload, False), workers=1, max_finished=2)
+    done = [jobs.submit(f"DN-{i}", f"{i}.pdf") for i in range(3)]
+    for job in done:
+        _wait_for(job, JOB_DONE)
+    assert jobs.get(done[0].id) is None
+    assert [jobs.get(j.id).filename for j in done[1:]] == ["1.pdf", "2.pdf"]
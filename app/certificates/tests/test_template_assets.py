@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+from lib.certificate_generator import CertificateGenerator, PdfEngineBase, TemplateRenderer
+from lib.template_assets import bundled_from
+
+CSS_URL = "https://fonts.example/css?family=Cinzel"
+PAGE = '<html><head><link href="{}" rel="stylesheet"></head><body>{}</body></html>\n'
+
+
+@pytest.fixture
+def templates(tmp_path):
+    src = tmp_path / "templates"
+    assets = src / "assets"
+    assets.mkdir(parents=True)
+    (assets / "cinzel.css").write_text("body { font-family: Cinzel; }")
+    (assets / "manifest.json").write_text(json.dumps({CSS_URL: {"file": "cinzel.css", "content_type": "text/css"}}))
+    (src / "cert.html").write_text(PAGE.format(CSS_URL, "v1"))
+    return src
+
+
+def test_bundle_is_rebuilt_offline_when_the_source_changes(templates, tmp_path):
+    renderer = TemplateRenderer(templates, tmp_path / "bundled")
+    html = renderer.render("cert.html", {})
+    assert "font-family: Cinzel" in html and CSS_URL not in html and "v1" in html
+    first = renderer.template_hash("cert.html")
+
+    (templates / "cert.html").write_text(PAGE.format(CSS_URL, "v2"))
+    assert renderer.reload() == ["cert.html"]
+    html = renderer.render("cert.html", {})
+    assert "v2" in html and "font-family: Cinzel" in html
+    assert renderer.template_hash("cert.html") != first
+    assert renderer.get("cert.html").filename == str(tmp_path / "bundled" / "cert.html")
+
+
+def test_source_is_rendered_when_its_assets_are_not_vendored(templates, tmp_path):
+    renderer = TemplateRenderer(templates, tmp_path / "bundled")
+    renderer.render("cert.html", {})
+    other = "https://fonts.example/css?family=Inter"
+    (templates / "cert.html").write_text(PAGE.format(other, "v2"))
+
+    assert renderer.reload() == ["cert.html"]
+    assert other in renderer.render("cert.html", {})  # not the stale v1 bundle
+    assert renderer.get("cert.html").filename == str(templates / "cert.html")
+    assert bundled_from(tmp_path / "bundled" / "cert.html") is not None  # left as it was
+
+
+def test_layout_lock_covers_the_rendered_bundle(templates, tmp_path):
+    renderer = TemplateRenderer(templates, tmp_path / "bundled")
+    locked = renderer.template_hash("cert.html")
+    gen = CertificateGenerator(templates, "cert.html", engine=PdfEngineBase(), bundle_dir=tmp_path / "bundled",
+                               expected_template_sha256=locked)
+
+    (templates / "cert.html").write_text(PAGE.format(CSS_URL, "v2"))
+    with pytest.raises(RuntimeError, match="layout hash mismatch"):
+        gen.reload_templates()
+    assert gen.template_sha256() == locked  # the locked version keeps rendering
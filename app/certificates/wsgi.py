@@ -0,0 +1,15 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+WSGI entry point: `gunicorn wsgi:app` or `waitress-serve wsgi:app`.
+
+Starts the warm-up and retention sweeper when the server loads the app, as `python app.py` does,
+so /ready can turn 200 before the first request arrives.
+"""
+
+from app import app, start_background_tasks
+
+start_background_tasks()
+
+__all__ = ["app"]